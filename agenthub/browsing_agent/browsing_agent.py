@@ -1,7 +1,7 @@
+import asyncio
 import os
-import random
-import time
 from datetime import datetime
+from typing import Callable
 
 from browsergym.core.action.highlevel import HighLevelActionSet
 from browsergym.utils.obs import flatten_axtree_to_str
@@ -13,11 +13,14 @@ from easyweb.events.action import (
     Action,
     AgentFinishAction,
     BrowseInteractiveAction,
+    BrowseParallelAction,
     MessageAction,
 )
 from easyweb.events.event import EventSource
 from easyweb.events.observation import BrowserOutputObservation
 from easyweb.llm.llm import LLM
+from easyweb.llm.prompt import PromptSection
+from easyweb.runtime.browser.profile import ObservationProfile
 from easyweb.runtime.plugins import (
     PluginRequirement,
 )
@@ -73,30 +76,68 @@ In order to accomplish my goal I need to send the information asked back to the
 """
 
 
-def get_prompt(
-    error_prefix: str, cur_url: str, cur_axtree_txt: str, prev_action_str: str
-) -> str:
-    prompt = f"""\
-{error_prefix}
-
-# Current Page URL:
-{cur_url}
-
-# Current Accessibility Tree:
-{cur_axtree_txt}
+# opens tabs through a BrowseParallelAction, not a BrowserGym action
+PARALLEL_ACTION_DESCRIPTION = """
+browse_parallel(urls: list[str])
+    Description: Opens each URL in a tab of its own at the same time and shows the text of all of them, e.g. to compare several pages. It must be the only action of its answer.
+    Examples:
+        browse_parallel(['https://www.example.com/a', 'https://www.example.com/b'])
+"""
 
-# Previous Actions
-{prev_action_str}
 
+def get_prompt_sections(
+    error_prefix: str,
+    cur_url: str,
+    cur_axtree_txt: str,
+    prev_action_str: str,
+    parallel_pages: str = '',
+) -> list[PromptSection]:
+    """
+    The sections of the prompt; the oldest actions are cut first, then the pages
+    opened in parallel, then the end of the tree.
+    """
+    example = """\
 Here is an example with chain of thought of a valid action when clicking on a button:
 "
 In order to accomplish my goal I need to click on the button with bid 12
 ```click("12")```
 "
-""".strip()
+"""
     if USE_CONCISE_ANSWER:
-        prompt += CONCISE_INSTRUCTION
-    return prompt
+        example += CONCISE_INSTRUCTION
+    return [
+        PromptSection(error_prefix.strip()),
+        PromptSection(cur_url, title='# Current Page URL:'),
+        PromptSection(
+            parallel_pages,
+            title='# Pages Opened in Parallel:',
+            priority=1,
+            name='parallel',
+        )
+        if parallel_pages
+        else PromptSection(''),
+        PromptSection(
+            cur_axtree_txt,
+            title='# Current Accessibility Tree:',
+            priority=1,
+            name='axtree',
+        ),
+        PromptSection(
+            prev_action_str,
+            title='# Previous Actions',
+            priority=0,
+            keep_end=True,
+            name='actions',
+        ),
+        PromptSection(example.strip()),
+    ]
+
+
+# the LLM stops after the closing parenthesis of its action
+STOP_SEQUENCES = [')```', ')\n```']
+
+# tokens the chat format adds for the user message
+MESSAGE_OVERHEAD = 8
 
 
 class BrowsingAgent(Agent):
@@ -107,6 +148,15 @@ class BrowsingAgent(Agent):
 
     sandbox_plugins: list[PluginRequirement] = []
     runtime_tools: list[RuntimeTool] = [RuntimeTool.BROWSER]
+    # the prompt is built from the accessibility tree, flattened by the browser
+    # worker, the screenshot is shown to the user
+    observation_profile = ObservationProfile(
+        text_content=False,
+        dom_object=False,
+        axtree_object=False,
+        scroll_position=False,
+        axtree_txt=True,
+    )
     response_parser = BrowsingResponseParser()
 
     def __init__(
@@ -138,6 +188,8 @@ class BrowsingAgent(Agent):
         self.cost_accumulator = 0
         self.error_accumulator = 0
         self.num_steps = 0
+        # cuts the last prompt further when the LLM finds it too long
+        self.shrink_prompt: Callable[[list[dict]], list[dict] | None] | None = None
 
     def step(self, state: State) -> Action:
         """
@@ -152,20 +204,54 @@ class BrowsingAgent(Agent):
         - MessageAction(content) - Message action to run (e.g. ask for clarification)
         - AgentFinishAction() - end the interaction
         """
+        prepared = self._prepare(state)
+        if isinstance(prepared, Action):
+            return prepared
+        response = self.llm.completion(
+            messages=prepared,
+            stop=STOP_SEQUENCES,
+            on_context_window_exceeded=self.shrink_prompt,
+        )
+        self.log_cost(response)
+        return self.response_parser.parse(response)
+
+    async def astep(self, state: State) -> Action:
+        """
+        Performs one step like `step`, waiting for the LLM on the event loop.
+        """
+        # the accessibility tree is flattened and counted off the event loop
+        prepared = await asyncio.to_thread(self._prepare, state)
+        if isinstance(prepared, Action):
+            return prepared
+        if self.stream_handler is None:
+            response = await self.llm.acompletion(
+                messages=prepared,
+                stop=STOP_SEQUENCES,
+                on_context_window_exceeded=self.shrink_prompt,
+            )
+        else:
+            # the response is cut off as soon as it holds a complete action, the
+            # stop sequences are left out as they would strip the fence closing it
+            response = await self.llm.astream(
+                messages=prepared,
+                on_delta=self.stream_handler,
+                until=self.response_parser.is_action_complete,
+                on_context_window_exceeded=self.shrink_prompt,
+            )
+        self.log_cost(response)
+        return self.response_parser.parse(response)
+
+    def _prepare(self, state: State) -> Action | list[dict]:
+        """The messages to prompt the LLM with, or the action to take without asking it."""
         messages = []
         prev_actions = []
         cur_url = ''
         cur_axtree_txt = ''
         error_prefix = ''
+        parallel_pages = ''
         last_obs = None
         last_action = None
 
-        if len(state.history) == 1:
-            logger.info('Sleeping')
-            time.sleep(10 + 5 * random.random())
-        else:
-            time.sleep(5 + random.random() * 5)
-
         if EVAL_MODE and len(state.history) == 1:
             # for webarena and miniwob++ eval, we need to retrieve the initial observation already in browser env
             # initialize and retrieve the first observation by issuing an noop OP
@@ -173,10 +259,15 @@ class BrowsingAgent(Agent):
             return BrowseInteractiveAction(browser_actions='noop()')
 
         for prev_action, obs in state.history:
+            # the pages opened in parallel are shown right after they were
+            parallel_pages = ''
             if isinstance(prev_action, BrowseInteractiveAction):
                 prev_actions.append(prev_action.browser_actions)
                 last_obs = obs
                 last_action = prev_action
+            elif isinstance(prev_action, BrowseParallelAction):
+                prev_actions.append(f'browse_parallel({prev_action.urls!r})')
+                parallel_pages = obs.content
             elif (
                 isinstance(prev_action, MessageAction)
                 and prev_action.source == EventSource.AGENT
@@ -215,12 +306,16 @@ class BrowsingAgent(Agent):
             cur_url = last_obs.url
 
             try:
-                cur_axtree_txt = flatten_axtree_to_str(
-                    last_obs.axtree_object,
-                    extra_properties=last_obs.extra_element_properties,
-                    with_clickable=True,
-                    filter_visible_only=True,
-                )
+                if last_obs.axtree_txt or not last_obs.axtree_object:
+                    cur_axtree_txt = last_obs.axtree_txt
+                else:
+                    # observations recorded before the worker flattened the tree
+                    cur_axtree_txt = flatten_axtree_to_str(
+                        last_obs.axtree_object,
+                        extra_properties=last_obs.extra_element_properties,
+                        with_clickable=True,
+                        filter_visible_only=True,
+                    )
             except Exception as e:
                 logger.error(
                     'Error when trying to process the accessibility tree: %s', e
@@ -233,22 +328,35 @@ class BrowsingAgent(Agent):
 
         system_msg = get_system_message(
             goal,
-            self.action_space.describe(with_long_description=False, with_examples=True),
+            self.action_space.describe(with_long_description=False, with_examples=True)
+            + (PARALLEL_ACTION_DESCRIPTION if USE_NAV else ''),
         )
 
         messages.append({'role': 'system', 'content': system_msg})
 
-        prompt = get_prompt(error_prefix, cur_url, cur_axtree_txt, prev_action_str)
-        messages.append({'role': 'user', 'content': prompt})
-
-        response = self.llm.completion(
-            messages=messages,
-            stop=[')```', ')\n```'],
+        # large pages and long histories are cut to fit the context window
+        sections = get_prompt_sections(
+            error_prefix, cur_url, cur_axtree_txt, prev_action_str, parallel_pages
         )
+        prompt = self.llm.fit_prompt(
+            sections, reserved=self.llm.get_token_count(messages) + MESSAGE_OVERHEAD
+        )
+        messages.append({'role': 'user', 'content': prompt.text})
+
+        def shrink_prompt(messages: list[dict]) -> list[dict] | None:
+            nonlocal prompt
+            # our tokenizer counted fewer tokens than the model's, cut a quarter
+            window = self.llm.max_input_tokens - self.llm.max_output_tokens
+            smaller = self.llm.fit_prompt(
+                sections, reserved=window - prompt.tokens * 3 // 4
+            )
+            if smaller.tokens >= prompt.tokens:
+                return None
+            prompt = smaller
+            return messages[:-1] + [{'role': 'user', 'content': prompt.text}]
 
-        self.log_cost(response)
-
-        return self.response_parser.parse(response)
+        self.shrink_prompt = shrink_prompt
+        return messages
 
     def search_memory(self, query: str) -> list[str]:
         raise NotImplementedError('Implement this abstract method')
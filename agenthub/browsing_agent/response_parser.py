@@ -1,18 +1,27 @@
 import ast
 import re
 
+from easyweb.controller.action_parser import ActionParser, ResponseParser
 from easyweb.core.logger import easyweb_logger as logger
 from easyweb.events.action import (
     Action,
     BrowseInteractiveAction,
+    BrowseParallelAction,
 )
+from easyweb.runtime.browser.utils import split_browser_actions
 
+# a closed code block, the LLM's action
+ACTION_BLOCK = re.compile(r'```(?:python)?(.*?)```', re.DOTALL)
 
-class BrowsingResponseParser:
+
+class BrowsingResponseParser(ResponseParser):
     def __init__(self):
         # Need to pay attention to the item order in self.action_parsers
         super().__init__()
-        self.action_parsers = [BrowsingActionParserMessage()]
+        self.action_parsers = [
+            BrowsingActionParserMessage(),
+            BrowsingActionParserParallel(),
+        ]
         self.default_parser = BrowsingActionParserBrowseInteractive()
 
     def parse(self, response: str) -> Action:
@@ -24,6 +33,10 @@ class BrowsingResponseParser:
         if action_str is None:
             return ''
         action_str = action_str.strip()
+        # a response cut off once it held an action may go on past its block
+        match = ACTION_BLOCK.search(action_str)
+        if match is not None and self.is_action_complete(action_str):
+            action_str = action_str[: match.end()]
         # Ensure action_str ends with ')```'
         if action_str:
             if not action_str.endswith('```'):
@@ -34,6 +47,16 @@ class BrowsingResponseParser:
         logger.debug(action_str)
         return action_str
 
+    def is_action_complete(self, text: str) -> bool:
+        match = ACTION_BLOCK.search(text)
+        if match is None or not match.group(1).strip():
+            return False
+        try:
+            ast.parse(match.group(1).strip())
+        except SyntaxError:
+            return False
+        return True
+
     def parse_action(self, action_str: str) -> Action:
         for action_parser in self.action_parsers:
             if action_parser.check_condition(action_str):
@@ -41,7 +64,7 @@ class BrowsingResponseParser:
         return self.default_parser.parse(action_str)
 
 
-class BrowsingActionParserMessage:
+class BrowsingActionParserMessage(ActionParser):
     """Parser action:
     - BrowseInteractiveAction(browser_actions) - unexpected response format, message back to user
     """
@@ -63,7 +86,58 @@ class BrowsingActionParserMessage:
         )
 
 
-class BrowsingActionParserBrowseInteractive:
+class BrowsingActionParserParallel(ActionParser):
+    """Parser action:
+    - BrowseParallelAction(urls) - the action is a single browse_parallel call with a list of URLs
+    """
+
+    def __init__(
+        self,
+    ):
+        pass
+
+    def check_condition(self, action_str: str) -> bool:
+        return self._urls(action_str) is not None
+
+    def parse(self, action_str: str) -> Action:
+        thought = action_str.split('```')[0].strip()
+        return BrowseParallelAction(urls=self._urls(action_str) or [], thought=thought)
+
+    @staticmethod
+    def _urls(action_str: str) -> list[str] | None:
+        """The URLs of a browse_parallel(['...', ...]) action, None for other actions."""
+        parts = action_str.split('```')
+        if len(parts) < 2:
+            return None
+        code = parts[1].strip()
+        if code.startswith('python'):
+            code = code[len('python') :]
+        try:
+            tree = ast.parse(code.strip())
+        except SyntaxError:
+            return None
+        if len(tree.body) != 1 or not isinstance(tree.body[0], ast.Expr):
+            return None
+        call = tree.body[0].value
+        if (
+            not isinstance(call, ast.Call)
+            or not isinstance(call.func, ast.Name)
+            or call.func.id != 'browse_parallel'
+            or len(call.args) != 1
+        ):
+            return None
+        try:
+            urls = ast.literal_eval(call.args[0])
+        except ValueError:
+            return None
+        if not isinstance(urls, list) or not urls:
+            return None
+        if not all(isinstance(url, str) for url in urls):
+            return None
+        return urls
+
+
+class BrowsingActionParserBrowseInteractive(ActionParser):
     """Parser action:
     - BrowseInteractiveAction(browser_actions) - handle send message to user function call in BrowserGym
     """
@@ -119,4 +193,6 @@ class BrowsingActionParserBrowseInteractive:
             browser_actions=browser_actions,
             thought=thought,
             browsergym_send_msg_to_user=msg_content,
+            # several calls run as a batch, stopping at the first that fails
+            batch=len(split_browser_actions(browser_actions)) > 1,
         )
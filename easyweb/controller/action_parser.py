@@ -41,6 +41,20 @@ class ResponseParser(ABC):
         """
         pass
 
+    def is_action_complete(self, text: str) -> bool:
+        """
+        Checks if a response that is still being streamed already holds a complete
+        action, so that the rest of it doesn't have to be generated.
+
+        Parameters:
+        - text (str): The response so far.
+
+        Returns:
+        - complete (bool): True if parsing `text` gives the final action. False by
+          default, for parsers that need the whole response.
+        """
+        return False
+
     @abstractmethod
     def parse_action(self, action_str: str) -> Action:
         """
@@ -1,5 +1,7 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import TYPE_CHECKING, Any, Type
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Type
 
 if TYPE_CHECKING:
     from easyweb.controller.state.state import State
@@ -8,9 +10,13 @@ from easyweb.core.exceptions import (
     AgentAlreadyRegisteredError,
     AgentNotRegisteredError,
 )
+from easyweb.runtime.browser.profile import ObservationProfile
 from easyweb.runtime.plugins import PluginRequirement
 from easyweb.runtime.tools import RuntimeTool
 
+# runs the steps of agents that don't implement astep
+step_executor = ThreadPoolExecutor(max_workers=20)
+
 
 class Agent(ABC):
     DEPRECATED = False
@@ -24,6 +30,13 @@ class Agent(ABC):
     _registry: dict[str, Type['Agent']] = {}
     sandbox_plugins: list[PluginRequirement] = []
     runtime_tools: list[RuntimeTool] = []
+    # browser observation fields the agent reads, see ObservationProfile
+    observation_profile: ObservationProfile = ObservationProfile()
+    # how the browser loads pages, see LOAD_PROFILES, empty uses the config
+    load_profile: str = ''
+    # awaited with each piece of the LLM's response while it is streamed, set
+    # by the controller when llm.stream is on
+    stream_handler: Callable[[str], Awaitable[None]] | None = None
 
     def __init__(
         self,
@@ -50,6 +63,16 @@ class Agent(ABC):
         """
         pass
 
+    async def astep(self, state: 'State') -> 'Action':
+        """
+        The asynchronous version of `step`, awaited by the agent controller.
+
+        Agents that wait on the LLM with `LLM.acompletion` should override it, so
+        that their steps don't hold one of the threads `step` runs on by default.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(step_executor, self.step, state)
+
     @abstractmethod
     def search_memory(self, query: str) -> list[str]:
         """
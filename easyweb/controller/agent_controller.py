@@ -1,10 +1,9 @@
 import asyncio
 import traceback
-from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Type
 
 from easyweb.controller.agent import Agent
-from easyweb.controller.state.state import State
+from easyweb.controller.state.state import State, measure_steps
 from easyweb.core.config import config
 from easyweb.core.exceptions import (
     AgentMalformedActionError,
@@ -31,18 +30,18 @@ from easyweb.events.event import Event
 from easyweb.events.observation import (
     AgentDelegateObservation,
     AgentStateChangedObservation,
+    AgentThoughtChunkObservation,
     CmdOutputObservation,
     ErrorObservation,
     NullObservation,
     Observation,
 )
+from easyweb.llm.prompt import get_token_counter
 
 MAX_ITERATIONS = config.max_iterations
 MAX_CHARS = config.llm.max_chars
 MAX_BUDGET_PER_TASK = config.max_budget_per_task
 
-executor = ThreadPoolExecutor(max_workers=20)
-
 
 class AgentController:
     id: str
@@ -54,6 +53,8 @@ class AgentController:
     parent: 'AgentController | None' = None
     delegate: 'AgentController | None' = None
     _pending_action: Action | None = None
+    # tokens of the history when the agent last stepped
+    _step_tokens: int = 0
 
     def __init__(
         self,
@@ -91,6 +92,8 @@ class AgentController:
             EventStreamSubscriber.AGENT_CONTROLLER, self.on_event, append=is_delegate
         )
         self.max_budget_per_task = max_budget_per_task
+        if config.llm.stream:
+            self.agent.stream_handler = self._stream_thought
         if not is_delegate:
             self.agent_task = asyncio.create_task(self._start_step_loop())
 
@@ -100,16 +103,19 @@ class AgentController:
         await self.set_agent_state_to(AgentState.STOPPED)
         self.event_stream.unsubscribe(EventStreamSubscriber.AGENT_CONTROLLER)
 
+    async def _stream_thought(self, text: str):
+        await self.event_stream.add_transient_event(
+            AgentThoughtChunkObservation(content=text, iteration=self.state.iteration),
+            EventSource.AGENT,
+        )
+
     def update_state_before_step(self):
         self.state.iteration += 1
 
     async def update_state_after_step(self):
         self.state.updated_info = []
         # update metrics especially for cost
-        if isinstance(self.agent.llm, dict):
-            self.state.metrics = list(self.agent.llm.values())[0].metrics
-        else:
-            self.state.metrics = self.agent.llm.metrics
+        self.state.metrics = self._llm().metrics
         if self.max_budget_per_task is not None:
             current_cost = self.state.metrics.accumulated_cost
             if current_cost > self.max_budget_per_task:
@@ -124,11 +130,40 @@ class AgentController:
             self.state.error += f': {str(exception)}'
         await self.event_stream.add_event(ErrorObservation(message), EventSource.AGENT)
 
+    def _llm(self):
+        if isinstance(self.agent.llm, dict):
+            return list(self.agent.llm.values())[0]
+        return self.agent.llm
+
     async def add_history(self, action: Action, observation: Observation):
         if isinstance(action, NullAction) and isinstance(observation, NullObservation):
             return
-        self.state.history.append((action, observation))
-        self.state.updated_info.append((action, observation))
+        # counted before the next step, see _count_history
+        self.state.add_history(action, observation)
+
+    async def _count_history(self):
+        """Counts the steps added to the history since, in a thread as long observations take a while to tokenize."""
+        steps = list(self.state.uncounted)
+        if not steps:
+            return
+        llm = self._llm()
+        count = get_token_counter(llm.model_name if llm is not None else '')
+        self.state.count_history(await asyncio.to_thread(measure_steps, steps, count))
+
+    def _estimate_step_cost(self) -> float:
+        """
+        What the next step will likely cost: the prompt the LLM counted for the
+        last one, grown by the history added since, or the whole history before.
+        """
+        llm = self._llm()
+        if llm is None:
+            return 0.0
+        prompt_tokens = self.state.num_of_tokens
+        if llm.metrics.last_prompt_tokens:
+            prompt_tokens = llm.metrics.last_prompt_tokens + max(
+                0, self.state.num_of_tokens - self._step_tokens
+            )
+        return llm.estimate_cost(prompt_tokens)
 
     async def _start_step_loop(self):
         logger.info(f'[Agent Controller {self.id}] Starting step loop...')
@@ -216,6 +251,7 @@ class AgentController:
         return self.state.agent_state
 
     async def start_delegate(self, action: AgentDelegateAction):
+        await self._count_history()
         AgentCls: Type[Agent] = Agent.get_cls(action.agent)
         agent = AgentCls(llm=self.agent.llm)
         state = State(
@@ -223,6 +259,7 @@ class AgentController:
             iteration=0,
             max_iterations=self.state.max_iterations,
             num_of_chars=self.state.num_of_chars,
+            # the delegate's prompts hold its own history, whose tokens it counts
             delegate_level=self.state.delegate_level + 1,
         )
         logger.info(f'[Agent Controller {self.id}]: start delegate')
@@ -232,6 +269,7 @@ class AgentController:
             event_stream=self.event_stream,
             max_iterations=self.state.max_iterations,
             max_chars=self.max_chars,
+            max_budget_per_task=self.max_budget_per_task,
             initial_state=state,
             is_delegate=True,
         )
@@ -285,6 +323,7 @@ class AgentController:
                 await self.event_stream.add_event(obs, EventSource.AGENT)
             return
 
+        await self._count_history()
         if self.state.num_of_chars > self.max_chars:
             raise MaxCharsExceedError(self.state.num_of_chars, self.max_chars)
 
@@ -297,17 +336,21 @@ class AgentController:
             await self.set_agent_state_to(AgentState.ERROR)
             return
 
-        async def run_blocking_function(state: State):
-            loop = asyncio.get_running_loop()
-            result = await loop.run_in_executor(executor, self.agent.step, state)
-            return result
+        if self.max_budget_per_task is not None:
+            current_cost = self._llm().metrics.accumulated_cost
+            estimate = self._estimate_step_cost()
+            if current_cost + estimate > self.max_budget_per_task:
+                await self.report_error(
+                    f'Task budget would be exceeded. Current cost: {current_cost}, estimated cost of the next step: {estimate}, Max budget: {self.max_budget_per_task}'
+                )
+                await self.set_agent_state_to(AgentState.ERROR)
+                return
 
         self.update_state_before_step()
+        self._step_tokens = self.state.num_of_tokens
         action: Action = NullAction()
         try:
-            task = asyncio.create_task(run_blocking_function(self.state))
-            action = await task
-            # action = self.agent.step(self.state)
+            action = await self.agent.astep(self.state)
             if action is None:
                 raise AgentNoActionError('No action was returned')
         except (AgentMalformedActionError, AgentNoActionError, LLMOutputError) as e:
@@ -1,6 +1,8 @@
 import base64
+import json
 import pickle
 from dataclasses import dataclass, field
+from typing import Callable
 
 from easyweb.controller.state.task import RootTask
 from easyweb.core.logger import easyweb_logger as logger
@@ -14,8 +16,24 @@ from easyweb.events.observation import (
     CmdOutputObservation,
     Observation,
 )
+from easyweb.events.serialization.event import event_to_memory
 from easyweb.storage import get_file_store
 
+
+def measure_steps(
+    steps: list[tuple[Action, Observation]], count: Callable[[str], int]
+) -> list[tuple[int, int]]:
+    """The characters of each step of a history, and its tokens counted with `count`."""
+    sizes = []
+    for action, observation in steps:
+        text = '\n'.join(
+            json.dumps(event_to_memory(event), default=str, ensure_ascii=False)
+            for event in (action, observation)
+        )
+        sizes.append((len(text), count(text)))
+    return sizes
+
+
 RESUMABLE_STATES = [
     AgentState.RUNNING,
     AgentState.PAUSED,
@@ -31,6 +49,11 @@ class State:
     max_iterations: int = 35
     # number of characters we have sent to and received from LLM so far for current task
     num_of_chars: int = 0
+    # tokens of the history, each entry counted once when it was added
+    num_of_tokens: int = 0
+    history_tokens: list[int] = field(default_factory=list)
+    # steps of the history whose characters and tokens are not counted yet
+    uncounted: list[tuple[Action, Observation]] = field(default_factory=list)
     background_commands_obs: list[CmdOutputObservation] = field(default_factory=list)
     history: list[tuple[Action, Observation]] = field(default_factory=list)
     updated_info: list[tuple[Action, Observation]] = field(default_factory=list)
@@ -70,6 +93,30 @@ class State:
         state.agent_state = AgentState.LOADING
         return state
 
+    def add_history(
+        self,
+        action: Action,
+        observation: Observation,
+        count: Callable[[str], int] | None = None,
+    ):
+        """
+        Adds a step to the history. Its characters and its tokens are counted with
+        `count`, or without it later, see `measure_steps` and `count_history`.
+        """
+        self.history.append((action, observation))
+        self.updated_info.append((action, observation))
+        self.uncounted.append((action, observation))
+        if count is not None:
+            self.count_history(measure_steps(self.uncounted, count))
+
+    def count_history(self, sizes: list[tuple[int, int]]):
+        """Adds the sizes `measure_steps` found for the first uncounted steps."""
+        del self.uncounted[: len(sizes)]
+        for chars, tokens in sizes:
+            self.history_tokens.append(tokens)
+            self.num_of_tokens += tokens
+            self.num_of_chars += chars
+
     def get_current_user_intent(self):
         # TODO: this is used to understand the user's main goal, but it's possible
         # the latest message is an interruption. We should look for a space where
@@ -47,6 +47,25 @@ class LLMConfig(metaclass=Singleton):
         max_output_tokens: The maximum number of output tokens. This is sent to the LLM.
         input_cost_per_token: The cost per input token. This will available in logs for the user to check.
         output_cost_per_token: The cost per output token. This will available in logs for the user to check.
+        max_connections: The maximum number of keep-alive connections to one base URL shared by the async completion calls of an event loop.
+        response_cache: Whether identical completion requests are answered from a cache. Only applies at temperature 0, unless response_cache_force is set.
+        response_cache_force: Cache responses whatever the temperature.
+        response_cache_entries: The number of responses kept in memory by the response cache.
+        response_cache_dir: The directory of the response cache's on-disk sqlite database, shared by the processes of a host. Empty keeps it in memory only.
+        response_cache_size: The size limit of the on-disk response cache in bytes, least recently used responses are evicted beyond it.
+        response_cache_ttl: How long cached responses are used, in seconds. 0 uses them forever.
+        stream: Whether agents that support it stream the LLM's responses to the clients while they are written.
+        requests_per_minute: The number of requests per minute sent with one model and API key or base URL, shared by all sessions of the process. 0 is no limit.
+        tokens_per_minute: The number of prompt and completion tokens per minute sent with one model and API key or base URL. 0 is no limit.
+        rate_limit_dir: A directory for the state of the rate limits, so that all backend processes of a host share them. Empty keeps them per process.
+        max_concurrent_requests: The number of requests sent with one model and API key or base URL at once by all sessions of the process, further ones wait for one to end. 0 is no limit.
+        routing: How calls are spread over the endpoints of a model: 'least_requests' or 'latency'.
+        endpoint_eject_failures: The number of failed calls in a row after which an endpoint is left out for a while.
+        endpoint_eject_time: How long an endpoint is left out after failing, in seconds. It doubles with every further failure.
+        hedge_percentile: Async completions that take longer than this percentile of the model's recent latencies are sent again, to the same or another endpoint, and the first response is used. 0 is off.
+        hedge_budget: The number of duplicate requests an LLM, i.e. a session, may send for slow completions.
+        circuit_breaker_failures: The number of failed calls in a row to a base URL for a model after which calls to it fail right away for a while. Rate limits do not count. 0 is off.
+        circuit_breaker_cooldown: How long calls to a failing base URL fail right away, in seconds, before one is let through again.
     """
 
     model: str = 'gpt-4o'
@@ -72,6 +91,25 @@ class LLMConfig(metaclass=Singleton):
     max_output_tokens: int | None = None
     input_cost_per_token: float | None = None
     output_cost_per_token: float | None = None
+    max_connections: int = 100
+    response_cache: bool = False
+    response_cache_force: bool = False
+    response_cache_entries: int = 256
+    response_cache_dir: str = ''
+    response_cache_size: int = 512 * 1024 * 1024
+    response_cache_ttl: int = 0
+    stream: bool = False
+    requests_per_minute: int = 0
+    tokens_per_minute: int = 0
+    rate_limit_dir: str = ''
+    max_concurrent_requests: int = 0
+    routing: str = 'least_requests'
+    endpoint_eject_failures: int = 3
+    endpoint_eject_time: int = 30
+    hedge_percentile: float = 0
+    hedge_budget: int = 20
+    circuit_breaker_failures: int = 5
+    circuit_breaker_cooldown: int = 30
 
     def defaults_to_dict(self) -> dict:
         """
@@ -153,6 +191,36 @@ class AppConfig(metaclass=Singleton):
         sandbox_timeout: The timeout for the sandbox.
         debug: Whether to enable debugging.
         enable_auto_lint: Whether to enable auto linting. This is False by default, for regular runs of the app. For evaluation, please set this to True.
+        browser_pool_min_size: The number of pre-launched browser envs to keep ready for new sessions.
+        browser_pool_max_size: The maximum number of pooled browser envs, leased and idle. 0 disables the pool.
+        browser_pool_health_check_interval: The interval in seconds between health checks of idle pooled browser envs.
+        browser_pool_lease_timeout: The maximum time in seconds a session waits for a pooled browser env.
+        browser_worker_mode: 'process' runs every browser env in its own process and Chromium, 'shared' hosts them as isolated contexts of shared Chromium workers. Shared workers start sessions faster and use less memory, but a worker serves its envs' requests one at a time, all of them use the launch options of the first, and a worker that hangs or crashes restarts every session it hosts.
+        browser_worker_max_contexts: The maximum number of browser envs hosted by one shared worker.
+        browser_shared_memory: Whether browser workers send screenshots and DOM/AXTree payloads through shared memory instead of the pipe.
+        browser_shm_slots: The number of shared memory slots per browser worker.
+        browser_shm_slot_size: The size in bytes of a shared memory slot. Larger payloads go through the pipe.
+        browser_screenshot_format: The default browser screenshot format, 'jpeg', 'webp' or 'png'.
+        browser_screenshot_quality: The quality of lossy browser screenshots, 1-100.
+        browser_screenshot_max_width: Browser screenshots wider than this are downscaled. 0 keeps the full width.
+        browser_screenshot_max_height: Browser screenshots taller than this are downscaled. 0 keeps the full height.
+        browser_screenshot_thumbnail_width: The width of a thumbnail sent along with browser screenshots. 0 disables thumbnails.
+        browser_screenshot_dedup: Whether to skip re-encoding and re-sending browser screenshots that did not change.
+        browser_screenshot_workers: The number of threads encoding browser screenshots per process.
+        browser_tree_diffs: Whether browser workers send the DOM and AXTree as diffs against the previous step.
+        browser_tree_keyframe_interval: The number of steps between full DOM and AXTree snapshots when sending diffs.
+        browser_load_profile: How the browser loads pages: 'full', 'no-media' or 'text-only'. Agents and sessions can pick their own.
+        browser_blocked_domains: Comma separated domains blocked by the 'no-media' and 'text-only' load profiles, on top of the built-in ad and tracker list.
+        browser_asset_cache_dir: The directory of the disk cache for static page assets shared by all browsers on the host. Empty disables it.
+        browser_asset_cache_size: The size limit of the browser asset cache in bytes, least recently used assets are evicted beyond it.
+        browser_heartbeat_interval: How often browser workers report that they are alive, in seconds. 0 disables the browser supervisor.
+        browser_heartbeat_timeout: How long a browser worker may go without a heartbeat before it is restarted, in seconds.
+        browser_hang_timeout: How long a browser worker may be stuck on a single request before it is restarted, in seconds. Requests with a longer timeout, e.g. batches of actions, get that long.
+        browser_max_restarts: How many times in a row a crashing browser env is restarted before giving up on it.
+        browser_restore_sessions: Whether to snapshot tabs, cookies and storage after each browser step, to restore them when a browser worker is restarted. Snapshots add a round trip to Chromium to every step, so this is off by default.
+        browser_text_extractor: How the page text is extracted from the DOM snapshot: 'html2text' converts the flattened HTML, 'dom' renders it directly and caches unchanged subtrees, which is faster but formats some pages differently.
+        browser_prefetch_tabs: How many likely next pages to load in hidden tabs while the agent thinks, promoted when the next action goes there. 0 disables prefetching.
+        browser_prefetch_budget: How many bytes prefetching may download per browser session.
     """
 
     llm: LLMConfig = field(default_factory=LLMConfig)
@@ -189,6 +257,36 @@ class AppConfig(metaclass=Singleton):
     enable_auto_lint: bool = (
         False  # once enabled, OpenDevin would lint files after editing
     )
+    browser_pool_min_size: int = 0
+    browser_pool_max_size: int = 0
+    browser_pool_health_check_interval: int = 30
+    browser_pool_lease_timeout: int = 60
+    browser_worker_mode: str = 'process'
+    browser_worker_max_contexts: int = 16
+    browser_shared_memory: bool = False
+    browser_shm_slots: int = 4
+    browser_shm_slot_size: int = 8 * 1024 * 1024
+    browser_screenshot_format: str = 'jpeg'
+    browser_screenshot_quality: int = 10
+    browser_screenshot_max_width: int = 0
+    browser_screenshot_max_height: int = 0
+    browser_screenshot_thumbnail_width: int = 0
+    browser_screenshot_dedup: bool = True
+    browser_screenshot_workers: int = 2
+    browser_tree_diffs: bool = False
+    browser_tree_keyframe_interval: int = 10
+    browser_load_profile: str = 'full'
+    browser_blocked_domains: str = ''
+    browser_asset_cache_dir: str = ''
+    browser_asset_cache_size: int = 512 * 1024 * 1024
+    browser_heartbeat_interval: int = 5
+    browser_heartbeat_timeout: int = 30
+    browser_hang_timeout: int = 120
+    browser_max_restarts: int = 3
+    browser_restore_sessions: bool = False
+    browser_text_extractor: str = 'html2text'
+    browser_prefetch_tabs: int = 0
+    browser_prefetch_budget: int = 20 * 1024 * 1024
 
     defaults_dict: ClassVar[dict] = {}
 
@@ -483,9 +581,13 @@ def get_model_port_arg(model_port_config_file: str, model_name: str):
 
     with open(model_port_config_file) as f:
         model_port_config = json.load(f)[model_name]
-    api_base = _get_api_base(model_port_config, model_name)
+    # several servers of the model can be given as a list of endpoints with weights
+    endpoints = [
+        (_get_api_base(v, model_name), float(v.get('weight', 1)))
+        for v in model_port_config.get('endpoints', [model_port_config])
+    ]
     model = _get_model_full_name(model_port_config)
-    return model, api_base
+    return model, endpoints
 
 
 # Command line arguments
@@ -40,6 +40,15 @@ class LLMOutputError(Exception):
         super().__init__(message)
 
 
+class LLMCircuitOpenError(Exception):
+    def __init__(self, base_url=None):
+        if base_url is not None:
+            message = f'Calls to {base_url} keep failing, not sending more for now'
+        else:
+            message = 'Calls to the LLM keep failing, not sending more for now'
+        super().__init__(message)
+
+
 class SandboxInvalidBackgroundCommandError(Exception):
     def __init__(self, id=None):
         if id is not None:
@@ -71,6 +80,11 @@ class BrowserUnavailableException(Exception):
         super().__init__(message)
 
 
+class BrowserCrashedError(BrowserUnavailableException):
+    def __init__(self, message='Browser environment crashed and is being restarted'):
+        super().__init__(message)
+
+
 # These exceptions get sent back to the LLM
 class AgentMalformedActionError(Exception):
     def __init__(self, message='Malformed response'):
@@ -72,10 +72,10 @@ async def main(
             logger.info(
                 f'Running agent {args.agent_cls} (model: {args.model_name}, llm_config: {args.llm_config}) with task: "{task}"'
             )
-            model, api_base = get_model_port_arg(
+            model, endpoints = get_model_port_arg(
                 llm_config.model_port_config_file, args.model_name
             )
-            llm = LLM(model=model, base_url=api_base)
+            llm = LLM(model=model, endpoints=endpoints)
         else:
             logger.info(
                 f'Running agent {args.agent_cls} (model: {llm_config.model}, llm_config: {args.llm_config}) with task: "{task}"'
@@ -106,6 +106,8 @@ async def main(
         controller.agent.runtime_tools,
         is_async=False,
         runtime_tools_config=runtime_tools_config,
+        observation_profile=controller.agent.observation_profile,
+        load_profile=controller.agent.load_profile,
     )
 
     # browser eval specific
@@ -3,11 +3,27 @@ class Metrics:
     Metrics class can record various metrics during running and evaluation.
     Currently we define the following metrics:
         accumulated_cost: the total cost (USD $) of the current LLM.
+        cache_hits: the number of completions answered from the response cache.
+        cache_misses: the number of cacheable completions sent to the LLM.
+        hedged_requests: the number of duplicate requests sent for slow completions.
+        wasted_cost: the part of accumulated_cost paid for hedged requests whose answer was not used.
+        truncated_tokens: the number of tokens cut from prompts to fit the context window.
+        completions: the number of completions paid for.
+        completion_tokens: the number of tokens of those completions.
+        last_prompt_tokens: the number of tokens of the prompt of the latest of them.
     """
 
     def __init__(self) -> None:
         self._accumulated_cost: float = 0.0
         self._costs: list[float] = []
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.hedged_requests = 0
+        self.wasted_cost = 0.0
+        self.truncated_tokens = 0
+        self.completions = 0
+        self.completion_tokens = 0
+        self.last_prompt_tokens = 0
 
     @property
     def accumulated_cost(self) -> float:
@@ -29,11 +45,26 @@ class Metrics:
         self._accumulated_cost += value
         self._costs.append(value)
 
+    def add_wasted_cost(self, value: float) -> None:
+        self.add_cost(value)
+        self.wasted_cost += value
+
     def get(self):
         """
         Return the metrics in a dictionary.
         """
-        return {'accumulated_cost': self._accumulated_cost, 'costs': self._costs}
+        return {
+            'accumulated_cost': self._accumulated_cost,
+            'costs': self._costs,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'hedged_requests': self.hedged_requests,
+            'wasted_cost': self.wasted_cost,
+            'truncated_tokens': self.truncated_tokens,
+            'completions': self.completions,
+            'completion_tokens': self.completion_tokens,
+            'last_prompt_tokens': self.last_prompt_tokens,
+        }
 
     def log(self):
         """
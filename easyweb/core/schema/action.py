@@ -44,6 +44,10 @@ class ActionTypeSchema(BaseModel):
     """Interact with the browser instance.
     """
 
+    BROWSE_PARALLEL: str = Field(default='browse_parallel')
+    """Opens several web pages side by side in new tabs.
+    """
+
     RECALL: str = Field(default='recall')
     """Searches long-term memory
     """
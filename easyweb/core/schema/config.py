@@ -33,6 +33,7 @@ class ConfigType(str, Enum):
     AGENT_MEMORY_ENABLED = 'AGENT_MEMORY_ENABLED'
     MAX_ITERATIONS = 'MAX_ITERATIONS'
     MAX_CHARS = 'MAX_CHARS'
+    BROWSER_LOAD_PROFILE = 'BROWSER_LOAD_PROFILE'
     AGENT = 'AGENT'
     E2B_API_KEY = 'E2B_API_KEY'
     SANDBOX_TYPE = 'SANDBOX_TYPE'
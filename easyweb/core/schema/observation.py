@@ -14,6 +14,10 @@ class ObservationTypeSchema(BaseModel):
     """The HTML content of a URL
     """
 
+    BROWSE_PARALLEL: str = Field(default='browse_parallel')
+    """The content of several web pages, one per tab
+    """
+
     RUN: str = Field(default='run')
     """The output of a command
     """
@@ -44,5 +48,9 @@ class ObservationTypeSchema(BaseModel):
 
     AGENT_STATE_CHANGED: str = Field(default='agent_state_changed')
 
+    THOUGHT_CHUNK: str = Field(default='thought_chunk')
+    """A piece of the agent's response while the LLM is still writing it
+    """
+
 
 ObservationType = ObservationTypeSchema()
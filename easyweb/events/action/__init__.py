@@ -7,7 +7,7 @@ from .agent import (
     AgentSummarizeAction,
     ChangeAgentStateAction,
 )
-from .browse import BrowseInteractiveAction, BrowseURLAction
+from .browse import BrowseInteractiveAction, BrowseParallelAction, BrowseURLAction
 from .commands import CmdKillAction, CmdRunAction, IPythonRunCellAction
 from .empty import NullAction
 from .files import FileReadAction, FileWriteAction
@@ -22,6 +22,7 @@ __all__ = [
     'CmdKillAction',
     'BrowseURLAction',
     'BrowseInteractiveAction',
+    'BrowseParallelAction',
     'FileReadAction',
     'FileWriteAction',
     'AgentRecallAction',
@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import ClassVar
 
 from easyweb.core.schema import ActionType
@@ -30,6 +30,9 @@ class BrowseInteractiveAction(Action):
     browser_actions: str
     thought: str = ''
     browsergym_send_msg_to_user: str = ''
+    # run each call in browser_actions as its own step in a single round trip,
+    # stopping at the first error, and only observe the page at the end
+    batch: bool = False
     action: str = ActionType.BROWSE_INTERACTIVE
     runnable: ClassVar[bool] = True
 
@@ -43,3 +46,40 @@ class BrowseInteractiveAction(Action):
             ret += f'THOUGHT: {self.thought}\n'
         ret += f'BROWSER_ACTIONS: {self.browser_actions}'
         return ret
+
+
+@dataclass
+class BrowseParallelAction(Action):
+    """
+    Browses several pages at once, each in a new tab of the session's browser.
+
+    Each URL in `urls` opens a tab of its own, and so does each list of
+    BrowserGym actions in `action_lists`; the URLs' tabs come first.
+    """
+
+    urls: list[str] = field(default_factory=list)
+    action_lists: list[list[str]] = field(default_factory=list)
+    thought: str = ''
+    # close the tabs once they have been observed
+    close_tabs: bool = True
+    action: str = ActionType.BROWSE_PARALLEL
+    runnable: ClassVar[bool] = True
+
+    @property
+    def tabs(self) -> list[list[str]]:
+        """The BrowserGym actions to run in each tab."""
+        return [[f'goto("{url}")'] for url in self.urls] + [
+            list(actions) for actions in self.action_lists
+        ]
+
+    @property
+    def message(self) -> str:
+        return f'Browsing {len(self.tabs)} tabs in parallel'
+
+    def __str__(self) -> str:
+        ret = '**BrowseParallelAction**\n'
+        if self.thought:
+            ret += f'THOUGHT: {self.thought}\n'
+        for i, actions in enumerate(self.tabs):
+            ret += f'TAB {i}: {"; ".join(actions)}\n'
+        return ret.rstrip('\n')
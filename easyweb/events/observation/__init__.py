@@ -1,5 +1,5 @@
-from .agent import AgentStateChangedObservation
-from .browse import BrowserOutputObservation
+from .agent import AgentStateChangedObservation, AgentThoughtChunkObservation
+from .browse import BrowserOutputObservation, BrowserParallelObservation
 from .commands import CmdOutputObservation, IPythonRunCellObservation
 from .delegate import AgentDelegateObservation
 from .empty import NullObservation
@@ -15,11 +15,13 @@ __all__ = [
     'CmdOutputObservation',
     'IPythonRunCellObservation',
     'BrowserOutputObservation',
+    'BrowserParallelObservation',
     'FileReadObservation',
     'FileWriteObservation',
     'AgentRecallObservation',
     'ErrorObservation',
     'AgentStateChangedObservation',
+    'AgentThoughtChunkObservation',
     'AgentDelegateObservation',
     'SuccessObservation',
 ]
@@ -17,3 +17,19 @@ class AgentStateChangedObservation(Observation):
     @property
     def message(self) -> str:
         return ''
+
+
+@dataclass
+class AgentThoughtChunkObservation(Observation):
+    """
+    This data class represents a piece of the response the LLM is streaming for
+    an agent step. It is only sent to clients, never stored or added to the
+    history; the complete response arrives as the step's action.
+    """
+
+    iteration: int = 0
+    observation: str = ObservationType.THOUGHT_CHUNK
+
+    @property
+    def message(self) -> str:
+        return ''
@@ -21,6 +21,8 @@ class BrowserOutputObservation(Observation):
     active_page_index: int = -1
     dom_object: dict = field(default_factory=dict, repr=False)  # don't show in repr
     axtree_object: dict = field(default_factory=dict, repr=False)  # don't show in repr
+    # the accessibility tree flattened to text by the browser worker
+    axtree_txt: str = field(default='', repr=False)
     extra_element_properties: dict = field(
         default_factory=dict, repr=False
     )  # don't show in repr
@@ -28,6 +30,11 @@ class BrowserOutputObservation(Observation):
     last_browser_action_error: str = ''
     focused_element_bid: str = ''
     scroll_position: dict = field(default_factory=dict, repr=False)
+    screenshot_thumbnail: str = field(default='', repr=False)
+    # the screenshot is the same as in the previous browser observation
+    screenshot_unchanged: bool = False
+    # url and error after each action of a batch, see BrowseInteractiveAction.batch
+    batch_checks: list = field(default_factory=list)
 
     @property
     def message(self) -> str:
@@ -47,3 +54,39 @@ class BrowserOutputObservation(Observation):
             f'Focused element bid: {self.focused_element_bid}\n'
             f'CONTENT: {self.content[:1000]}\n'
         )
+
+
+@dataclass
+class BrowserParallelObservation(Observation):
+    """
+    The output of a BrowseParallelAction: one BrowserOutputObservation per tab,
+    in the order of the action's tabs. `content` has the text of all of them.
+    """
+
+    tabs: list = field(default_factory=list)
+    observation: str = ObservationType.BROWSE_PARALLEL
+
+    def __post_init__(self):
+        # deserialized events have the tabs as dicts
+        self.tabs = [
+            BrowserOutputObservation(**tab) if isinstance(tab, dict) else tab
+            for tab in self.tabs
+        ]
+
+    @property
+    def error(self) -> bool:
+        return any(tab.error for tab in self.tabs)
+
+    @property
+    def message(self) -> str:
+        return 'Visited ' + ', '.join(tab.url for tab in self.tabs)
+
+    def __str__(self) -> str:
+        ret = '**BrowserParallelObservation**\n'
+        for i, tab in enumerate(self.tabs):
+            ret += (
+                f'TAB {i}: {tab.url}\n'
+                f'Error: {tab.last_browser_action_error or tab.error}\n'
+                f'CONTENT: {tab.content[:1000]}\n'
+            )
+        return ret
@@ -7,7 +7,11 @@ from easyweb.events.action.agent import (
     AgentRejectAction,
     ChangeAgentStateAction,
 )
-from easyweb.events.action.browse import BrowseInteractiveAction, BrowseURLAction
+from easyweb.events.action.browse import (
+    BrowseInteractiveAction,
+    BrowseParallelAction,
+    BrowseURLAction,
+)
 from easyweb.events.action.commands import (
     CmdKillAction,
     CmdRunAction,
@@ -26,6 +30,7 @@ actions = (
     IPythonRunCellAction,
     BrowseURLAction,
     BrowseInteractiveAction,
+    BrowseParallelAction,
     FileReadAction,
     FileWriteAction,
     AgentRecallAction,
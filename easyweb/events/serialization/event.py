@@ -13,8 +13,11 @@ UNDERSCORE_KEYS = ['id', 'timestamp', 'source', 'cause']
 
 DELETE_FROM_MEMORY_EXTRAS = {
     'screenshot',
+    'screenshot_thumbnail',
+    'screenshot_unchanged',
     'dom_object',
     'axtree_object',
+    'axtree_txt',
     'open_pages_urls',
     'active_page_index',
     'last_browser_action',
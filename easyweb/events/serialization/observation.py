@@ -1,5 +1,11 @@
-from easyweb.events.observation.agent import AgentStateChangedObservation
-from easyweb.events.observation.browse import BrowserOutputObservation
+from easyweb.events.observation.agent import (
+    AgentStateChangedObservation,
+    AgentThoughtChunkObservation,
+)
+from easyweb.events.observation.browse import (
+    BrowserOutputObservation,
+    BrowserParallelObservation,
+)
 from easyweb.events.observation.commands import (
     CmdOutputObservation,
     IPythonRunCellObservation,
@@ -17,6 +23,7 @@ observations = (
     CmdOutputObservation,
     IPythonRunCellObservation,
     BrowserOutputObservation,
+    BrowserParallelObservation,
     FileReadObservation,
     FileWriteObservation,
     AgentRecallObservation,
@@ -24,6 +31,7 @@ observations = (
     SuccessObservation,
     ErrorObservation,
     AgentStateChangedObservation,
+    AgentThoughtChunkObservation,
 )
 
 OBSERVATION_TYPE_TO_CLASS = {
@@ -24,6 +24,8 @@ class EventStream:
     # For each subscriber ID, there is a stack of callback functions - useful
     # when there are agent delegates
     _subscribers: dict[str, list[Callable]]
+    # subscribers that also get transient events, see add_transient_event
+    _transient_subscribers: dict[str, Callable]
     _cur_id: int
     _lock: asyncio.Lock
     _file_store: FileStore
@@ -32,6 +34,7 @@ class EventStream:
         self.sid = sid
         self._file_store = get_file_store()
         self._subscribers = {}
+        self._transient_subscribers = {}
         self._cur_id = 0
         self._lock = asyncio.Lock()
         self._reinitialize_from_file_store()
@@ -85,6 +88,12 @@ class EventStream:
         else:
             self._subscribers[id] = [callback]
 
+    def subscribe_transient(self, id: EventStreamSubscriber, callback: Callable):
+        self._transient_subscribers[id] = callback
+
+    def unsubscribe_transient(self, id: EventStreamSubscriber):
+        self._transient_subscribers.pop(id, None)
+
     def unsubscribe(self, id: EventStreamSubscriber):
         if id not in self._subscribers:
             logger.warning('Subscriber not found during unsubscribe: ' + id)
@@ -108,3 +117,13 @@ class EventStream:
         for key, stack in self._subscribers.items():
             callback = stack[-1]
             await callback(event)
+
+    async def add_transient_event(self, event: Event, source: EventSource):
+        """
+        Passes an event on to the transient subscribers only, without an id and
+        without storing it, e.g. the pieces of a response the LLM is streaming.
+        """
+        event._timestamp = datetime.now()  # type: ignore [attr-defined]
+        event._source = source  # type: ignore [attr-defined]
+        for callback in list(self._transient_subscribers.values()):
+            await callback(event)
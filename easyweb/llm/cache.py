@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any
+
+from litellm import ModelResponse
+
+# completion parameters that don't change what the model answers
+_IGNORED_PARAMS = frozenset(
+    {'api_key', 'base_url', 'api_version', 'timeout', 'client', 'metadata'}
+)
+
+
+def cache_key(params: dict) -> str:
+    """A stable hash of the completion parameters that decide the response."""
+    relevant = {
+        name: value
+        for name, value in params.items()
+        if name not in _IGNORED_PARAMS and value is not None
+    }
+    data = json.dumps(relevant, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Cache of LLM responses by request, for re-runs and replays of the same prompts.
+
+    Recently used responses are kept in memory, up to `entries` of them. With a
+    `directory`, responses also go to a sqlite database there, which the
+    processes of a host share and which survives restarts; once it holds more
+    than `max_size` bytes of responses the least recently used ones are evicted.
+    Responses older than `ttl` seconds are not used, 0 keeps them forever.
+    """
+
+    def __init__(
+        self,
+        entries: int = 256,
+        directory: str = '',
+        max_size: int = 512 * 1024 * 1024,
+        ttl: int = 0,
+    ):
+        self.entries = entries
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        # bytes written to the database since it was last measured
+        self.written = 0
+        self.db: sqlite3.Connection | None = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.db = sqlite3.connect(
+                os.path.join(directory, 'responses.sqlite'),
+                timeout=30,
+                check_same_thread=False,
+                isolation_level=None,
+            )
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, '
+                'response TEXT, size INTEGER, created REAL, used REAL)'
+            )
+            self.db.execute('CREATE INDEX IF NOT EXISTS used ON responses (used)')
+
+    def _fresh(self, created: float) -> bool:
+        return not self.ttl or time.time() - created < self.ttl
+
+    def get(self, key: str) -> ModelResponse | None:
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None and not self._fresh(entry[0]):
+                del self.memory[key]
+                entry = None
+            if entry is not None:
+                self.memory.move_to_end(key)
+            elif self.db is not None:
+                row = self.db.execute(
+                    'SELECT created, response FROM responses WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None and self._fresh(row[0]):
+                    self.db.execute(
+                        'UPDATE responses SET used = ? WHERE key = ?',
+                        (time.time(), key),
+                    )
+                    entry = row
+                    self._remember(key, entry)
+        if entry is None:
+            return None
+        response = ModelResponse(**json.loads(entry[1]))
+        # it was paid for when it was cached
+        response._hidden_params['cache_hit'] = True
+        return response
+
+    def put(self, key: str, response: Any):
+        if isinstance(response, ModelResponse):
+            data = response.model_dump(warnings=False)
+        else:
+            data = dict(response)
+        entry = (time.time(), json.dumps(data, default=str))
+        with self.lock:
+            self._remember(key, entry)
+            if self.db is not None:
+                self.db.execute(
+                    'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)',
+                    (key, entry[1], len(entry[1]), entry[0], entry[0]),
+                )
+                self.written += len(entry[1])
+                if self.written > self.max_size // 10:
+                    self.written = 0
+                    self._evict()
+
+    def _remember(self, key: str, entry: tuple[float, str]):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.entries:
+            self.memory.popitem(last=False)
+
+    def _evict(self):
+        """Removes the least recently used responses until the database is below 90% of its size."""
+        (total,) = self.db.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM responses'
+        ).fetchone()
+        if total <= self.max_size:
+            return
+        evicted = 0
+        keys = []
+        for key, size in self.db.execute(
+            'SELECT key, size FROM responses ORDER BY used'
+        ).fetchall():
+            if total - evicted <= self.max_size * 0.9:
+                break
+            keys.append((key,))
+            evicted += size
+        self.db.executemany('DELETE FROM responses WHERE key = ?', keys)
+
+
+@lru_cache
+def get_response_cache(
+    entries: int, directory: str, max_size: int, ttl: int
+) -> ResponseCache:
+    """One cache per process, shared by its LLMs."""
+    return ResponseCache(entries, directory, max_size, ttl)
@@ -0,0 +1,60 @@
+import asyncio
+import hashlib
+import os
+import weakref
+
+import httpx
+from openai import AsyncOpenAI
+
+# connections to one base URL stay open this long between calls, in seconds
+KEEPALIVE_EXPIRY = 60
+
+# per event loop, since httpx connections can only be used by the loop that
+# opened them
+_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def get_async_openai_client(
+    base_url: str | None,
+    api_key: str | None,
+    max_connections: int = 100,
+) -> AsyncOpenAI:
+    """
+    The AsyncOpenAI client of the running event loop for `base_url` and `api_key`.
+
+    All LLMs of the loop that talk to the same endpoint share one keep-alive
+    connection pool of up to `max_connections` connections, so that concurrent
+    sessions don't each pay for their own TCP and TLS handshakes. Retries are
+    left to the caller.
+    """
+    loop = asyncio.get_running_loop()
+    clients = _clients.setdefault(loop, {})
+    key = (
+        base_url,
+        hashlib.sha256(api_key.encode()).hexdigest() if api_key else None,
+    )
+    client = clients.get(key)
+    if client is None or client.is_closed():
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+        )
+        client = AsyncOpenAI(
+            # local OpenAI-compatible servers often take any key
+            api_key=api_key or os.environ.get('OPENAI_API_KEY') or 'EMPTY',
+            base_url=base_url,
+            http_client=http_client,
+            max_retries=0,
+        )
+        clients[key] = client
+    return client
+
+
+async def close_async_clients():
+    """Closes the connection pools of the running event loop."""
+    clients = _clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.close()
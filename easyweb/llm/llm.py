@@ -1,16 +1,23 @@
+import asyncio
+import inspect
+import time
 import warnings
 from functools import partial
+from typing import Any, Awaitable, Callable
 
 with warnings.catch_warnings():
     warnings.simplefilter('ignore')
     import litellm
+from litellm import acompletion as litellm_acompletion
 from litellm import completion as litellm_completion
 from litellm import completion_cost as litellm_completion_cost
 from litellm.exceptions import (
     APIConnectionError,
-    BadRequestError,
+    ContextWindowExceededError,
+    InternalServerError,
     RateLimitError,
     ServiceUnavailableError,
+    Timeout,
 )
 from litellm.types.utils import CostPerToken
 from tenacity import (
@@ -24,12 +31,35 @@ from easyweb.core.config import config
 from easyweb.core.logger import easyweb_logger as logger
 from easyweb.core.logger import llm_prompt_logger, llm_response_logger
 from easyweb.core.metrics import Metrics
+from easyweb.llm.cache import cache_key, get_response_cache
+from easyweb.llm.clients import get_async_openai_client
+from easyweb.llm.prompt import (
+    FittedPrompt,
+    PromptSection,
+    fit_prompt,
+    get_token_counter,
+)
+from easyweb.llm.rate_limiter import get_concurrency_limiter, get_rate_limiter
+from easyweb.llm.router import get_endpoint_router
 
 __all__ = ['LLM']
 
 litellm.drop_params = True
 message_separator = '\n\n----------\n\n'
 
+# errors that may go away when the call is sent again, to another endpoint of
+# the model or later; other errors, e.g. bad requests, would just happen again
+TRANSIENT_ERRORS = (
+    APIConnectionError,
+    Timeout,
+    ServiceUnavailableError,
+    InternalServerError,
+    RateLimitError,
+)
+
+# times a call is sent again with a prompt shrunk to fit the context window
+MAX_PROMPT_SHRINKS = 3
+
 
 class LLM:
     """
@@ -63,6 +93,7 @@ class LLM:
         max_output_tokens=None,
         llm_config=None,
         metrics=None,
+        endpoints=None,
     ):
         """
         Initializes the LLM. If LLMConfig is passed, its values will be the fallback.
@@ -83,6 +114,7 @@ class LLM:
             llm_timeout (int, optional): The maximum time to wait for a response in seconds. Defaults to LLM_TIMEOUT.
             llm_temperature (float, optional): The temperature for LLM sampling. Defaults to LLM_TEMPERATURE.
             metrics (Metrics, optional): The metrics object to use. Defaults to None.
+            endpoints (list, optional): The (base URL, weight) pairs of the servers to spread the calls over. Defaults to just base_url.
         """
         if llm_config is None:
             llm_config = config.llm
@@ -118,6 +150,9 @@ class LLM:
             else llm_config.max_output_tokens
         )
         metrics = metrics if metrics is not None else Metrics()
+        endpoints = endpoints or [(base_url, 1.0)]
+        if base_url is None:
+            base_url = endpoints[0][0]
 
         logger.info(f'Initializing LLM with model: {model}')
         self.model_name = model
@@ -129,6 +164,49 @@ class LLM:
         self.llm_timeout = llm_timeout
         self.custom_llm_provider = custom_llm_provider
         self.metrics = metrics
+        self.max_connections = llm_config.max_connections
+        # shared by the LLMs of the model, so that they see each other's calls
+        self.router = get_endpoint_router(
+            self.model_name,
+            tuple((url, float(weight)) for url, weight in endpoints),
+            llm_config.routing,
+            llm_config.endpoint_eject_failures,
+            llm_config.endpoint_eject_time,
+            TRANSIENT_ERRORS,
+            llm_config.circuit_breaker_failures,
+            llm_config.circuit_breaker_cooldown,
+            # rate limits are retried with backoff, the server is up
+            (RateLimitError,),
+        )
+        # slow async completions are sent twice, a limited number of times
+        self.hedge_percentile = llm_config.hedge_percentile
+        self.hedges_left = llm_config.hedge_budget
+        # answers repeated requests, e.g. of evaluation re-runs, without the LLM
+        self.cache = (
+            get_response_cache(
+                llm_config.response_cache_entries,
+                llm_config.response_cache_dir,
+                llm_config.response_cache_size,
+                llm_config.response_cache_ttl,
+            )
+            if llm_config.response_cache
+            else None
+        )
+        self.cache_force = llm_config.response_cache_force
+        # waits just long enough to stay within the provider's rate limits
+        self.rate_limiter = get_rate_limiter(
+            self.model_name,
+            self.api_key or self.base_url,
+            llm_config.requests_per_minute,
+            llm_config.tokens_per_minute,
+            llm_config.rate_limit_dir,
+        )
+        # and keeps the requests running at once few enough not to overwhelm it
+        self.concurrency = get_concurrency_limiter(
+            self.model_name,
+            self.api_key or self.base_url,
+            llm_config.max_concurrent_requests,
+        )
 
         # litellm actually uses base Exception here for unknown model
         self.model_info = None
@@ -173,8 +251,29 @@ class LLM:
             completion_params['top_p'] = llm_top_p
 
         self._completion = partial(litellm_completion, **completion_params)
+        self._acompletion = partial(litellm_acompletion, **completion_params)
 
         completion_unwrapped = self._completion
+        acompletion_unwrapped = self._acompletion
+        # OpenAI-compatible endpoints are called through a connection pool
+        # shared by all LLMs of the event loop, litellm pools the others itself
+        try:
+            provider = litellm.get_llm_provider(
+                model=self.model_name,
+                custom_llm_provider=custom_llm_provider,
+                api_base=self.base_url,
+            )[1]
+        except Exception:
+            provider = None
+        pooled = provider == 'openai'
+
+        def endpoint_kwargs(kwargs, base_url):
+            kwargs = {**kwargs, 'base_url': base_url}
+            if pooled and 'client' not in kwargs:
+                kwargs['client'] = get_async_openai_client(
+                    base_url, self.api_key, self.max_connections
+                )
+            return kwargs
 
         def attempt_on_error(retry_state):
             logger.error(
@@ -183,43 +282,431 @@ class LLM:
             )
             return True
 
-        @retry(
+        def get_messages(args, kwargs):
+            if 'messages' in kwargs:
+                return kwargs['messages']
+            return args[1]
+
+        def log_prompt(args, kwargs):
+            messages = get_messages(args, kwargs)
+            debug_message = ''
+            for message in messages:
+                debug_message += message_separator + message['content']
+            llm_prompt_logger.debug(debug_message)
+
+        def response_key(args, kwargs) -> str | None:
+            if self.cache is None:
+                return None
+            params = {**completion_params, **kwargs}
+            if args:
+                params['args'] = args
+            # sampled responses are only reused when asked to
+            if params.get('temperature') != 0 and not self.cache_force:
+                return None
+            return cache_key(params)
+
+        retry_on_errors = retry(
             reraise=True,
             stop=stop_after_attempt(num_retries),
             wait=wait_random_exponential(min=retry_min_wait, max=retry_max_wait),
-            retry=retry_if_exception_type(
-                (
-                    RateLimitError,
-                    APIConnectionError,
-                    ServiceUnavailableError,
-                    BadRequestError,
-                )
-            ),
+            retry=retry_if_exception_type(TRANSIENT_ERRORS),
             after=attempt_on_error,
         )
+
+        def shrink_messages(hook, shrinks, args, kwargs):
+            """The arguments with the messages `hook` shrank to fit the context window, None if it can't."""
+            if hook is None or shrinks >= MAX_PROMPT_SHRINKS:
+                return None
+            messages = hook(get_messages(args, kwargs))
+            if messages is None:
+                return None
+            logger.warning('The prompt is too long for the LLM, sending a shorter one.')
+            if 'messages' in kwargs or len(args) < 2:
+                return args, {**kwargs, 'messages': messages}
+            return (args[0], messages, *args[2:]), kwargs
+
+        @retry_on_errors
         def wrapper(*args, **kwargs):
-            if 'messages' in kwargs:
-                messages = kwargs['messages']
+            log_prompt(args, kwargs)
+            key = response_key(args, kwargs)
+            resp = self._cached_response(key)
+            if resp is None:
+                # wait for the rate limits without holding a slot others could use
+                wait, reserved = self._reserve(get_messages(args, kwargs))
+                time.sleep(wait)
+                with self.concurrency:
+                    resp = self.router.call(
+                        lambda base_url: completion_unwrapped(
+                            *args, **{**kwargs, 'base_url': base_url}
+                        )
+                    )
+                self._charge(resp, reserved)
+                self._cache_response(key, resp)
+            message_back = resp['choices'][0]['message']['content']
+            llm_response_logger.debug(message_back)
+            return resp
+
+        @retry_on_errors
+        async def async_wrapper(*args, **kwargs):
+            log_prompt(args, kwargs)
+            key = response_key(args, kwargs)
+            resp = self._cached_response(key)
+            if resp is None:
+                messages = get_messages(args, kwargs)
+
+                async def send():
+                    wait, reserved = self._reserve(messages)
+                    await asyncio.sleep(wait)
+                    async with self.concurrency:
+                        started = time.monotonic()
+                        resp = await self.router.acall(
+                            lambda base_url: acompletion_unwrapped(
+                                *args, **endpoint_kwargs(kwargs, base_url)
+                            )
+                        )
+                    self.router.observe('response', time.monotonic() - started)
+                    self._charge(resp, reserved)
+                    return resp
+
+                async def discard(resp):
+                    self._charge_unused(resp)
+
+                resp = await self._hedge(send, 'response', messages, discard)
+                self._cache_response(key, resp)
+            message_back = resp['choices'][0]['message']['content']
+            llm_response_logger.debug(message_back)
+            return resp
+
+        @retry_on_errors
+        async def open_stream(*args, **kwargs):
+            wait, reserved = self._reserve(get_messages(args, kwargs))
+            await asyncio.sleep(wait)
+            # the slot and the endpoint stay taken until the stream is read, see
+            # stream_wrapper
+            await self.concurrency.aacquire()
+            tried: list = []
+            try:
+                while True:
+                    endpoint = self.router.pick(tried)
+                    started = self.router.start(endpoint)
+                    try:
+                        stream = await acompletion_unwrapped(
+                            *args,
+                            stream=True,
+                            **endpoint_kwargs(kwargs, endpoint.base_url),
+                        )
+                    except BaseException as e:
+                        self.router.finish(endpoint, started, e)
+                        tried.append(endpoint)
+                        if self.router.failover(e, tried):
+                            continue
+                        raise
+                    return stream, reserved, endpoint, started
+            except BaseException:
+                self.concurrency.release()
+                raise
+
+        # only opening the stream is retried, what was passed on can't be taken back
+        async def stream_wrapper(*args, on_delta, until, **kwargs):
+            log_prompt(args, kwargs)
+            key = response_key(args, kwargs)
+            resp = self._cached_response(key)
+            if resp is not None:
+                if on_delta is not None:
+                    await on_delta(resp['choices'][0]['message']['content'] or '')
             else:
-                messages = args[1]
-            debug_message = ''
-            for message in messages:
-                debug_message += message_separator + message['content']
-            llm_prompt_logger.debug(debug_message)
-            resp = completion_unwrapped(*args, **kwargs)
+                messages = get_messages(args, kwargs)
+
+                # a stream is hedged until its first piece of text, and holds
+                # its slot of the concurrency limit until it is read or closed
+                async def start():
+                    stream, reserved, endpoint, started = await open_stream(
+                        *args, **kwargs
+                    )
+                    chunks = []
+                    try:
+                        async for chunk in stream:
+                            chunks.append(chunk)
+                            if chunk.choices and chunk.choices[0].delta.content:
+                                break
+                    except BaseException as e:
+                        try:
+                            await _close_stream(stream)
+                        finally:
+                            self.concurrency.release()
+                            self.router.finish(endpoint, started, e)
+                        raise
+                    self.router.observe('first_token', time.monotonic() - started)
+                    return stream, chunks, reserved, endpoint, started
+
+                async def discard(opened):
+                    stream, _, _, endpoint, started = opened
+                    try:
+                        await _close_stream(stream)
+                    finally:
+                        self.concurrency.release()
+                        self.router.finish(endpoint, started, asyncio.CancelledError())
+                    self._charge_prompt(messages)
+
+                stream, chunks, reserved, endpoint, started = await self._hedge(
+                    start, 'first_token', messages, discard
+                )
+                text = ''
+                stopped = False
+
+                async def take(chunk) -> bool:
+                    nonlocal text
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if not delta:
+                        return False
+                    text += delta
+                    if on_delta is not None:
+                        await on_delta(delta)
+                    return until is not None and until(text)
+
+                try:
+                    for chunk in chunks:
+                        stopped = await take(chunk)
+                    if not stopped:
+                        async for chunk in stream:
+                            chunks.append(chunk)
+                            if await take(chunk):
+                                stopped = True
+                                break
+                    if stopped:
+                        logger.debug('Stopped the LLM early, the rest is not needed.')
+                        await _close_stream(stream)
+                except BaseException as e:
+                    # also when cancelled, so that the endpoint and its circuit
+                    # breaker don't count the call as running forever
+                    try:
+                        await _close_stream(stream)
+                    finally:
+                        self.concurrency.release()
+                        self.router.finish(endpoint, started, e)
+                    raise
+                self.concurrency.release()
+                self.router.finish(endpoint, started)
+                resp = litellm.stream_chunk_builder(
+                    chunks, messages=kwargs.get('messages')
+                )
+                if stopped:
+                    resp.choices[0].finish_reason = 'stop'
+                self._charge(resp, reserved)
+                # a response cut by `until` is only complete for this caller
+                if not stopped:
+                    self._cache_response(key, resp)
             message_back = resp['choices'][0]['message']['content']
             llm_response_logger.debug(message_back)
             return resp
 
-        self._completion = wrapper  # type: ignore
+        # context window errors go to the caller's hook, which can shrink the prompt
+        def shrinking_wrapper(*args, on_context_window_exceeded=None, **kwargs):
+            shrinks = 0
+            while True:
+                try:
+                    return wrapper(*args, **kwargs)
+                except ContextWindowExceededError:
+                    shrunk = shrink_messages(
+                        on_context_window_exceeded, shrinks, args, kwargs
+                    )
+                    if shrunk is None:
+                        raise
+                    args, kwargs = shrunk
+                    shrinks += 1
+
+        async def shrinking_async_wrapper(
+            *args, on_context_window_exceeded=None, **kwargs
+        ):
+            shrinks = 0
+            while True:
+                try:
+                    return await async_wrapper(*args, **kwargs)
+                except ContextWindowExceededError:
+                    shrunk = shrink_messages(
+                        on_context_window_exceeded, shrinks, args, kwargs
+                    )
+                    if shrunk is None:
+                        raise
+                    args, kwargs = shrunk
+                    shrinks += 1
+
+        async def shrinking_stream_wrapper(
+            *args, on_context_window_exceeded=None, **kwargs
+        ):
+            shrinks = 0
+            while True:
+                try:
+                    return await stream_wrapper(*args, **kwargs)
+                except ContextWindowExceededError:
+                    shrunk = shrink_messages(
+                        on_context_window_exceeded, shrinks, args, kwargs
+                    )
+                    if shrunk is None:
+                        raise
+                    args, kwargs = shrunk
+                    shrinks += 1
+
+        self._completion = shrinking_wrapper  # type: ignore
+        self._acompletion = shrinking_async_wrapper  # type: ignore
+        self._astream = shrinking_stream_wrapper
+
+    async def _hedge(
+        self,
+        send: Callable[[], Awaitable[Any]],
+        kind: str,
+        messages: list,
+        discard: Callable[[Any], Awaitable[None]],
+    ):
+        """
+        Awaits `send`, and if it takes longer than the `hedge_percentile` of the
+        recent latencies of `kind`, also a second `send`; the first to succeed is
+        returned. The other is cancelled, or if it got through too, `discard`ed,
+        and what it cost is added to the wasted cost in the metrics.
+        """
+        delay = None
+        if self.hedge_percentile and self.hedges_left > 0:
+            delay = self.router.percentile(kind, self.hedge_percentile)
+        first = asyncio.ensure_future(send())
+        if delay is None:
+            return await first
+        try:
+            done, _ = await asyncio.wait({first}, timeout=delay)
+        except asyncio.CancelledError:
+            first.cancel()
+            raise
+        if done or self.hedges_left <= 0:
+            return await first
+        self.hedges_left -= 1
+        self.metrics.hedged_requests += 1
+        logger.debug(f'No response after {delay:.1f}s, sending the request again.')
+        pending = {first, asyncio.ensure_future(send())}
+        winner = None
+        error: BaseException | None = None
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif winner is None:
+                        winner = task
+                    else:
+                        await discard(task.result())
+        finally:
+            for task in pending:
+                task.cancel()
+            for result in await asyncio.gather(*pending, return_exceptions=True):
+                if isinstance(result, asyncio.CancelledError):
+                    self._charge_prompt(messages)
+                elif not isinstance(result, BaseException):
+                    await discard(result)
+        if winner is None:
+            raise error  # type: ignore[misc]
+        return winner.result()
+
+    def _charge_prompt(self, messages):
+        """Adds the cost of the prompt of a cancelled hedged request to the wasted cost."""
+        if self.is_local():
+            return
+        try:
+            prompt_cost, _ = litellm.cost_per_token(
+                model=self.model_name,
+                prompt_tokens=self.get_token_count(messages),
+            )
+        except Exception:
+            return
+        self.metrics.add_wasted_cost(prompt_cost)
+
+    def _charge_unused(self, response):
+        """Adds the cost of a hedged response that was not used to the wasted cost."""
+        if self.is_local():
+            return
+        try:
+            cost = litellm_completion_cost(
+                completion_response=response, **self._cost_kwargs()
+            )
+        except Exception:
+            return
+        self.metrics.add_wasted_cost(cost)
+
+    def _reserve(self, messages) -> tuple[float, int]:
+        """Reserves a request and its prompt tokens, returns how long to wait and the tokens reserved."""
+        if not self.rate_limiter.enabled:
+            return 0.0, 0
+        tokens = 0
+        if self.rate_limiter.limits['tokens']:
+            try:
+                tokens = self.get_token_count(messages)
+            except Exception:
+                pass
+        wait = self.rate_limiter.reserve(tokens)
+        if wait > 0:
+            logger.debug(f'Waiting {wait:.1f}s to stay within the rate limits.')
+        return wait, tokens
+
+    def _charge(self, resp, reserved: int):
+        """Charges the tokens the response used beyond the reserved ones."""
+        if not self.rate_limiter.limits['tokens']:
+            return
+        try:
+            used = resp['usage']['total_tokens']
+        except (KeyError, TypeError):
+            return
+        self.rate_limiter.charge(used - reserved)
+
+    def _cached_response(self, key: str | None):
+        if key is None or self.cache is None:
+            return None
+        resp = self.cache.get(key)
+        if resp is not None:
+            self.metrics.cache_hits += 1
+            logger.debug('LLM response served from the cache.')
+        return resp
+
+    def _cache_response(self, key: str | None, resp):
+        if key is None or self.cache is None:
+            return
+        self.metrics.cache_misses += 1
+        self.cache.put(key, resp)
 
     @property
     def completion(self):
         """
         Decorator for the litellm completion function.
+
+        Transient errors are retried, others are raised right away. When the
+        prompt is too long for the model, an `on_context_window_exceeded` hook
+        is called with the messages and can return shorter ones to send
+        instead, or None to give up.
         """
         return self._completion
 
+    @property
+    def acompletion(self):
+        """
+        Decorator for the litellm acompletion function, with the same retries as completion.
+        """
+        return self._acompletion
+
+    async def astream(
+        self,
+        *args,
+        on_delta: Callable[[str], Awaitable[None]] | None = None,
+        until: Callable[[str], bool] | None = None,
+        **kwargs,
+    ):
+        """
+        Streams the response of acompletion: `on_delta` is awaited with each piece
+        of text as the LLM writes it, and the complete response is returned.
+
+        Once `until` is true for the text so far, the generation is cancelled and
+        the response ends there, e.g. as soon as it holds a complete action.
+        """
+        return await self._astream(*args, on_delta=on_delta, until=until, **kwargs)
+
     def do_completion(self, *args, **kwargs):
         """
         Wrapper for the litellm completion function.
@@ -230,6 +717,14 @@ class LLM:
         self.post_completion(resp)
         return resp
 
+    async def ado_completion(self, *args, **kwargs):
+        """
+        Wrapper for the litellm acompletion function, awaiting the response on the running event loop.
+        """
+        resp = await self._acompletion(*args, **kwargs)
+        self.post_completion(resp)
+        return resp
+
     def post_completion(self, response: str) -> None:
         """
         Post-process the completion response.
@@ -254,7 +749,79 @@ class LLM:
         Returns:
             int: The number of tokens.
         """
-        return litellm.token_counter(model=self.model_name, messages=messages)
+        if self.model_name in litellm.model_cost or any(
+            not isinstance(m.get('content'), str) for m in messages
+        ):
+            return litellm.token_counter(model=self.model_name, messages=messages)
+        # text messages to other models are counted with the tokenizer loaded once
+        # per model, and the chat format's tokens per message and for the reply
+        count = get_token_counter(self.model_name)
+        return 3 + sum(
+            3 + sum(count(value) for value in m.values() if isinstance(value, str))
+            for m in messages
+        )
+
+    def estimate_cost(self, prompt_tokens: int) -> float:
+        """
+        Estimate the cost of a completion before it is sent.
+
+        Args:
+            prompt_tokens (int): The tokens of the prompt, cut to what fits the context window.
+
+        Returns:
+            number: The cost of the prompt and of a response as long as the average so far, or of the prompt alone before any.
+        """
+        if self.is_local():
+            return 0.0
+        prompt_tokens = min(
+            prompt_tokens, max(0, self.max_input_tokens - self.max_output_tokens)
+        )
+        if self.metrics.completions:
+            completion_tokens = (
+                self.metrics.completion_tokens // self.metrics.completions
+            )
+        else:
+            # the check after the step catches a first response over the budget
+            completion_tokens = 0
+        if (
+            config.llm.input_cost_per_token is not None
+            and config.llm.output_cost_per_token is not None
+        ):
+            return (
+                prompt_tokens * config.llm.input_cost_per_token
+                + completion_tokens * config.llm.output_cost_per_token
+            )
+        try:
+            prompt_cost, completion_cost = litellm.cost_per_token(
+                model=self.model_name,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+            )
+        except Exception:
+            return 0.0
+        return prompt_cost + completion_cost
+
+    def fit_prompt(
+        self, sections: list[PromptSection], reserved: int = 0
+    ) -> FittedPrompt:
+        """
+        Joins the sections into a prompt that fits the context window along with
+        `reserved` tokens of other messages and the response, shrinking the
+        sections with the lowest priorities first.
+
+        Args:
+            sections (list): The sections of the prompt, in order.
+            reserved (int): The tokens of the other messages of the request.
+
+        Returns:
+            FittedPrompt: The prompt, its tokens and the tokens cut from each section.
+        """
+        budget = max(0, self.max_input_tokens - self.max_output_tokens - reserved)
+        fitted = fit_prompt(sections, budget, get_token_counter(self.model_name))
+        if fitted.cut:
+            self.metrics.truncated_tokens += fitted.cut_tokens
+            logger.info(f'Cut {fitted.cut} tokens to fit the prompt in {budget}.')
+        return fitted
 
     def is_local(self):
         """
@@ -283,22 +850,23 @@ class LLM:
         Returns:
             number: The cost of the response.
         """
-        extra_kwargs = {}
-        if (
-            config.llm.input_cost_per_token is not None
-            and config.llm.output_cost_per_token is not None
-        ):
-            cost_per_token = CostPerToken(
-                input_cost_per_token=config.llm.input_cost_per_token,
-                output_cost_per_token=config.llm.output_cost_per_token,
+        if getattr(response, '_hidden_params', {}).get('cache_hit'):
+            # paid for when it was cached
+            return 0.0
+        try:
+            completion_tokens = response['usage']['completion_tokens']
+        except (KeyError, TypeError):
+            completion_tokens = None
+        if completion_tokens is not None:
+            self.metrics.completions += 1
+            self.metrics.completion_tokens += completion_tokens
+            self.metrics.last_prompt_tokens = (
+                response['usage'].get('prompt_tokens') or 0
             )
-            logger.info(f'Using custom cost per token: {cost_per_token}')
-            extra_kwargs['custom_cost_per_token'] = cost_per_token
-
         if not self.is_local():
             try:
                 cost = litellm_completion_cost(
-                    completion_response=response, **extra_kwargs
+                    completion_response=response, **self._cost_kwargs()
                 )
                 self.metrics.add_cost(cost)
                 return cost
@@ -306,6 +874,19 @@ class LLM:
                 logger.warning('Cost calculation not supported for this model.')
         return 0.0
 
+    def _cost_kwargs(self) -> dict:
+        if (
+            config.llm.input_cost_per_token is None
+            or config.llm.output_cost_per_token is None
+        ):
+            return {}
+        cost_per_token = CostPerToken(
+            input_cost_per_token=config.llm.input_cost_per_token,
+            output_cost_per_token=config.llm.output_cost_per_token,
+        )
+        logger.info(f'Using custom cost per token: {cost_per_token}')
+        return {'custom_cost_per_token': cost_per_token}
+
     def __str__(self):
         if self.api_version:
             return f'LLM(model={self.model_name}, api_version={self.api_version}, base_url={self.base_url})'
@@ -315,3 +896,14 @@ class LLM:
 
     def __repr__(self):
         return str(self)
+
+
+async def _close_stream(stream):
+    """Closes the connection a response streams over, which stops its generation."""
+    for target in (getattr(stream, 'completion_stream', None), stream):
+        close = getattr(target, 'aclose', None) or getattr(target, 'close', None)
+        if close is not None:
+            result = close()
+            if inspect.isawaitable(result):
+                await result
+            return
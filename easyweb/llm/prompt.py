@@ -0,0 +1,134 @@
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable
+
+from litellm.utils import _select_tokenizer
+from tiktoken import Encoding
+
+from easyweb.core.logger import easyweb_logger as logger
+
+TRUNCATION_NOTE = '... Deleted {} lines to reduce prompt size.'
+
+
+@lru_cache(maxsize=32)
+def get_token_counter(model: str) -> Callable[[str], int]:
+    """A function counting the tokens of a text for `model`, whose tokenizer is loaded once."""
+    try:
+        tokenizer = _select_tokenizer(model=model)['tokenizer']
+    except Exception:
+        logger.warning(f'No tokenizer for {model}, assuming 4 characters per token.')
+        return lambda text: (len(text) + 3) // 4
+    if isinstance(tokenizer, Encoding):
+        return lambda text: len(tokenizer.encode(text, disallowed_special=()))
+    return lambda text: len(tokenizer.encode(text).ids)
+
+
+@dataclass
+class PromptSection:
+    """
+    A part of a prompt.
+
+    Attributes:
+        text: The text of the section.
+        title: A heading above the text, which is kept when the text is shrunk.
+        priority: Sections with lower priorities are shrunk first, sections without one are kept whole.
+        keep_end: Whether the end of the section is kept when it is shrunk, e.g. the latest of a history, rather than its beginning.
+        name: The name under which what was cut is recorded.
+    """
+
+    text: str
+    title: str = ''
+    priority: int | None = None
+    keep_end: bool = False
+    name: str = ''
+
+    @property
+    def prompt(self) -> str:
+        return f'{self.title}\n{self.text}' if self.title else self.text
+
+
+@dataclass
+class FittedPrompt:
+    """A prompt fitted to a token budget, with the tokens cut from each section by name."""
+
+    text: str
+    tokens: int
+    cut: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def cut_tokens(self) -> int:
+        return sum(self.cut.values())
+
+
+def fit_prompt(
+    sections: list[PromptSection],
+    budget: int,
+    count: Callable[[str], int],
+    separator: str = '\n\n',
+) -> FittedPrompt:
+    """
+    Joins the non-empty sections with `separator`, shrinking them by whole lines,
+    lowest priority first, until the prompt has at most `budget` tokens as
+    counted by `count`. A section is only shrunk once those with lower
+    priorities are gone; if the prompt does not fit even then, it is returned
+    as small as it gets.
+    """
+    texts = [section.prompt for section in sections]
+    tokens = [count(text) if text else 0 for text in texts]
+    overhead = count(separator) * max(0, len(sections) - 1)
+    total = sum(tokens) + overhead
+    cut: dict[str, int] = {}
+    shrinkable = sorted(
+        (i for i, section in enumerate(sections) if section.priority is not None),
+        key=lambda i: sections[i].priority,  # type: ignore[arg-type, return-value]
+    )
+    for i in shrinkable:
+        if total <= budget:
+            break
+        text, n = _shrink(sections[i], tokens[i] - (total - budget), count)
+        name = sections[i].name or str(i)
+        cut[name] = cut.get(name, 0) + tokens[i] - n
+        total += n - tokens[i]
+        texts[i], tokens[i] = text, n
+    if total > budget:
+        logger.warning(
+            f'The prompt has {total} tokens, more than the {budget} allowed.'
+        )
+    return FittedPrompt(separator.join(text for text in texts if text), total, cut)
+
+
+def _shrink(
+    section: PromptSection, allowed: int, count: Callable[[str], int]
+) -> tuple[str, int]:
+    """The most lines of the section that fit in `allowed` tokens, and their tokens."""
+    lines = section.text.splitlines(keepends=True)
+    if section.keep_end:
+        lines.reverse()
+    title = f'{section.title}\n' if section.title else ''
+
+    def keep(k: int) -> str:
+        kept = lines[:k]
+        if section.keep_end:
+            kept.reverse()
+        text = ''.join(kept).rstrip('\n')
+        note = TRUNCATION_NOTE.format(len(lines) - k)
+        if not text:
+            return f'{title}{note}' if title else ''
+        return title + (f'{note}\n{text}' if section.keep_end else f'{text}\n{note}')
+
+    # each line is counted once, the sums of their tokens are close to those of
+    # the joined lines, so that the line to cut at is found with one bisection
+    sums = [count(title) if title else 0]
+    for line in lines:
+        sums.append(sums[-1] + count(line))
+    note_tokens = count(TRUNCATION_NOTE.format(len(lines))) + 1
+    k = min(len(lines) - 1, bisect_right(sums, allowed - note_tokens) - 1)
+    k = max(k, 0)
+    text = keep(k)
+    n = count(text) if text else 0
+    while k > 0 and n > allowed:
+        k = max(0, k - max(1, k // 20))
+        text = keep(k)
+        n = count(text) if text else 0
+    return text, n
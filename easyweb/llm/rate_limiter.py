@@ -0,0 +1,202 @@
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Callable
+
+
+class RateLimiter:
+    """
+    Token buckets for the requests and tokens per minute sent with one model and key.
+
+    Each bucket holds up to a minute's worth and refills continuously. A call
+    takes what it needs right away, even if that leaves the bucket in debt, and
+    waits until the debt would be paid off; calls are thus served in order and
+    each waits exactly as long as the limits require. A limit of 0 is no limit.
+
+    With a `state_file`, the buckets live in that file, locked while they are
+    updated, so that all processes of a host using it share the same limits.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+        state_file: str = '',
+    ):
+        self.limits = {'requests': requests_per_minute, 'tokens': tokens_per_minute}
+        self.state_file = state_file
+        self.lock = threading.Lock()
+        self.state: dict = {}
+
+    @property
+    def enabled(self) -> bool:
+        return any(self.limits.values())
+
+    def reserve(self, tokens: int = 0) -> float:
+        """Takes one request and `tokens` tokens, returns how long to wait before sending, in seconds."""
+        if not self.enabled:
+            return 0.0
+        return self._update({'requests': 1, 'tokens': tokens})
+
+    def charge(self, tokens: int):
+        """Takes tokens that were used on top of the reservation, or gives back unused ones."""
+        if self.limits['tokens'] and tokens:
+            self._update({'requests': 0, 'tokens': tokens})
+
+    def _update(self, amounts: dict[str, int]) -> float:
+        with self.lock:
+            if not self.state_file:
+                self.state = self._take(self.state, amounts)
+                return self._wait(self.state)
+            with open(self.state_file, 'a+', encoding='utf-8') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    try:
+                        state = json.loads(f.read() or '{}')
+                    except ValueError:
+                        state = {}
+                    state = self._take(state, amounts)
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(state))
+                    f.flush()
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+            return self._wait(state)
+
+    def _take(self, state: dict, amounts: dict[str, int]) -> dict:
+        now = time.time()
+        elapsed = max(0.0, now - state.get('time', now))
+        new_state = {'time': now}
+        for name, limit in self.limits.items():
+            if not limit:
+                continue
+            level = state.get(name, limit) + elapsed * limit / 60
+            new_state[name] = min(min(level, limit) - amounts[name], limit)
+        return new_state
+
+    def _wait(self, state: dict) -> float:
+        waits = [
+            -state[name] * 60 / limit
+            for name, limit in self.limits.items()
+            if limit and state[name] < 0
+        ]
+        return max(waits, default=0.0)
+
+
+@lru_cache
+def get_rate_limiter(
+    model: str,
+    key: str | None,
+    requests_per_minute: int,
+    tokens_per_minute: int,
+    directory: str = '',
+) -> RateLimiter:
+    """One limiter per model and API key or base URL, shared by the LLMs of the process."""
+    state_file = ''
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        name = hashlib.sha256(f'{model}\n{key}'.encode()).hexdigest()
+        state_file = os.path.join(directory, f'{name}.json')
+    return RateLimiter(requests_per_minute, tokens_per_minute, state_file)
+
+
+class ConcurrencyLimiter:
+    """
+    Lets at most `limit` calls with one model and key run at once, from any
+    thread or event loop; the others wait for a call to end and go in the
+    order they came. A limit of 0 is no limit.
+
+    Used as `with limiter:` by threads and `async with limiter:` by coroutines.
+    """
+
+    def __init__(self, limit: int = 0):
+        self.limit = limit
+        self.running = 0
+        self.lock = threading.Lock()
+        # wake a waiting call, which takes over the slot of the one that ended
+        self.waiters: deque[Callable[[], None]] = deque()
+
+    def _enter(self) -> bool:
+        """Takes a slot if one is free and no call waits for it."""
+        if self.running < self.limit and not self.waiters:
+            self.running += 1
+            return True
+        return False
+
+    def acquire(self):
+        if not self.limit:
+            return
+        with self.lock:
+            if self._enter():
+                return
+            event = threading.Event()
+            self.waiters.append(event.set)
+        event.wait()
+
+    async def aacquire(self):
+        if not self.limit:
+            return
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def grant():
+            # a call cancelled while the slot was handed to it passes it on
+            if future.cancelled():
+                self.release()
+            else:
+                future.set_result(None)
+
+        def wake():
+            loop.call_soon_threadsafe(grant)
+
+        with self.lock:
+            if self._enter():
+                return
+            self.waiters.append(wake)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self.lock:
+                if wake in self.waiters:
+                    self.waiters.remove(wake)
+            raise
+
+    def release(self):
+        if not self.limit:
+            return
+        with self.lock:
+            if not self.waiters:
+                self.running -= 1
+                return
+            wake = self.waiters.popleft()
+        wake()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    async def __aenter__(self):
+        await self.aacquire()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+
+@lru_cache
+def get_concurrency_limiter(
+    model: str, key: str | None, limit: int
+) -> ConcurrencyLimiter:
+    """One limiter per model and API key or base URL, shared by the LLMs of the process."""
+    return ConcurrencyLimiter(limit)
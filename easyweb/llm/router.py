@@ -0,0 +1,336 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Awaitable, Callable, TypeVar
+
+from easyweb.core.exceptions import LLMCircuitOpenError
+from easyweb.core.logger import easyweb_logger as logger
+
+T = TypeVar('T')
+
+ROUTING_STRATEGIES = ('least_requests', 'latency')
+
+# weight of the latest call in the moving average of an endpoint's latency
+LATENCY_ALPHA = 0.3
+
+# latencies kept per kind for their percentiles, and needed before there are any
+LATENCY_SAMPLES = 200
+MIN_LATENCY_SAMPLES = 20
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a model's base URL that keep failing.
+
+    After `failures` failed calls in a row the circuit opens, and calls fail
+    right away instead of waiting on the endpoint. After `cooldown` seconds one
+    call is let through: if it succeeds the circuit closes, otherwise it opens
+    again. A `failures` of 0 never opens it.
+    """
+
+    def __init__(self, failures: int = 5, cooldown: float = 30):
+        self.threshold = failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: float | None = None
+        # whether the call let through after the cooldown is still running
+        self.trial = False
+        self.lock = threading.Lock()
+
+    def _blocked(self) -> bool:
+        if self.opened_at is None:
+            return False
+        return self.trial or time.time() - self.opened_at < self.cooldown
+
+    @property
+    def is_open(self) -> bool:
+        with self.lock:
+            return self._blocked()
+
+    def acquire(self) -> bool:
+        """Whether a call may be sent now; after the cooldown only one may."""
+        with self.lock:
+            if self._blocked():
+                return False
+            if self.opened_at is not None:
+                self.trial = True
+            return True
+
+    def release(self):
+        """Lets another call through after one that was cancelled."""
+        with self.lock:
+            self.trial = False
+
+    def record(self, ok: bool):
+        with self.lock:
+            self.trial = False
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.threshold and (
+                self.opened_at is not None or self.failures >= self.threshold
+            ):
+                if self.opened_at is None:
+                    logger.warning(
+                        f'{self.failures} calls in a row failed, opening the circuit.'
+                    )
+                self.opened_at = time.time()
+
+
+@lru_cache
+def get_circuit_breaker(
+    base_url: str | None, model: str, failures: int = 5, cooldown: float = 30
+) -> CircuitBreaker:
+    """
+    One breaker per base URL and model, shared by the sessions of the process:
+    a server may serve one model well and fail another.
+    """
+    return CircuitBreaker(failures, cooldown)
+
+
+class Endpoint:
+    """One server of a model, with what the router knows about it."""
+
+    def __init__(
+        self,
+        base_url: str | None,
+        weight: float = 1.0,
+        breaker: CircuitBreaker | None = None,
+    ):
+        self.base_url = base_url
+        self.weight = weight
+        self.breaker = breaker or CircuitBreaker(failures=0)
+        self.outstanding = 0
+        # moving average of the call durations in seconds, 0 until the first call
+        self.latency = 0.0
+        self.failures = 0
+        self.ejected_until = 0.0
+
+    def __repr__(self):
+        return f'Endpoint({self.base_url}, weight={self.weight})'
+
+
+class EndpointRouter:
+    """
+    Spreads the calls to a model over its endpoints.
+
+    Each call goes to the endpoint with the fewest outstanding calls for its
+    weight, or with `latency` routing, the one whose moving average latency
+    times its outstanding calls, for its weight, is lowest. An endpoint that
+    fails `eject_after` calls in a row with one of `errors` is left out for
+    `eject_time` seconds, twice as long for every further failure, up to 8
+    times; if all are left out, all are used. A call that fails with one of
+    `errors` is sent to the next endpoint until all were tried. Cancelled calls
+    count neither way.
+
+    Endpoints whose circuit breaker is open are not used; if that leaves none,
+    the call fails right away with an LLMCircuitOpenError. Errors that are
+    `breaker_exempt`, e.g. rate limits, show the endpoint is up and count
+    neither way for its breaker.
+    """
+
+    def __init__(
+        self,
+        endpoints: list[tuple[str | None, float]],
+        strategy: str = 'least_requests',
+        eject_after: int = 3,
+        eject_time: float = 30,
+        errors: tuple[type[Exception], ...] = (),
+        breaker_failures: int = 0,
+        breaker_cooldown: float = 30,
+        breaker_exempt: tuple[type[Exception], ...] = (),
+        model: str = '',
+    ):
+        if not endpoints:
+            raise ValueError('At least one endpoint is needed.')
+        if strategy not in ROUTING_STRATEGIES:
+            raise ValueError(
+                f'Unknown routing strategy {strategy}, use one of {ROUTING_STRATEGIES}.'
+            )
+        self.endpoints = [
+            Endpoint(
+                url,
+                weight,
+                get_circuit_breaker(url, model, breaker_failures, breaker_cooldown),
+            )
+            for url, weight in endpoints
+        ]
+        self.strategy = strategy
+        self.eject_after = eject_after
+        self.eject_time = eject_time
+        self.errors = errors
+        self.breaker_exempt = breaker_exempt
+        self.lock = threading.Lock()
+        self.samples: dict[str, deque] = {}
+
+    def _score(self, endpoint: Endpoint) -> float:
+        load = (endpoint.outstanding + 1) / endpoint.weight
+        if self.strategy == 'latency':
+            return endpoint.latency * load
+        return load
+
+    def pick(self, exclude: list[Endpoint] | None = None) -> Endpoint:
+        """The endpoint for the next call, other than the `exclude`d ones."""
+        exclude = list(exclude or [])
+        while True:
+            now = time.time()
+            with self.lock:
+                candidates = [
+                    e
+                    for e in self.endpoints
+                    if e not in exclude and not e.breaker.is_open
+                ]
+                if not candidates:
+                    raise LLMCircuitOpenError(
+                        ', '.join(str(e.base_url) for e in self.endpoints)
+                    )
+                healthy = [e for e in candidates if e.ejected_until <= now]
+                candidates = healthy or candidates
+                best = min(self._score(e) for e in candidates)
+                endpoint = random.choice(
+                    [e for e in candidates if self._score(e) == best]
+                )
+            if endpoint.breaker.acquire():
+                return endpoint
+            # another call took the one try after the cooldown
+            exclude.append(endpoint)
+
+    def start(self, endpoint: Endpoint) -> float:
+        """Counts a call to `endpoint` as outstanding, returns when it started."""
+        with self.lock:
+            endpoint.outstanding += 1
+        return time.monotonic()
+
+    def finish(
+        self, endpoint: Endpoint, started: float, error: Exception | None = None
+    ):
+        """Records how a call to `endpoint` went."""
+        with self.lock:
+            endpoint.outstanding -= 1
+            if isinstance(error, asyncio.CancelledError):
+                endpoint.breaker.release()
+                return
+            if isinstance(error, self.breaker_exempt):
+                endpoint.breaker.release()
+            else:
+                endpoint.breaker.record(not isinstance(error, self.errors))
+            if not isinstance(error, self.errors):
+                endpoint.failures = 0
+                if error is None:
+                    duration = time.monotonic() - started
+                    endpoint.latency = (
+                        duration
+                        if not endpoint.latency
+                        else LATENCY_ALPHA * duration
+                        + (1 - LATENCY_ALPHA) * endpoint.latency
+                    )
+                return
+            endpoint.failures += 1
+            if endpoint.failures >= self.eject_after:
+                backoff = min(2 ** (endpoint.failures - self.eject_after), 8)
+                endpoint.ejected_until = time.time() + self.eject_time * backoff
+                logger.warning(
+                    f'Leaving out {endpoint} for {self.eject_time * backoff}s after {endpoint.failures} failures.'
+                )
+
+    def observe(self, kind: str, seconds: float):
+        """Records how long a call took to get to `kind`, e.g. its response or first token."""
+        with self.lock:
+            samples = self.samples.setdefault(kind, deque(maxlen=LATENCY_SAMPLES))
+            samples.append(seconds)
+
+    def percentile(self, kind: str, percentile: float) -> float | None:
+        """The `percentile` of the recent latencies of `kind`, None while there are too few."""
+        with self.lock:
+            samples = sorted(self.samples.get(kind, ()))
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * percentile / 100))]
+
+    def failover(self, error: BaseException, tried: list[Endpoint]) -> bool:
+        """Whether a call that failed with `error` on the `tried` endpoints is sent to another."""
+        if not isinstance(error, self.errors) or len(tried) >= len(self.endpoints):
+            return False
+        logger.warning(f'{error}. Sending the call to another endpoint.')
+        return True
+
+    def call(self, send: Callable[[str | None], T]) -> T:
+        """Calls `send` with the base URL of the endpoints in turn until one succeeds."""
+        tried: list[Endpoint] = []
+        error: BaseException | None = None
+        while True:
+            try:
+                endpoint = self.pick(tried)
+            except LLMCircuitOpenError:
+                # the others are open, the error of the last one tells more
+                if error is not None:
+                    raise error
+                raise
+            started = self.start(endpoint)
+            try:
+                result = send(endpoint.base_url)
+            except BaseException as e:
+                self.finish(endpoint, started, e)
+                tried.append(endpoint)
+                if self.failover(e, tried):
+                    error = e
+                    continue
+                raise
+            self.finish(endpoint, started)
+            return result
+
+    async def acall(self, send: Callable[[str | None], Awaitable[T]]) -> T:
+        """Awaits `send` like `call`."""
+        tried: list[Endpoint] = []
+        error: BaseException | None = None
+        while True:
+            try:
+                endpoint = self.pick(tried)
+            except LLMCircuitOpenError:
+                # the others are open, the error of the last one tells more
+                if error is not None:
+                    raise error
+                raise
+            started = self.start(endpoint)
+            try:
+                result = await send(endpoint.base_url)
+            except BaseException as e:
+                self.finish(endpoint, started, e)
+                tried.append(endpoint)
+                if self.failover(e, tried):
+                    error = e
+                    continue
+                raise
+            self.finish(endpoint, started)
+            return result
+
+
+@lru_cache
+def get_endpoint_router(
+    model: str,
+    endpoints: tuple[tuple[str | None, float], ...],
+    strategy: str = 'least_requests',
+    eject_after: int = 3,
+    eject_time: float = 30,
+    errors: tuple[type[Exception], ...] = (),
+    breaker_failures: int = 0,
+    breaker_cooldown: float = 30,
+    breaker_exempt: tuple[type[Exception], ...] = (),
+) -> EndpointRouter:
+    """One router per model and endpoints, shared by the LLMs of the process."""
+    return EndpointRouter(
+        list(endpoints),
+        strategy,
+        eject_after,
+        eject_time,
+        errors,
+        breaker_failures,
+        breaker_cooldown,
+        breaker_exempt,
+        model,
+    )
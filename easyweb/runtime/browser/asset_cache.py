@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Any
+
+# static assets worth sharing between sessions, documents and XHR responses are
+# usually personalized and always go to the network
+CACHEABLE_TYPES = frozenset({'script', 'stylesheet', 'font', 'image'})
+# headers that describe the transfer, not the asset
+_DROPPED_HEADERS = frozenset(
+    {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+)
+
+
+def cache_directives(headers: dict) -> dict[str, str]:
+    directives = {}
+    for part in headers.get('cache-control', '').split(','):
+        name, _, value = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = value.strip('"')
+    return directives
+
+
+def freshness_lifetime(headers: dict) -> float:
+    """
+    How long a response may be served from a shared cache, in seconds.
+    0 if it must not be stored: private, personalized or without explicit expiry.
+    """
+    directives = cache_directives(headers)
+    if {'no-store', 'no-cache', 'private'} & directives.keys():
+        return 0
+    if 'set-cookie' in headers:
+        return 0
+    vary = headers.get('vary', '').lower()
+    if '*' in vary or 'cookie' in vary or 'authorization' in vary:
+        return 0
+    for directive in ('s-maxage', 'max-age'):
+        if directive in directives:
+            try:
+                return max(0, int(directives[directive]))
+            except ValueError:
+                return 0
+    if 'expires' in headers:
+        try:
+            expires = parsedate_to_datetime(headers['expires']).timestamp()
+            date = (
+                parsedate_to_datetime(headers['date']).timestamp()
+                if 'date' in headers
+                else time.time()
+            )
+        except (TypeError, ValueError):
+            return 0
+        return max(0, expires - date)
+    return 0
+
+
+class AssetCache:
+    """
+    Disk cache for static page assets, shared by the browser workers of a host.
+
+    Chromium can't share its own cache between browsers running at the same time,
+    so assets are served from a route handler instead. Only responses that a
+    shared HTTP cache may store are kept (no cookies, no private or uncacheable
+    responses, no requests carrying credentials), so sessions stay isolated.
+    Entries are a body file and a metadata file named by the URL hash, written
+    atomically; the metadata mtime marks the last use, and the least recently
+    used entries are evicted once the directory grows past `max_size` bytes.
+    """
+
+    def __init__(self, directory: str, max_size: int):
+        self.directory = directory
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        # bytes written since the directory was last measured
+        self.written = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url: str, suffix: str) -> str:
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.directory, key + suffix)
+
+    def get(self, url: str) -> tuple[int, dict, bytes] | None:
+        meta_path = self._path(url, '.json')
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta['url'] != url or meta['expires'] < time.time():
+                return None
+            with open(self._path(url, '.body'), 'rb') as f:
+                body = f.read()
+            if len(body) != meta['size']:
+                return None
+            os.utime(meta_path)
+        except (OSError, ValueError, KeyError):
+            return None
+        return meta['status'], meta['headers'], body
+
+    def put(self, url: str, status: int, headers: dict, body: bytes) -> bool:
+        lifetime = freshness_lifetime(headers)
+        if status != 200 or not lifetime or len(body) > self.max_size // 10:
+            return False
+        meta = {
+            'url': url,
+            'status': status,
+            'headers': {
+                key: value
+                for key, value in headers.items()
+                if key.lower() not in _DROPPED_HEADERS
+            },
+            'size': len(body),
+            'expires': time.time() + lifetime,
+        }
+        try:
+            # the body goes first, an entry only exists once its metadata does
+            self._write(self._path(url, '.body'), body)
+            self._write(self._path(url, '.json'), json.dumps(meta).encode())
+        except OSError:
+            return False
+        with self.lock:
+            self.written += len(body)
+            evict = self.written > self.max_size // 10
+            if evict:
+                self.written = 0
+        if evict:
+            self.evict()
+        return True
+
+    def _write(self, path: str, data: bytes):
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def evict(self):
+        """Removes the least recently used entries until the cache is below 90% of its size."""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.json'):
+                continue
+            body_path = entry.path[: -len('.json')] + '.body'
+            try:
+                size = os.path.getsize(body_path) + entry.stat().st_size
+                entries.append((entry.stat().st_mtime, entry.path, body_path, size))
+            except OSError:
+                continue  # evicted by another worker
+            total += size
+        entries.sort()
+        for _, meta_path, body_path, size in entries:
+            if total <= self.max_size * 0.9:
+                break
+            for path in (meta_path, body_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+
+    def handle(self, route: Any, request: Any):
+        """Playwright route handler, passes everything it doesn't cache on."""
+        if (
+            request.method != 'GET'
+            or request.resource_type not in CACHEABLE_TYPES
+            or 'authorization' in request.headers
+        ):
+            route.fallback()
+            return
+        cached = self.get(request.url)
+        if cached is not None:
+            self.hits += 1
+            status, headers, body = cached
+            route.fulfill(status=status, headers=headers, body=body)
+            return
+        self.misses += 1
+        try:
+            response = route.fetch()
+            body = response.body()
+        except Exception:
+            route.fallback()
+            return
+        headers = response.headers
+        self.put(request.url, response.status, headers, body)
+        route.fulfill(
+            status=response.status,
+            headers={
+                key: value
+                for key, value in headers.items()
+                if key.lower() not in _DROPPED_HEADERS
+            },
+            body=body,
+        )
+
+
+@lru_cache
+def get_asset_cache(directory: str, max_size: int) -> AssetCache:
+    """One cache per worker process, shared by the envs it hosts."""
+    return AssetCache(directory, max_size)
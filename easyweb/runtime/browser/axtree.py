@@ -0,0 +1,205 @@
+from browsergym.utils.obs import (
+    IGNORED_AXTREE_PROPERTIES,
+    IGNORED_AXTREE_ROLES,
+    _process_bid,
+)
+
+# flags of BrowserGym's flatten_axtree_to_str that can be switched on by name,
+# skip_generic and remove_redundant_static_text are always on
+AXTREE_FLAGS = (
+    'with_visible',
+    'with_clickable',
+    'with_center_coords',
+    'with_bounding_box_coords',
+    'with_som',
+    'filter_visible_only',
+    'filter_with_bid_only',
+    'filter_som_only',
+    'hide_bid_if_invisible',
+    'hide_all_children',
+    'hide_all_bids',
+)
+
+
+def parse_axtree_flags(flags: str) -> frozenset[str]:
+    names = frozenset(name.strip() for name in flags.split(',') if name.strip())
+    unknown = names - set(AXTREE_FLAGS)
+    if unknown:
+        raise ValueError(f'Unknown AXTree flags: {", ".join(sorted(unknown))}')
+    return names
+
+
+class AXTreeFlattener:
+    """
+    Renders the accessibility tree as text, like BrowserGym's flatten_axtree_to_str.
+
+    Every node gets a key hashed from its content, the extra properties of its
+    element and its children's keys, and the text of each subtree is remembered
+    by key, so subtrees that did not change since the previous step are not
+    rendered again. The least recently used texts are forgotten once they add
+    up to more than `max_chars`.
+    """
+
+    def __init__(self, max_chars: int = 4_000_000):
+        self.max_chars = max_chars
+        self.memo: dict[tuple, str] = {}
+        self.memo_chars = 0
+        self.hits = 0
+
+    def flatten(
+        self,
+        axtree: dict,
+        extra_properties: dict | None = None,
+        flags: frozenset[str] = frozenset(),
+    ) -> str:
+        nodes = axtree.get('nodes', []) if axtree else []
+        if not nodes:
+            return ''
+        self.hits = 0
+        self._nodes = nodes
+        self._index = {node['nodeId']: i for i, node in enumerate(nodes)}
+        self._extra = extra_properties if extra_properties is not None else {}
+        self._flags = flags
+        self._options = {flag: flag in flags for flag in AXTREE_FLAGS}
+        self._keys: dict[int, int] = {}
+        try:
+            text = self._render(0, False, '')
+        finally:
+            del self._nodes, self._index, self._extra, self._keys
+        # dicts keep insertion order, and reused texts are moved to the end
+        while self.memo_chars > self.max_chars and self.memo:
+            self.memo_chars -= len(self.memo.pop(next(iter(self.memo))))
+        return text
+
+    def reset(self):
+        self.memo.clear()
+        self.memo_chars = 0
+        self.hits = 0
+
+    def _children(self, i: int) -> list[int]:
+        node = self._nodes[i]
+        return [
+            self._index[child]
+            for child in node['childIds']
+            if child in self._index and child != node['nodeId']
+        ]
+
+    def _key(self, i: int) -> int:
+        key = self._keys.get(i)
+        if key is None:
+            # guards against cycles while the key is computed
+            self._keys[i] = 0
+            node = self._nodes[i]
+            bid = node.get('browsergym_id')
+            key = hash(
+                (
+                    node['role']['value'],
+                    repr(node.get('name')),
+                    repr(node.get('value')),
+                    bid,
+                    repr(node.get('properties')),
+                    repr(self._extra.get(bid)) if self._extra and bid else None,
+                    tuple(self._key(child) for child in self._children(i)),
+                )
+            )
+            self._keys[i] = key
+        return key
+
+    def _render(self, i: int, parent_filtered: bool, parent_name: str) -> str:
+        memo_key = (self._key(i), parent_filtered, parent_name, self._flags)
+        text = self.memo.pop(memo_key, None)
+        if text is not None:
+            self.hits += 1
+        else:
+            text = self._render_node(i, parent_filtered, parent_name)
+            self.memo_chars += len(text)
+        self.memo[memo_key] = text
+        return text
+
+    def _render_node(self, i: int, parent_filtered: bool, parent_name: str) -> str:
+        """One node and its subtree at depth 0, as flatten_axtree_to_str's dfs does it."""
+        node = self._nodes[i]
+        options = self._options
+        tree_str = ''
+        skip_node = False
+        filter_node = False
+        node_role = node['role']['value']
+        node_name = ''
+
+        if node_role in IGNORED_AXTREE_ROLES or 'name' not in node:
+            skip_node = True
+        else:
+            node_name = node['name']['value']
+            node_value = node.get('value', {}).get('value')
+            bid = node.get('browsergym_id')
+
+            attributes = []
+            for prop in node.get('properties', []):
+                if 'value' not in prop or 'value' not in prop['value']:
+                    continue
+                prop_name = prop['name']
+                prop_value = prop['value']['value']
+                if prop_name in IGNORED_AXTREE_PROPERTIES:
+                    continue
+                elif prop_name in ('required', 'focused', 'atomic'):
+                    if prop_value:
+                        attributes.append(prop_name)
+                else:
+                    attributes.append(f'{prop_name}={repr(prop_value)}')
+
+            if node_role == 'generic' and not attributes:
+                skip_node = True
+            if options['hide_all_children'] and parent_filtered:
+                skip_node = True
+
+            if node_role == 'StaticText':
+                if parent_filtered:
+                    skip_node = True
+                elif node_name in parent_name:
+                    skip_node = True
+            else:
+                filter_node, extra_attributes = _process_bid(
+                    bid,
+                    extra_properties=self._extra,
+                    with_visible=options['with_visible'],
+                    with_clickable=options['with_clickable'],
+                    with_center_coords=options['with_center_coords'],
+                    with_bounding_box_coords=options['with_bounding_box_coords'],
+                    with_som=options['with_som'],
+                    filter_visible_only=options['filter_visible_only'],
+                    filter_with_bid_only=options['filter_with_bid_only'],
+                    filter_som_only=options['filter_som_only'],
+                )
+                skip_node = skip_node or filter_node
+                attributes = extra_attributes + attributes
+
+            if not skip_node:
+                if node_role == 'generic' and not node_name:
+                    node_str = node_role
+                else:
+                    node_str = f'{node_role} {repr(node_name.strip())}'
+                if not (
+                    options['hide_all_bids']
+                    or bid is None
+                    or (
+                        options['hide_bid_if_invisible']
+                        and self._extra.get(bid, {}).get('visibility', 0) < 0.5
+                    )
+                ):
+                    node_str = f'[{bid}] ' + node_str
+                if node_value is not None:
+                    node_str += f' value={repr(node_value)}'
+                if attributes:
+                    node_str += ', '.join([''] + attributes)
+                tree_str = node_str
+
+        for child in self._children(i):
+            child_str = self._render(child, filter_node, node_name)
+            if not child_str:
+                continue
+            if not skip_node:
+                child_str = '\t' + child_str.replace('\n', '\n\t')
+            if tree_str:
+                tree_str += '\n'
+            tree_str += child_str
+        return tree_str
@@ -1,23 +1,32 @@
+import asyncio
 import atexit
-import base64
-import copy
-import io
-import json
-import multiprocessing
 import os
 import threading
-import time
 import uuid
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
-import browsergym.core  # noqa F401 (we register the openended task as a gym environment)
-import gymnasium as gym
-import html2text
 import numpy as np
-from browsergym.utils.obs import flatten_dom_to_str
-from PIL import Image
 
-from easyweb.core.exceptions import BrowserInitException
+from easyweb.core.config import config
+from easyweb.core.exceptions import (
+    BrowserInitException,
+    BrowserUnavailableException,
+)
 from easyweb.core.logger import easyweb_logger as logger
+from easyweb.runtime.browser.profile import OBSERVATION_FIELDS, ObservationProfile
+from easyweb.runtime.browser.screenshot import (
+    EncodedScreenshot,
+    ScreenshotPipeline,
+    ScreenshotSettings,
+)
+from easyweb.runtime.browser.supervisor import get_browser_supervisor
+from easyweb.runtime.browser.tree_diff import TREE_FIELDS, TreeDelta, TreeReconstructor
+from easyweb.runtime.browser.utils import (
+    get_html_text_converter,
+    image_to_jpg_base64_url,
+    image_to_png_base64_url,
+)
+from easyweb.runtime.browser.worker import BrowserWorker, acquire_shared_worker
 
 
 class BrowserEnv:
@@ -27,7 +36,6 @@ class BrowserEnv:
         browsergym_eval: str = '',
         browsergym_eval_save_dir: str = '',
     ):
-        self.html_text_converter = self.get_html_text_converter()
         self.eval_mode = False
         self.eval_dir = ''
         # EVAL only: browsergym_eval and browsergym_eval_save_dir must be provided for evaluation
@@ -42,218 +50,404 @@ class BrowserEnv:
                 self.browsergym_eval_save_dir, self.browsergym_eval.split('/')[1]
             )
             os.makedirs(self.eval_dir, exist_ok=True)
-        # Initialize browser environment process
-        multiprocessing.set_start_method('spawn', force=True)
-        self.browser_queue = multiprocessing.Queue()
-        self.agent_queue = multiprocessing.Queue()
-        self.process = multiprocessing.Process(
-            target=self.browser_process,
-        )
+        # Initialize browser environment, either in its own worker process or as
+        # a context of a shared one. Eval tasks always get their own browser.
+        self.context_id = str(uuid.uuid4())
+        # fields to extract after each step, set by the runtime from the agent
+        self.observation_profile = ObservationProfile()
+        # how pages are loaded, see LOAD_PROFILES
+        self.load_profile = config.browser_load_profile
+        # encodes screenshots that arrive as raw pixels through shared memory
+        self.screenshots = ScreenshotPipeline(ScreenshotSettings.from_config())
+        # the last screenshot sent, reused for frames the worker reports unchanged
+        self._last_screenshot = EncodedScreenshot('')
+        # rebuilds DOM and AXTree snapshots sent as diffs
+        self.trees = {field: TreeReconstructor(field) for field in TREE_FIELDS}
+        self._env_kwargs = {
+            'browsergym_eval': self.browsergym_eval,
+            'eval_dir': self.eval_dir,
+            'screenshot_settings': self.screenshots.settings.to_dict(),
+            'tree_keyframe_interval': (
+                config.browser_tree_keyframe_interval
+                if config.browser_tree_diffs
+                else 0
+            ),
+            'asset_cache': (
+                {
+                    'directory': config.browser_asset_cache_dir,
+                    'max_size': config.browser_asset_cache_size,
+                }
+                if config.browser_asset_cache_dir
+                else None
+            ),
+            'snapshot_session': config.browser_restore_sessions,
+            'text_extractor': config.browser_text_extractor,
+            'prefetch': (
+                {
+                    'tabs': config.browser_prefetch_tabs,
+                    'budget': config.browser_prefetch_budget,
+                }
+                if config.browser_prefetch_tabs > 0
+                else None
+            ),
+        }
+        # hits, misses and bytes of prefetching, as of the last step
+        self.prefetch_metrics: dict = {}
+        # tabs, cookies and storage after the last step, restored on restart
+        self._session_state: dict | None = None
+        self._restart_lock = threading.Lock()
+        # restarts since the last step that went through
+        self._restarts = 0
+        self.worker: BrowserWorker | None = None
+        self._supervisor = get_browser_supervisor()
+        try:
+            self._start_worker()
+        except BrowserUnavailableException:
+            self.close()
+            raise BrowserInitException('Failed to start browser environment.')
+        if self._supervisor is not None:
+            self._supervisor.watch(self)
         if is_async:
             threading.Thread(target=self.init_browser).start()
         else:
             self.init_browser()
         atexit.register(self.close)
 
-    def get_html_text_converter(self):
-        html_text_converter = html2text.HTML2Text()
-        # ignore links and images
-        html_text_converter.ignore_links = False
-        html_text_converter.ignore_images = True
-        # use alt text for images
-        html_text_converter.images_to_alt = True
-        # disable auto text wrapping
-        html_text_converter.body_width = 0
-        return html_text_converter
+    get_html_text_converter = staticmethod(get_html_text_converter)
+    image_to_png_base64_url = staticmethod(image_to_png_base64_url)
+    image_to_jpg_base64_url = staticmethod(image_to_jpg_base64_url)
+
+    def _start_worker(self):
+        if config.browser_worker_mode == 'shared' and not self.eval_mode:
+            self.worker = acquire_shared_worker()
+        else:
+            self.worker = BrowserWorker()
+            self.worker.reserve()
+        self.process = self.worker.process
+        # requests sent before the env is up queue behind its creation
+        self._opened = self.worker.open_context(
+            self.context_id, {**self._env_kwargs, 'session_state': self._session_state}
+        )
+
+    def restart(self, crashed: BrowserWorker):
+        """
+        Moves the env from a crashed worker to a new one, restoring the tabs, cookies
+        and storage of the last step. Called by the BrowserSupervisor.
+        """
+        with self._restart_lock:
+            if self.worker is not crashed:
+                # closed, or already restarted
+                return
+            if self._restarts >= config.browser_max_restarts:
+                logger.error('Browser env keeps crashing, giving up on it.')
+                self.worker = None
+                return
+            self._restarts += 1
+            logger.info('Restarting browser env...')
+            self.screenshots.reset()
+            self._last_screenshot = EncodedScreenshot('')
+            for tree in self.trees.values():
+                tree.reset()
+            self._start_worker()
 
     def init_browser(self):
         logger.info('Starting browser env...')
-        self.process.start()
-        time.sleep(2)  # Give the browser process time to initialize
-        if not self.check_alive():
+        try:
+            self._opened.result(60)
+        except (FutureTimeoutError, BrowserUnavailableException):
             self.close()
             raise BrowserInitException('Failed to start browser environment.')
 
-    def browser_process(self):
-        if self.eval_mode:
-            logger.info('Creating browser env for evaluation purpose.')
-            env = gym.make(self.browsergym_eval)
-        else:
-            env = gym.make(
-                'browsergym/openended',
-                task_kwargs={'start_url': 'about:blank', 'goal': 'PLACEHOLDER_GOAL'},
-                wait_for_user_message=False,
-                headless=True,
-                disable_env_checker=True,
-                timeout=10000,
-            )
-        obs, info = env.reset()
-        # EVAL only: save the goal into file for evaluation
-        if self.eval_mode:
-            rewards = []  # store rewards if in eval mode
-            logger.info(obs['goal'])
-            with open(
-                os.path.join(self.eval_dir, 'goal.txt'), 'w', encoding='utf-8'
-            ) as f:
-                f.write(obs['goal'])
-        logger.info('Browser env started.')
-        while True:
-            try:
-                if not self.browser_queue.empty():
-                    unique_request_id, action_data = self.browser_queue.get()
-                    # shutdown the browser environment
-                    if unique_request_id == 'SHUTDOWN':
-                        logger.info('SHUTDOWN recv, shutting down browser env...')
-                        env.close()
-                        return
-                    elif unique_request_id == 'IS_ALIVE':
-                        self.agent_queue.put(('ALIVE', None))
-                        continue
-                    action = action_data['action']
-                    obs, reward, terminated, truncated, info = env.step(action)
-
-                    def get_scroll_position(page):
-                        return page.evaluate("""() => {
-                            const scrollTop = window.scrollY;
-                            const windowHeight = window.innerHeight;
-                            const documentHeight = document.documentElement.scrollHeight;
-                            const remainingPixels = documentHeight - (scrollTop + windowHeight);
-
-                            return {
-                                'scrollTop': scrollTop,
-                                'windowHeight': windowHeight,
-                                'documentHeight': documentHeight,
-                                'remainingPixels': remainingPixels
-                            };
-                        }""")
-
-                    scroll_position = get_scroll_position(env.unwrapped.page)
-                    logger.info(scroll_position)
-                    obs['scroll_position'] = scroll_position
-
-                    # EVAL only: save the rewards into file for evaluation
-                    if self.eval_mode:
-                        rewards.append(reward)
-                        with open(
-                            os.path.join(self.eval_dir, 'rewards.json'),
-                            'w',
-                            encoding='utf-8',
-                        ) as f:
-                            f.write(json.dumps(rewards))
-                    # add text content of the page
-                    html_str = flatten_dom_to_str(obs['dom_object'])
-                    obs['text_content'] = self.html_text_converter.handle(html_str)
-                    # make observation serializable
-                    obs['screenshot'] = self.image_to_jpg_base64_url(obs['screenshot'])
-                    obs['active_page_index'] = obs['active_page_index'].item()
-                    obs['elapsed_time'] = obs['elapsed_time'].item()
-                    obs_to_send = copy.copy(obs)
-                    if isinstance(obs, dict):
-                        if 'dom_object' in obs_to_send.keys():
-                            obs_to_send['dom_object'] = {}
-                        if 'text_content' in obs.keys():
-                            obs_to_send['text_content'] = {}
-                    self.agent_queue.put((unique_request_id, obs))
-            except KeyboardInterrupt:
-                logger.info('Browser env process interrupted by user.')
-                try:
-                    env.close()
-                except Exception:
-                    pass
-                return
-            except Exception as e:
-                logger.error(f'{type(e).__name__}: {str(e)}')
-                try:
-                    env.close()
-                except Exception:
-                    pass
-                return
+    def step(self, action_str: str, timeout: float = 30, hints: str = '') -> dict:
+        """
+        Runs an action and observes the page. `hints` is the agent's plan, whose
+        links are prefetched first if prefetching is on.
+        """
+        return self._observe('STEP', self._step_payload(action_str, hints), timeout)
 
-    def step(self, action_str: str, timeout: float = 30) -> dict:
-        unique_request_id = str(uuid.uuid4())
-        self.browser_queue.put((unique_request_id, {'action': action_str}))
-        start_time = time.time()
-        while True:
-            if time.time() - start_time > timeout:
-                raise TimeoutError('Browser environment took too long to respond.')
-            if not self.agent_queue.empty():
-                response_id, obs = self.agent_queue.get()
-                if response_id == unique_request_id:
-                    return obs
+    async def astep(
+        self, action_str: str, timeout: float = 30, hints: str = ''
+    ) -> dict:
+        """Same as `step`, but awaits the observation without tying up a thread."""
+        return await self._aobserve(
+            'STEP', self._step_payload(action_str, hints), timeout
+        )
 
-    def check_alive(self, timeout: float = 60):
-        self.browser_queue.put(('IS_ALIVE', None))
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            if not self.agent_queue.empty():
-                response_id, _ = self.agent_queue.get()
-                if response_id == 'ALIVE':
-                    return True
-                logger.info(f'Browser env is not alive. Response ID: {response_id}')
-        return False
+    def step_batch(
+        self,
+        actions: list[str],
+        timeout: float | None = None,
+        stop_on_error: bool = True,
+    ) -> dict:
+        """
+        Runs several actions in one round trip to the browser worker.
 
-    def close(self):
-        if not self.process.is_alive():
-            logger.info('BrowserEnv already closed, no need to close again')
-            return
-        try:
-            self.browser_queue.put(('SHUTDOWN', None))
-            self.process.join(5)  # Wait for the process to terminate
-            if self.process.is_alive():
-                logger.error(
-                    'Browser process did not terminate, forcefully terminating...'
-                )
-                self.process.terminate()
-                self.process.join(5)  # Wait for the process to terminate
-                if self.process.is_alive():
-                    self.process.kill()
-                    self.process.join(5)  # Wait for the process to terminate
-            self.browser_queue.close()
-            self.browser_queue.join_thread()
-            self.agent_queue.close()
-            self.agent_queue.join_thread()
-        except Exception:
-            logger.error('Encountered an error when closing browser env', exc_info=True)
+        Only the page after the last action is observed; the ones before are just
+        checked for the URL they lead to and their error, listed in the
+        observation's `batch_checks`. With `stop_on_error` the batch ends at the
+        first failing action. The timeout defaults to 30s per action.
+        """
+        return self._observe(
+            'STEP_BATCH',
+            self._batch_payload(actions, stop_on_error),
+            30 * len(actions) if timeout is None else timeout,
+        )
 
-    @staticmethod
-    def image_to_png_base64_url(
-        image: np.ndarray | Image.Image, add_data_prefix: bool = False
-    ):
-        """Convert a numpy array to a base64 encoded png image url."""
+    async def astep_batch(
+        self,
+        actions: list[str],
+        timeout: float | None = None,
+        stop_on_error: bool = True,
+    ) -> dict:
+        """Same as `step_batch`, but awaits the observation without tying up a thread."""
+        return await self._aobserve(
+            'STEP_BATCH',
+            self._batch_payload(actions, stop_on_error),
+            30 * len(actions) if timeout is None else timeout,
+        )
+
+    def step_parallel(
+        self,
+        tabs: list[list[str]],
+        timeout: float | None = None,
+        close_tabs: bool = True,
+    ) -> dict:
+        """
+        Runs a list of actions in each of several new tabs, all in one round trip.
+
+        The tabs load side by side, so this takes about as long as the slowest
+        of them rather than all of them together. The observation has one
+        step-like observation per tab in `tabs`, in order; the active page does
+        not change. With `close_tabs` the new tabs are closed once observed. The
+        timeout defaults to 30s per action of the longest list.
+        """
+        return self._observe(
+            'STEP_PARALLEL',
+            self._parallel_payload(tabs, close_tabs),
+            self._parallel_timeout(tabs, timeout),
+        )
+
+    async def astep_parallel(
+        self,
+        tabs: list[list[str]],
+        timeout: float | None = None,
+        close_tabs: bool = True,
+    ) -> dict:
+        """Same as `step_parallel`, but awaits the observation without tying up a thread."""
+        return await self._aobserve(
+            'STEP_PARALLEL',
+            self._parallel_payload(tabs, close_tabs),
+            self._parallel_timeout(tabs, timeout),
+        )
 
-        if isinstance(image, np.ndarray):
-            image = Image.fromarray(image)
-        if image.mode in ('RGBA', 'LA'):
-            image = image.convert('RGB')
+    def _observe(self, kind: str, payload: dict, timeout: float) -> dict:
+        obs = self._get_worker().request(
+            self.context_id, kind, payload, timeout=timeout
+        )
+        if isinstance(obs.get('screenshot'), np.ndarray):
+            encoded = self.screenshots.submit(
+                obs['screenshot'], self.observation_profile.screenshot_format
+            ).result()
+            self._set_screenshot(obs, encoded)
+        for field, tree in self._rebuild_trees(obs):
+            if tree is None:
+                tree = self.fetch_extra(obs['request_id'], field, timeout)
+                self.trees[field].load(obs[field].seq, tree)
+            obs[field] = tree
+        self._after_step(obs)
+        if not self._restore_screenshot(obs):
+            self._keep_screenshot(
+                obs, self.fetch_extra(obs['request_id'], 'screenshot', timeout)
+            )
+        return obs
 
-        buffered = io.BytesIO()
-        image.save(buffered, format='PNG')
+    async def _aobserve(self, kind: str, payload: dict, timeout: float) -> dict:
+        obs = await self._get_worker().arequest(
+            self.context_id, kind, payload, timeout=timeout
+        )
+        if isinstance(obs.get('screenshot'), np.ndarray):
+            encoded = await asyncio.wrap_future(
+                self.screenshots.submit(
+                    obs['screenshot'], self.observation_profile.screenshot_format
+                )
+            )
+            self._set_screenshot(obs, encoded)
+        for field, tree in self._rebuild_trees(obs):
+            if tree is None:
+                tree = await self.afetch_extra(obs['request_id'], field, timeout)
+                self.trees[field].load(obs[field].seq, tree)
+            obs[field] = tree
+        self._after_step(obs)
+        if not self._restore_screenshot(obs):
+            self._keep_screenshot(
+                obs, await self.afetch_extra(obs['request_id'], 'screenshot', timeout)
+            )
+        return obs
+
+    def fetch_extra(self, request_id: str, field: str, timeout: float = 30):
+        """
+        Fetches an observation field that the profile left out of a step.
+
+        `request_id` is the one returned in the step observation. Only the latest
+        step can be fetched from, returns None once a newer step has replaced it.
+        """
+        value = self._get_worker().request(
+            self.context_id, 'FETCH', self._fetch_payload(request_id, field), timeout
+        )
+        return self._encode_value(value)
 
-        image_base64 = base64.b64encode(buffered.getvalue()).decode()
-        return (
-            f'data:image/png;base64,{image_base64}'
-            if add_data_prefix
-            else f'{image_base64}'
+    async def afetch_extra(self, request_id: str, field: str, timeout: float = 30):
+        value = await self._get_worker().arequest(
+            self.context_id, 'FETCH', self._fetch_payload(request_id, field), timeout
         )
+        return await asyncio.to_thread(self._encode_value, value)
+
+    def _rebuild_trees(self, obs: dict):
+        """
+        Yields the DOM and AXTree snapshots that came as diffs, rebuilt in full.
+        None means the diff was not based on the last snapshot we saw (e.g. its
+        response was dropped after a timeout), so the full one has to be fetched.
+        """
+        for field in TREE_FIELDS:
+            delta = obs.get(field)
+            if isinstance(delta, TreeDelta):
+                yield field, self.trees[field].apply(delta)
+
+    def _after_step(self, obs: dict):
+        self._restarts = 0
+        self.prefetch_metrics = obs.pop('prefetch_metrics', self.prefetch_metrics)
+        session_state = obs.pop('session_state', None)
+        if session_state is not None:
+            self._session_state = session_state
 
     @staticmethod
-    def image_to_jpg_base64_url(
-        image: np.ndarray | Image.Image, add_data_prefix: bool = False
-    ):
-        """Convert a numpy array to a base64 encoded jpeg image url."""
-
-        if isinstance(image, np.ndarray):
-            image = Image.fromarray(image)
-        if image.mode in ('RGBA', 'LA'):
-            image = image.convert('RGB')
-        width, height = image.size
-        logger.info(f'Width: {width}, Height: {height}')
-        buffered = io.BytesIO()
-        image.save(buffered, format='JPEG', quality=10)
-
-        image_base64 = base64.b64encode(buffered.getvalue()).decode()
-        return (
-            f'data:image/jpeg;base64,{image_base64}'
-            if add_data_prefix
-            else f'{image_base64}'
+    def _set_screenshot(obs: dict, encoded: EncodedScreenshot):
+        obs['screenshot_seq'] = encoded.seq
+        if encoded.unchanged:
+            del obs['screenshot']
+            obs['screenshot_unchanged'] = True
+        else:
+            obs['screenshot'] = encoded.screenshot
+            if encoded.thumbnail:
+                obs['screenshot_thumbnail'] = encoded.thumbnail
+
+    def _restore_screenshot(self, obs: dict) -> bool:
+        """
+        Puts the frame an unchanged screenshot repeats back into `obs`. False if
+        that is not the last frame we got (e.g. its response was dropped after a
+        timeout), so the full one has to be fetched.
+        """
+        if obs.get('screenshot_unchanged'):
+            if obs.get('screenshot_seq') != self._last_screenshot.seq:
+                return False
+            obs['screenshot'] = self._last_screenshot.screenshot
+            obs['screenshot_thumbnail'] = self._last_screenshot.thumbnail
+        elif 'screenshot' in obs:
+            self._keep_screenshot(
+                obs, obs['screenshot'], obs.get('screenshot_thumbnail', '')
+            )
+        return True
+
+    def _keep_screenshot(self, obs: dict, screenshot: str, thumbnail: str = ''):
+        obs['screenshot'] = screenshot
+        obs.pop('screenshot_unchanged', None)
+        self._last_screenshot = EncodedScreenshot(
+            screenshot, thumbnail, seq=obs.get('screenshot_seq', 0)
         )
+
+    def _encode_value(self, value):
+        # screenshots that came through shared memory are still raw pixels
+        if not isinstance(value, np.ndarray):
+            return value
+        return self.screenshots.encode(
+            value, self.observation_profile.screenshot_format
+        ).screenshot
+
+    def _step_payload(self, action_str: str, hints: str = '') -> dict:
+        return {
+            'action': action_str,
+            'hints': hints,
+            'profile': self.observation_profile.to_dict(),
+            'load_profile': self.load_profile,
+        }
+
+    def _batch_payload(self, actions: list[str], stop_on_error: bool) -> dict:
+        if not actions:
+            raise ValueError('A batch needs at least one action')
+        return {
+            'actions': list(actions),
+            'stop_on_error': stop_on_error,
+            'profile': self.observation_profile.to_dict(),
+            'load_profile': self.load_profile,
+        }
+
+    def _parallel_payload(self, tabs: list[list[str]], close_tabs: bool) -> dict:
+        if not tabs or not all(tabs):
+            raise ValueError('Every tab needs at least one action')
+        return {
+            'tabs': [list(actions) for actions in tabs],
+            'close_tabs': close_tabs,
+            'profile': self.observation_profile.to_dict(),
+            'load_profile': self.load_profile,
+        }
+
+    @staticmethod
+    def _parallel_timeout(tabs: list[list[str]], timeout: float | None) -> float:
+        if timeout is not None:
+            return timeout
+        return 30 * max((len(actions) for actions in tabs), default=1)
+
+    def _fetch_payload(self, request_id: str, field: str) -> dict:
+        if field not in OBSERVATION_FIELDS:
+            raise ValueError(f'Unknown observation field: {field}')
+        return {
+            'request_id': request_id,
+            'field': field,
+            'profile': self.observation_profile.to_dict(),
+        }
+
+    def scrub(self, timeout: float = 30) -> bool:
+        """
+        Resets the browser to a blank page and clears cookies, storage and extra tabs,
+        so the env can be handed to another session.
+        """
+        self.screenshots.reset()
+        self._last_screenshot = EncodedScreenshot('')
+        self._session_state = None
+        self.prefetch_metrics = {}
+        for tree in self.trees.values():
+            tree.reset()
+        try:
+            return self._get_worker().request(self.context_id, 'RESET', timeout=timeout)
+        except (TimeoutError, BrowserUnavailableException) as e:
+            logger.warning(f'Failed to scrub browser env: {e}')
+            return False
+
+    def check_alive(self, timeout: float = 60):
+        try:
+            response = self._get_worker().request(
+                self.context_id, 'IS_ALIVE', timeout=timeout
+            )
+        except (TimeoutError, BrowserUnavailableException):
+            logger.info('Browser env is not alive.')
+            return False
+        return response == 'ALIVE'
+
+    def close(self):
+        if self._supervisor is not None:
+            self._supervisor.unwatch(self)
+        with self._restart_lock:
+            worker, self.worker = self.worker, None
+        if worker is None:
+            logger.info('BrowserEnv already closed, no need to close again')
+            return
+        if worker.shared:
+            # the worker keeps serving other sessions
+            worker.close_context(self.context_id)
+        else:
+            worker.close()
+
+    def _get_worker(self) -> BrowserWorker:
+        if self.worker is None:
+            raise BrowserUnavailableException('Browser environment is closed.')
+        return self.worker
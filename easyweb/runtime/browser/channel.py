@@ -0,0 +1,171 @@
+import asyncio
+import threading
+import time
+import uuid
+from concurrent.futures import Future, InvalidStateError
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from multiprocessing.connection import Connection
+from typing import Any, Callable
+
+from easyweb.core.exceptions import BrowserCrashedError, BrowserUnavailableException
+from easyweb.core.logger import easyweb_logger as logger
+
+# request id of the unsolicited liveness messages sent by the browser process
+HEARTBEAT = '__heartbeat__'
+
+
+class BrowserChannel:
+    """
+    Agent-side end of the request/response pipe to the browser process.
+
+    Every request is tagged with a unique id and resolved through a future by a
+    single reader thread, so callers block (or await) on their own response
+    instead of polling the pipe. Responses that arrive after their request has
+    timed out are dropped.
+
+    Messages sent to the browser process are `(request_id, kind, payload)`
+    tuples, responses are `(request_id, result, error)` tuples. `decode`, if
+    given, is applied by the reader thread to every result, including the ones
+    that are dropped. Heartbeats carry how long the browser process has been busy
+    with its current request and that request's id, and are recorded instead of
+    resolving a future.
+    """
+
+    def __init__(
+        self,
+        conn: Connection,
+        name: str = 'browser-channel',
+        decode: Callable[[Any], Any] | None = None,
+    ):
+        self.conn = conn
+        self.decode = decode
+        self._pending: dict[str, Future] = {}
+        # how long the callers wait for their requests, by request id
+        self._timeouts: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self.last_heartbeat = time.monotonic()
+        self.busy_for = 0.0
+        # the timeout of the request the browser process is busy with, if known
+        self.busy_timeout: float | None = None
+        self._reader = threading.Thread(target=self._read_loop, name=name, daemon=True)
+        self._reader.start()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def submit(
+        self, kind: str, payload: Any = None, timeout: float | None = None
+    ) -> tuple[str, Future]:
+        """
+        Sends a request to the browser process without waiting for the response.
+
+        Returns the request id and the future that will hold the response. The
+        `timeout` the caller waits for it tells how long it may keep the browser
+        process busy.
+        """
+        request_id = str(uuid.uuid4())
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise BrowserUnavailableException()
+            self._pending[request_id] = future
+            if timeout is not None:
+                self._timeouts[request_id] = timeout
+            try:
+                self.conn.send((request_id, kind, payload))
+            except (OSError, ValueError) as e:
+                self._pending.pop(request_id, None)
+                self._timeouts.pop(request_id, None)
+                raise BrowserUnavailableException(
+                    f'Failed to send request to browser environment: {e}'
+                )
+        return request_id, future
+
+    def request(self, kind: str, payload: Any = None, timeout: float | None = None):
+        """Sends a request and blocks until its response arrives."""
+        request_id, future = self.submit(kind, payload, timeout)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            self._discard(request_id)
+            raise TimeoutError('Browser environment took too long to respond.')
+
+    async def arequest(
+        self, kind: str, payload: Any = None, timeout: float | None = None
+    ):
+        """Sends a request and awaits its response without blocking a thread."""
+        request_id, future = self.submit(kind, payload, timeout)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            self._discard(request_id)
+            raise TimeoutError('Browser environment took too long to respond.')
+
+    def close(self, exception: Exception | None = None):
+        """Closes the channel, failing pending requests with `exception`."""
+        with self._lock:
+            self._closed = True
+        self._fail_pending(exception or BrowserUnavailableException())
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+
+    def _discard(self, request_id: str):
+        with self._lock:
+            self._pending.pop(request_id, None)
+            self._timeouts.pop(request_id, None)
+
+    def _read_loop(self):
+        while True:
+            try:
+                request_id, result, error = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            if request_id == HEARTBEAT:
+                self.last_heartbeat = time.monotonic()
+                self.busy_for, busy_request = result
+                with self._lock:
+                    self.busy_timeout = self._timeouts.get(busy_request)
+                continue
+            with self._lock:
+                future = self._pending.pop(request_id, None)
+                self._timeouts.pop(request_id, None)
+            if self.decode is not None and error is None:
+                try:
+                    result = self.decode(result)
+                except Exception as e:
+                    error = f'{type(e).__name__}: {e}'
+            if future is None:
+                logger.debug(f'Dropping response for unknown request {request_id}')
+                continue
+            try:
+                if error is not None:
+                    future.set_exception(
+                        BrowserUnavailableException(
+                            f'Browser environment failed: {error}'
+                        )
+                    )
+                else:
+                    future.set_result(result)
+            except InvalidStateError:
+                # the waiter has already given up on this request
+                pass
+        with self._lock:
+            self._closed = True
+        self._fail_pending(
+            BrowserCrashedError('Browser environment process has exited')
+        )
+
+    def _fail_pending(self, exception: Exception):
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+            self._timeouts.clear()
+        for future in pending:
+            try:
+                future.set_exception(exception)
+            except InvalidStateError:
+                pass
@@ -0,0 +1,220 @@
+import time
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Any
+from urllib.parse import urlparse
+
+from easyweb.core.config import config
+
+# '' keeps BrowserGym's own wait for domcontentloaded, 'quiescence' additionally
+# waits until the network has been quiet for `quiet_period` ms
+WAIT_CONDITIONS = ('', 'domcontentloaded', 'load', 'networkidle', 'quiescence')
+
+# ad and tracker domains, subdomains are blocked as well
+AD_DOMAINS = (
+    'doubleclick.net',
+    'googlesyndication.com',
+    'googleadservices.com',
+    'google-analytics.com',
+    'googletagmanager.com',
+    'googletagservices.com',
+    'adservice.google.com',
+    'amazon-adsystem.com',
+    'adnxs.com',
+    'criteo.com',
+    'taboola.com',
+    'outbrain.com',
+    'scorecardresearch.com',
+    'quantserve.com',
+    'hotjar.com',
+    'connect.facebook.net',
+    'ads.linkedin.com',
+    'ads-twitter.com',
+    'bat.bing.com',
+    'moatads.com',
+)
+
+
+@dataclass(frozen=True)
+class LoadProfile:
+    """
+    How pages are loaded in a browser env.
+
+    Attributes:
+        name: The name the profile is selected by.
+        blocked_resource_types: Playwright resource types that are never fetched.
+        blocked_domains: Domains (and their subdomains) that are never fetched.
+        block_third_party_frames: Whether iframes from other sites are kept empty.
+        wait_until: What to wait for after each action, see WAIT_CONDITIONS.
+        wait_timeout: How long to wait at most, in ms.
+        quiet_period: How long the network has to be idle for 'quiescence', in ms.
+    """
+
+    name: str
+    blocked_resource_types: frozenset[str] = frozenset()
+    blocked_domains: tuple[str, ...] = ()
+    block_third_party_frames: bool = False
+    wait_until: str = ''
+    wait_timeout: int = 5000
+    quiet_period: int = 500
+
+    def __post_init__(self):
+        if self.wait_until not in WAIT_CONDITIONS:
+            raise ValueError(f'Invalid wait condition: {self.wait_until}')
+
+    @property
+    def blocks_requests(self) -> bool:
+        return bool(
+            self.blocked_resource_types
+            or self.blocked_domains
+            or self.block_third_party_frames
+        )
+
+    def blocks(self, resource_type: str, url: str, top_url: str = '') -> bool:
+        """
+        Whether a request is blocked. `top_url` is the page URL when the request
+        navigates a subframe.
+        """
+        if resource_type in self.blocked_resource_types:
+            return True
+        host = urlparse(url).hostname or ''
+        if any(
+            host == domain or host.endswith('.' + domain)
+            for domain in self.blocked_domains
+        ):
+            return True
+        return bool(
+            self.block_third_party_frames
+            and top_url
+            and host
+            and site(host) != site(urlparse(top_url).hostname or '')
+        )
+
+
+def site(host: str) -> str:
+    """Approximates the registrable domain by the last two labels."""
+    return '.'.join(host.split('.')[-2:])
+
+
+_LIGHT_TYPES = frozenset({'image', 'media', 'font'})
+
+LOAD_PROFILES = {
+    'full': LoadProfile('full'),
+    'no-media': LoadProfile(
+        'no-media',
+        blocked_resource_types=_LIGHT_TYPES,
+        blocked_domains=AD_DOMAINS,
+        block_third_party_frames=True,
+        wait_until='load',
+    ),
+    'text-only': LoadProfile(
+        'text-only',
+        blocked_resource_types=_LIGHT_TYPES | {'stylesheet'},
+        blocked_domains=AD_DOMAINS,
+        block_third_party_frames=True,
+        wait_until='quiescence',
+    ),
+}
+
+
+@lru_cache
+def get_load_profile(name: str) -> LoadProfile:
+    """Looks up a load profile, adding the configured browser_blocked_domains."""
+    if name not in LOAD_PROFILES:
+        raise ValueError(f'Unknown load profile: {name}')
+    profile = LOAD_PROFILES[name]
+    extra = tuple(
+        domain.strip()
+        for domain in config.browser_blocked_domains.split(',')
+        if domain.strip()
+    )
+    if extra and profile.blocked_domains:
+        profile = replace(profile, blocked_domains=profile.blocked_domains + extra)
+    return profile
+
+
+class PageLoader:
+    """
+    Applies a LoadProfile to the BrowserContext of a BrowserGym env.
+
+    Requests are filtered with a context wide route, and the profile's wait
+    condition runs where BrowserGym waits for the page after an action, so the
+    observation is taken from the settled page. Only lives inside the worker
+    process.
+    """
+
+    def __init__(self):
+        self.profile = LOAD_PROFILES['full']
+        self.context: Any = None
+        self.in_flight: set = set()
+        self.last_activity = time.monotonic()
+
+    def attach(self, env: Any):
+        self.context = env.context
+        self.context.on('request', self._on_request)
+        self.context.on('requestfinished', self._on_request_done)
+        self.context.on('requestfailed', self._on_request_done)
+        wait_dom_loaded = env._wait_dom_loaded
+
+        def wait_loaded():
+            wait_dom_loaded()
+            self.settle(env.page)
+
+        env._wait_dom_loaded = wait_loaded
+
+    def use(self, profile: LoadProfile):
+        if profile == self.profile:
+            return
+        if self.profile.blocks_requests:
+            self.context.unroute('**/*', self._route)
+        self.profile = profile
+        if profile.blocks_requests:
+            self.context.route('**/*', self._route)
+
+    def reset(self):
+        self.in_flight.clear()
+
+    def settle(self, page: Any):
+        profile = self.profile
+        if not profile.wait_until:
+            return
+        try:
+            if profile.wait_until != 'quiescence':
+                page.wait_for_load_state(
+                    profile.wait_until, timeout=profile.wait_timeout
+                )
+                return
+            deadline = time.monotonic() + profile.wait_timeout / 1000
+            quiet = profile.quiet_period / 1000
+            while time.monotonic() < deadline:
+                if (
+                    not self.in_flight
+                    and time.monotonic() - self.last_activity >= quiet
+                ):
+                    return
+                # lets Playwright dispatch the request events
+                page.wait_for_timeout(50)
+        except Exception:
+            # a page that never settles is observed as it is
+            pass
+
+    def _route(self, route: Any, request: Any):
+        top_url = ''
+        try:
+            frame = request.frame
+            if request.resource_type == 'document' and frame.parent_frame is not None:
+                top_url = frame.page.url
+        except Exception:
+            pass
+        if self.profile.blocks(request.resource_type, request.url, top_url):
+            route.abort('blockedbyclient')
+        else:
+            route.fallback()
+
+    def _on_request(self, request: Any):
+        self.in_flight.add(request)
+        self.last_activity = time.monotonic()
+
+    def _on_request_done(self, request: Any):
+        self.in_flight.discard(request)
+        self.last_activity = time.monotonic()
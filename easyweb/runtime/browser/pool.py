@@ -0,0 +1,223 @@
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+from easyweb.core.config import config
+from easyweb.core.exceptions import BrowserInitException
+from easyweb.core.logger import easyweb_logger as logger
+from easyweb.runtime.browser.browser_env import BrowserEnv
+
+
+class BrowserEnvPool:
+    """
+    A pool of pre-launched browser envs shared by all sessions of a backend.
+
+    Launching a BrowserEnv (process spawn, gym env creation, Chromium start) takes
+    seconds, so the pool keeps `min_size` blank envs ready. Sessions lease an env
+    when their runtime starts and release it when it closes; released envs are
+    scrubbed (tabs, cookies and storage cleared) in the background before going
+    back to the idle queue. A maintenance thread refills the pool and drops idle
+    envs that fail their health check.
+    """
+
+    def __init__(
+        self,
+        min_size: int = 0,
+        max_size: int = 4,
+        health_check_interval: float = 30,
+        lease_timeout: float = 60,
+        env_factory: Callable[[], BrowserEnv] | None = None,
+    ):
+        if max_size < 1:
+            raise ValueError('Browser pool max_size must be at least 1')
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.health_check_interval = health_check_interval
+        self.lease_timeout = lease_timeout
+        self._env_factory = env_factory or (lambda: BrowserEnv(is_async=False))
+        self._idle: deque[BrowserEnv] = deque()
+        self._leased: set[BrowserEnv] = set()
+        # released envs being scrubbed, closed with the pool if it closes first
+        self._recycling: set[BrowserEnv] = set()
+        # envs being launched or scrubbed, counted against max_size
+        self._pending = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._maintainer = threading.Thread(
+            target=self._maintain_loop, name='browser-pool', daemon=True
+        )
+        self._maintainer.start()
+
+    @property
+    def size(self) -> int:
+        with self._cond:
+            return self._size()
+
+    @property
+    def idle_count(self) -> int:
+        with self._cond:
+            return len(self._idle)
+
+    def _size(self) -> int:
+        return len(self._idle) + len(self._leased) + self._pending
+
+    def lease(self, timeout: float | None = None) -> BrowserEnv:
+        """
+        Takes an idle browser env from the pool, launching one if the pool is not full.
+        Blocks until an env is available or the timeout expires.
+        """
+        timeout = self.lease_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise BrowserInitException('Browser pool is closed')
+                while self._idle:
+                    env = self._idle.popleft()
+                    if env.process.is_alive():
+                        self._leased.add(env)
+                        # let the maintainer top the idle queue back up
+                        self._cond.notify_all()
+                        return env
+                    threading.Thread(target=env.close, daemon=True).start()
+                if self._size() < self.max_size:
+                    self._pending += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    raise BrowserInitException(
+                        f'No browser env available in the pool after {timeout}s'
+                    )
+        # launch outside of the lock, this takes a while
+        try:
+            env = self._env_factory()
+        except Exception:
+            with self._cond:
+                self._pending -= 1
+                self._cond.notify_all()
+            raise
+        with self._cond:
+            self._pending -= 1
+            closed = self._closed
+            if not closed:
+                self._leased.add(env)
+        if closed:
+            env.close()
+            raise BrowserInitException('Browser pool is closed')
+        return env
+
+    def release(self, env: BrowserEnv) -> None:
+        """Gives a leased env back to the pool. It is scrubbed in the background."""
+        with self._cond:
+            if env not in self._leased:
+                logger.warning(
+                    'Releasing a browser env that was not leased from the pool'
+                )
+                threading.Thread(target=env.close, daemon=True).start()
+                return
+            self._leased.discard(env)
+            self._recycling.add(env)
+            self._pending += 1
+        threading.Thread(target=self._recycle, args=(env,), daemon=True).start()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            envs = list(self._idle) + list(self._leased) + list(self._recycling)
+            self._idle.clear()
+            self._leased.clear()
+            self._recycling.clear()
+            self._cond.notify_all()
+        for env in envs:
+            env.close()
+
+    def _recycle(self, env: BrowserEnv) -> None:
+        with self._cond:
+            closed = self._closed
+        healthy = not closed and env.process.is_alive() and env.scrub()
+        with self._cond:
+            self._pending -= 1
+            # not there anymore if the pool closed it in the meantime
+            owned = env in self._recycling
+            self._recycling.discard(env)
+            keep = healthy and owned and not self._closed
+            if keep:
+                self._idle.append(env)
+            self._cond.notify_all()
+        if owned and not keep:
+            if not healthy:
+                logger.info('Discarding browser env that could not be scrubbed')
+            env.close()
+
+    def _maintain_loop(self) -> None:
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+            self._check_health()
+            self._refill()
+            with self._cond:
+                if self._closed:
+                    return
+                self._cond.wait(self.health_check_interval)
+
+    def _check_health(self) -> None:
+        with self._cond:
+            idle = list(self._idle)
+        for env in idle:
+            if env.process.is_alive() and env.check_alive(timeout=10):
+                continue
+            with self._cond:
+                if env not in self._idle:
+                    continue  # leased in the meantime
+                self._idle.remove(env)
+            logger.warning('Dropping unhealthy browser env from the pool')
+            env.close()
+
+    def _refill(self) -> None:
+        while True:
+            with self._cond:
+                if (
+                    self._closed
+                    or len(self._idle) + self._pending >= self.min_size
+                    or self._size() >= self.max_size
+                ):
+                    return
+                self._pending += 1
+            env = None
+            try:
+                env = self._env_factory()
+            except Exception as e:
+                logger.error(f'Failed to pre-launch browser env: {e}')
+            with self._cond:
+                self._pending -= 1
+                closed = self._closed
+                if env is not None and not closed:
+                    self._idle.append(env)
+                    self._cond.notify_all()
+            if env is None:
+                return
+            if closed:
+                env.close()
+                return
+
+
+_pool: BrowserEnvPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserEnvPool | None:
+    """Returns the backend-wide browser pool, or None if pooling is disabled."""
+    global _pool
+    if config.browser_pool_max_size <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserEnvPool(
+                min_size=config.browser_pool_min_size,
+                max_size=config.browser_pool_max_size,
+                health_check_interval=config.browser_pool_health_check_interval,
+                lease_timeout=config.browser_pool_lease_timeout,
+            )
+        return _pool
@@ -0,0 +1,325 @@
+import ast
+import re
+import time
+from dataclasses import asdict, dataclass
+from typing import Any
+from urllib.parse import urldefrag, urljoin, urlparse
+
+from easyweb.core.logger import easyweb_logger as logger
+
+# how long prefetching tabs get to load before they are left as they are
+PREFETCH_TIMEOUT = 30
+_WORD = re.compile(r'[a-z0-9]+')
+# words of a plan that say nothing about which link it means
+_STOP_WORDS = frozenset(
+    {
+        'the',
+        'and',
+        'for',
+        'with',
+        'then',
+        'that',
+        'this',
+        'from',
+        'page',
+        'link',
+        'click',
+        'open',
+        'go',
+        'to',
+        'on',
+        'of',
+        'in',
+        'a',
+        'an',
+        'i',
+        'will',
+        'next',
+        'now',
+    }
+)
+# links that change something when merely loaded, e.g. /account/logout or
+# /cart/delete?item=3, are never prefetched
+_ACTION_LINK = re.compile(
+    r'log_?out|log_?off|sign_?out|delete|remove|unsubscribe|cancel|destroy|deactivate'
+)
+
+
+def words(text: str) -> set[str]:
+    return {
+        word
+        for word in _WORD.findall(text.lower())
+        if len(word) > 2 and word not in _STOP_WORDS
+    }
+
+
+def normalize_url(url: str) -> str:
+    return urldefrag(url)[0]
+
+
+def link_targets(dom_snapshot: dict, page_url: str) -> dict[str, str]:
+    """The absolute http(s) URL of every link of the page's main document, by bid."""
+    if not dom_snapshot or not dom_snapshot.get('documents'):
+        return {}
+    strings = dom_snapshot['strings']
+    nodes = dom_snapshot['documents'][0]['nodes']
+    targets = {}
+    for name, attributes in zip(nodes['nodeName'], nodes['attributes']):
+        if strings[name] != 'A':
+            continue
+        values = {
+            strings[attributes[i]]: strings[attributes[i + 1]]
+            for i in range(0, len(attributes), 2)
+        }
+        if 'bid' not in values or not values.get('href'):
+            continue
+        url = urljoin(page_url, values['href'])
+        if urlparse(url).scheme in ('http', 'https'):
+            targets[values['bid']] = url
+    return targets
+
+
+def is_action_link(url: str) -> bool:
+    parsed = urlparse(url)
+    return bool(
+        _ACTION_LINK.search(f'{parsed.path}?{parsed.query}'.lower().replace('-', '_'))
+    )
+
+
+def candidate_urls(
+    axtree: dict,
+    targets: dict[str, str],
+    page_url: str,
+    hints: str = '',
+    limit: int = 2,
+) -> list[str]:
+    """
+    The links of the page most likely to be followed next, best first.
+
+    Links whose text shares words with `hints` (the agent's plan) come first,
+    the more words the better. The rest follow by how descriptive their text
+    is, which favours search results and product titles over navigation links.
+    Links back to the current page and links that look like actions are left out.
+    """
+    hint_words = words(hints)
+    current = normalize_url(page_url)
+    scored = {}
+    for order, node in enumerate(axtree.get('nodes', []) if axtree else []):
+        if node.get('ignored') or node.get('role', {}).get('value') != 'link':
+            continue
+        url = targets.get(node.get('browsergym_id', ''))
+        if url is None or normalize_url(url) == current or is_action_link(url):
+            continue
+        name = node.get('name', {}).get('value', '')
+        link_words = words(name) | words(urlparse(url).path)
+        score = (len(hint_words & link_words), len(words(name)), -order)
+        url = normalize_url(url)
+        if url not in scored or score > scored[url]:
+            scored[url] = score
+    ranked = sorted(scored, key=scored.__getitem__, reverse=True)
+    return ranked[:limit]
+
+
+def target_url(action: str, targets: dict[str, str]) -> str | None:
+    """The URL a `goto` or plain link `click` action leads to, None for any other action."""
+    try:
+        tree = ast.parse(action.strip())
+    except SyntaxError:
+        return None
+    if len(tree.body) != 1 or not isinstance(tree.body[0], ast.Expr):
+        return None
+    call = tree.body[0].value
+    if (
+        not isinstance(call, ast.Call)
+        or not isinstance(call.func, ast.Name)
+        or len(call.args) != 1
+        or call.keywords
+        or not isinstance(call.args[0], ast.Constant)
+        or not isinstance(call.args[0].value, str)
+    ):
+        return None
+    if call.func.id == 'goto':
+        return call.args[0].value
+    if call.func.id == 'click':
+        return targets.get(call.args[0].value)
+    return None
+
+
+@dataclass
+class PrefetchTab:
+    url: str
+    page: Any
+    bytes: int = 0
+    loaded: bool = False
+    on_finished: Any = None
+
+
+@dataclass
+class PrefetchMetrics:
+    started: int = 0
+    hits: int = 0
+    # goto/click steps that went to a page that was not prefetched
+    misses: int = 0
+    wasted: int = 0
+    bytes: int = 0
+    wasted_bytes: int = 0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class Prefetcher:
+    """
+    Warms the pages an agent is likely to open next in hidden tabs, while it thinks.
+
+    After each step the best candidate links of the page are loaded in new tabs
+    of the env's BrowserContext. When the next action goes to one of them, by
+    `goto` or by clicking the link, the tab takes the place of the active page
+    instead of loading it again; its history starts at the prefetched page.
+    The other tabs are closed before the action runs. All prefetching of a
+    session shares a budget of `budget` bytes, after which requests of the
+    hidden tabs are aborted. Only lives inside the worker process.
+    """
+
+    def __init__(self, tabs: int = 2, budget: int = 20 * 1024 * 1024):
+        self.max_tabs = tabs
+        self.budget = budget
+        self.tabs: dict[str, PrefetchTab] = {}
+        self.targets: dict[str, str] = {}
+        self.metrics = PrefetchMetrics()
+        self.active_page: Any = None
+        self.started_at = 0.0
+
+    @property
+    def exhausted(self) -> bool:
+        return self.metrics.bytes >= self.budget
+
+    def start(self, env: Any, obs: dict, hints: str = ''):
+        """Starts prefetching the likely next pages of the observed active page."""
+        self.discard(env)
+        self.targets = link_targets(obs.get('dom_object'), obs['url'])
+        if self.exhausted or not self.max_tabs:
+            return
+        urls = candidate_urls(
+            obs.get('axtree_object'), self.targets, obs['url'], hints, self.max_tabs
+        )
+        open_urls = {normalize_url(page.url) for page in env.context.pages}
+        self.active_page = env.page
+        self.started_at = time.monotonic()
+        for url in urls:
+            if url in open_urls:
+                continue
+            try:
+                self._open(env, url)
+            except Exception as e:
+                logger.debug(f'Failed to prefetch {url}: {e}')
+
+    def take(self, env: Any, action: str) -> bool:
+        """
+        Makes the tab prefetched for the action's target the active page, and
+        closes the other tabs. True if the action has nothing left to do.
+        """
+        if not self.tabs:
+            return False
+        url = target_url(action, self.targets)
+        tab = self.tabs.pop(normalize_url(url), None) if url else None
+        if url is not None and tab is None:
+            self.metrics.misses += 1
+        self.discard(env)
+        if tab is None:
+            return False
+        previous = env.page
+        env.page_history.pop(previous, None)
+        env.page_history[tab.page] = None
+        env.page = tab.page
+        # from here on it is browsed like any other page
+        tab.page.unroute('**/*', self._route)
+        tab.page.remove_listener('requestfinished', tab.on_finished)
+        tab.page.bring_to_front()
+        previous.close()
+        self.metrics.hits += 1
+        logger.debug(f'Prefetched {tab.url} promoted to the active page.')
+        return True
+
+    def discard(self, env: Any):
+        """Closes the tabs that were prefetched for nothing."""
+        for tab in self.tabs.values():
+            self.metrics.wasted += 1
+            self.metrics.wasted_bytes += tab.bytes
+            env.page_history.pop(tab.page, None)
+            try:
+                tab.page.close()
+            except Exception:
+                pass
+        self.tabs.clear()
+        # loading tabs activate themselves in BrowserGym
+        if self.active_page is not None and not self.active_page.is_closed():
+            env.page = self.active_page
+        self.active_page = None
+
+    @property
+    def loading(self) -> bool:
+        return (
+            any(not tab.loaded for tab in self.tabs.values())
+            and time.monotonic() - self.started_at < PREFETCH_TIMEOUT
+        )
+
+    def pump(self, ms: float = 20):
+        """Lets Playwright handle the events of the loading tabs for a moment."""
+        for tab in self.tabs.values():
+            if not tab.loaded:
+                try:
+                    tab.page.wait_for_timeout(ms)
+                except Exception:
+                    tab.loaded = True
+                return
+
+    def reset(self, env: Any):
+        self.discard(env)
+        self.targets = {}
+        self.metrics = PrefetchMetrics()
+
+    def _open(self, env: Any, url: str):
+        page = env.context.new_page()
+        tab = PrefetchTab(url, page)
+        self.tabs[url] = tab
+
+        # what went over the wire, as content-length is missing from chunked
+        # and compressed responses
+        def on_finished(request):
+            sizes = page._loop.create_task(request._impl_obj.sizes())
+            sizes.add_done_callback(lambda task: self._count(tab, task))
+
+        def on_load(_):
+            tab.loaded = True
+
+        tab.on_finished = on_finished
+        page.on('requestfinished', on_finished)
+        page.on('load', on_load)
+        page.route('**/*', self._route)
+        # the navigation goes on in the browser without waiting for it here
+        navigation = page._loop.create_task(page._impl_obj.goto(url))
+        navigation.add_done_callback(lambda task: _done(task, tab))
+        self.metrics.started += 1
+
+    def _count(self, tab: PrefetchTab, task):
+        if task.cancelled() or task.exception() is not None:
+            return
+        sizes = task.result()
+        size = max(0, sizes.get('responseHeadersSize', 0)) + max(
+            0, sizes.get('responseBodySize', 0)
+        )
+        tab.bytes += size
+        self.metrics.bytes += size
+
+    def _route(self, route: Any, request: Any):
+        if self.exhausted:
+            route.abort('blockedbyclient')
+        else:
+            route.fallback()
+
+
+def _done(task, tab: PrefetchTab):
+    if task.cancelled() or task.exception() is not None:
+        # failed or closed, nothing more to wait for
+        tab.loaded = True
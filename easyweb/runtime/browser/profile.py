@@ -0,0 +1,60 @@
+from dataclasses import asdict, dataclass
+
+from easyweb.runtime.browser.axtree import parse_axtree_flags
+from easyweb.runtime.browser.screenshot import SCREENSHOT_FORMATS
+
+# observation fields that cost time to extract or space to transfer, everything
+# else BrowserGym returns (url, open pages, last action, ...) is always sent
+OBSERVATION_FIELDS = (
+    'text_content',
+    'dom_object',
+    'axtree_object',
+    'screenshot',
+    'scroll_position',
+    'axtree_txt',
+)
+
+
+@dataclass(frozen=True)
+class ObservationProfile:
+    """
+    Declares which browser observation fields an agent needs after each step.
+
+    Fields that are switched off are neither computed nor sent by the browser
+    worker; they can still be fetched for the latest step with
+    `BrowserEnv.fetch_extra`.
+
+    Attributes:
+        text_content: The page text, see `text_format`.
+        dom_object: The DOM snapshot.
+        axtree_object: The accessibility tree, along with the extra element properties.
+        screenshot: The base64 encoded screenshot, see `screenshot_format`.
+        scroll_position: The scroll offsets of the active page.
+        axtree_txt: The accessibility tree flattened to text by the worker, see `axtree_flags`.
+        text_format: 'markdown' converts the page with html2text, 'html' keeps the flattened DOM.
+        screenshot_format: 'jpeg', 'webp' or 'png', empty uses the configured browser_screenshot_format.
+        axtree_flags: Comma-separated flags of BrowserGym's flatten_axtree_to_str to switch on for axtree_txt.
+    """
+
+    text_content: bool = True
+    dom_object: bool = True
+    axtree_object: bool = True
+    screenshot: bool = True
+    scroll_position: bool = True
+    axtree_txt: bool = False
+    text_format: str = 'markdown'
+    screenshot_format: str = ''
+    axtree_flags: str = 'with_clickable,filter_visible_only'
+
+    def __post_init__(self):
+        if self.text_format not in ('markdown', 'html'):
+            raise ValueError(f'Invalid text format: {self.text_format}')
+        if self.screenshot_format and self.screenshot_format not in SCREENSHOT_FORMATS:
+            raise ValueError(f'Invalid screenshot format: {self.screenshot_format}')
+        parse_axtree_flags(self.axtree_flags)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def wants(self, field: str) -> bool:
+        return bool(getattr(self, field))
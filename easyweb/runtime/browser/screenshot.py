@@ -0,0 +1,192 @@
+import base64
+import hashlib
+import io
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, replace
+
+import numpy as np
+from PIL import Image
+
+from easyweb.core.config import config
+from easyweb.core.logger import easyweb_logger as logger
+
+SCREENSHOT_FORMATS = ('jpeg', 'webp', 'png')
+
+
+@dataclass(frozen=True)
+class ScreenshotSettings:
+    """
+    How browser screenshots are encoded.
+
+    Attributes:
+        format: 'jpeg', 'webp' or 'png'.
+        quality: The quality for lossy formats, 1-100.
+        max_width: Frames wider than this are downscaled, 0 keeps the full width.
+        max_height: Frames taller than this are downscaled, 0 keeps the full height.
+        thumbnail_width: The width of an extra thumbnail, 0 disables thumbnails.
+        dedup: Whether to reuse the previous encoding when the frame did not change.
+        workers: The number of encoding threads per process.
+    """
+
+    format: str = 'jpeg'
+    quality: int = 10
+    max_width: int = 0
+    max_height: int = 0
+    thumbnail_width: int = 0
+    dedup: bool = True
+    workers: int = 2
+
+    def __post_init__(self):
+        if self.format not in SCREENSHOT_FORMATS:
+            raise ValueError(f'Invalid screenshot format: {self.format}')
+
+    @classmethod
+    def from_config(cls) -> 'ScreenshotSettings':
+        return cls(
+            format=config.browser_screenshot_format,
+            quality=config.browser_screenshot_quality,
+            max_width=config.browser_screenshot_max_width,
+            max_height=config.browser_screenshot_max_height,
+            thumbnail_width=config.browser_screenshot_thumbnail_width,
+            dedup=config.browser_screenshot_dedup,
+            workers=config.browser_screenshot_workers,
+        )
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass(frozen=True)
+class EncodedScreenshot:
+    screenshot: str
+    thumbnail: str = ''
+    # the frame looks the same as the previous one, and so does the encoding
+    unchanged: bool = False
+    # numbers the frames a pipeline encodes with dedup, an unchanged one repeats
+    # frame `seq`
+    seq: int = 0
+
+
+def to_image(pixels: np.ndarray | Image.Image) -> Image.Image:
+    image = Image.fromarray(pixels) if isinstance(pixels, np.ndarray) else pixels
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return image
+
+
+def fit(image: Image.Image, max_width: int, max_height: int) -> Image.Image:
+    """Downscales an image to fit the given bounds, keeping its aspect ratio."""
+    width, height = image.size
+    scale = 1.0
+    if max_width and width > max_width:
+        scale = max_width / width
+    if max_height and height > max_height:
+        scale = min(scale, max_height / height)
+    if scale == 1.0:
+        return image
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return image.resize(size, Image.Resampling.LANCZOS)
+
+
+def encode_image(image: Image.Image, format: str, quality: int) -> str:
+    buffered = io.BytesIO()
+    if format == 'png':
+        image.save(buffered, format='PNG')
+    else:
+        image.save(buffered, format=format.upper(), quality=quality)
+    return base64.b64encode(buffered.getvalue()).decode()
+
+
+def frame_hash(image: Image.Image) -> bytes:
+    """
+    Coarse hash of a frame: grayscale, box-downscaled to about 256 pixels wide and
+    6 bits per pixel. Rendering noise does not change it, any visible edit does.
+    """
+    gray = image.convert('L')
+    factor = max(1, gray.width // 256)
+    if factor > 1:
+        gray = gray.reduce(factor)
+    data = np.asarray(gray) >> 2
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f'{image.width}x{image.height}'.encode())
+    digest.update(data.tobytes())
+    return digest.digest()
+
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers: int) -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, workers), thread_name_prefix='screenshot'
+            )
+        return _executor
+
+
+class ScreenshotPipeline:
+    """
+    Encodes the screenshots of one browser env on a shared thread pool.
+
+    PIL releases the GIL while encoding, so this overlaps with the text
+    extraction of the same step. Frames that hash the same as the previous one
+    reuse its encoding and are flagged as unchanged, so callers can skip
+    sending them again. Each new frame gets the next `seq`, which is not reused
+    after a reset, so a receiver can tell whether it holds the frame repeated.
+    """
+
+    def __init__(self, settings: ScreenshotSettings | None = None):
+        self.settings = settings or ScreenshotSettings()
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._last_key: tuple | None = None
+        self._last: EncodedScreenshot | None = None
+
+    def submit(
+        self, pixels: np.ndarray | Image.Image, format: str = ''
+    ) -> 'Future[EncodedScreenshot]':
+        return _get_executor(self.settings.workers).submit(
+            self.encode, pixels, format, self.settings.dedup
+        )
+
+    def encode(
+        self, pixels: np.ndarray | Image.Image, format: str = '', dedup: bool = False
+    ) -> EncodedScreenshot:
+        format = format or self.settings.format
+        if format not in SCREENSHOT_FORMATS:
+            raise ValueError(f'Invalid screenshot format: {format}')
+        image = to_image(pixels)
+        key = None
+        if dedup:
+            key = (frame_hash(image), format)
+            with self._lock:
+                if self._last is not None and key == self._last_key:
+                    return replace(self._last, unchanged=True)
+        width, height = image.size
+        logger.debug(f'Width: {width}, Height: {height}')
+        settings = self.settings
+        image = fit(image, settings.max_width, settings.max_height)
+        thumbnail = ''
+        if settings.thumbnail_width:
+            thumbnail = encode_image(
+                fit(image, settings.thumbnail_width, 0), format, settings.quality
+            )
+        encoded = EncodedScreenshot(
+            encode_image(image, format, settings.quality), thumbnail
+        )
+        if dedup:
+            with self._lock:
+                self._seq += 1
+                encoded = replace(encoded, seq=self._seq)
+                self._last_key = key
+                self._last = encoded
+        return encoded
+
+    def reset(self):
+        with self._lock:
+            self._last_key = None
+            self._last = None
@@ -0,0 +1,150 @@
+import pickle
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Any
+
+import numpy as np
+
+FREE = 0
+BUSY = 1
+
+
+@dataclass(frozen=True)
+class ShmHandle:
+    """Points at a payload written into a slot of a SharedMemoryRing."""
+
+    slot: int
+    size: int
+    kind: str  # 'ndarray' or 'pickle'
+    shape: tuple = ()
+    dtype: str = ''
+
+
+class SharedMemoryRing:
+    """
+    Fixed-size slots in a shared memory block, used to move large observation
+    payloads (screenshot pixels, DOM and AXTree) from the browser worker to the
+    agent side without pushing them through the pipe.
+
+    The agent side creates the ring and the worker attaches to it by name. The
+    first `slots` bytes hold the state of each slot: the worker claims a free slot
+    to write a payload and sends a ShmHandle instead, the agent side copies the
+    payload out and frees the slot. A payload that does not fit, or finds no free
+    slot, is sent inline through the pipe as before.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, slots: int, slot_size: int):
+        self.shm = shm
+        self.slots = slots
+        self.slot_size = slot_size
+        self._next = 0
+
+    @classmethod
+    def create(cls, slots: int, slot_size: int) -> 'SharedMemoryRing':
+        shm = shared_memory.SharedMemory(create=True, size=slots + slots * slot_size)
+        shm.buf[:slots] = bytes(slots)
+        return cls(shm, slots, slot_size)
+
+    @classmethod
+    def attach(cls, name: str, slots: int, slot_size: int) -> 'SharedMemoryRing':
+        # spawned workers share the resource tracker of the agent side, which
+        # unlinks the block when the agent side closes or exits
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, slots, slot_size)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def put(self, value: Any) -> ShmHandle | None:
+        """Writes a numpy array or a picklable object into a free slot."""
+        if isinstance(value, np.ndarray):
+            data: Any = np.ascontiguousarray(value)
+            size = data.nbytes
+            handle_args: dict = {
+                'kind': 'ndarray',
+                'shape': data.shape,
+                'dtype': data.dtype.str,
+            }
+            data = data.reshape(-1).view(np.uint8)
+        else:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            size = len(data)
+            handle_args = {'kind': 'pickle'}
+        if size > self.slot_size:
+            return None
+        slot = self._claim()
+        if slot is None:
+            return None
+        offset = self._offset(slot)
+        self.shm.buf[offset : offset + size] = data
+        return ShmHandle(slot=slot, size=size, **handle_args)
+
+    def get(self, handle: ShmHandle) -> Any:
+        """Copies a payload out of its slot and frees the slot."""
+        offset = self._offset(handle.slot)
+        try:
+            view = self.shm.buf[offset : offset + handle.size]
+            try:
+                if handle.kind == 'ndarray':
+                    return (
+                        np.frombuffer(view, dtype=np.dtype(handle.dtype))
+                        .reshape(handle.shape)
+                        .copy()
+                    )
+                return pickle.loads(view)
+            finally:
+                view.release()
+        finally:
+            self.free(handle)
+
+    def free(self, handle: ShmHandle) -> None:
+        self.shm.buf[handle.slot] = FREE
+
+    def close(self, unlink: bool = False) -> None:
+        try:
+            self.shm.close()
+        except BufferError:
+            # a payload view is still alive, the OS reclaims the block on exit
+            return
+        if unlink:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _claim(self) -> int | None:
+        # only the worker claims slots, so there is no race on FREE -> BUSY
+        for i in range(self.slots):
+            slot = (self._next + i) % self.slots
+            if self.shm.buf[slot] == FREE:
+                self.shm.buf[slot] = BUSY
+                self._next = (slot + 1) % self.slots
+                return slot
+        return None
+
+    def _offset(self, slot: int) -> int:
+        return self.slots + slot * self.slot_size
+
+
+def pack(ring: SharedMemoryRing | None, value: Any) -> Any:
+    """Moves a value into the ring, returns it unchanged if it has to go inline."""
+    if ring is None:
+        return value
+    return ring.put(value) or value
+
+
+def unpack(ring: SharedMemoryRing | None, value: Any) -> Any:
+    """Replaces the handles in a response, or the response itself, by their payloads."""
+    if ring is None:
+        return value
+    if isinstance(value, ShmHandle):
+        return ring.get(value)
+    if isinstance(value, dict) and any(
+        isinstance(v, ShmHandle) for v in value.values()
+    ):
+        return {
+            key: ring.get(v) if isinstance(v, ShmHandle) else v
+            for key, v in value.items()
+        }
+    return value
@@ -0,0 +1,96 @@
+import threading
+from typing import Any
+
+from easyweb.core.config import config
+from easyweb.core.logger import easyweb_logger as logger
+
+
+class BrowserSupervisor:
+    """
+    Watches the browser workers of the BrowserEnvs in this process.
+
+    Workers send heartbeats (see `run_browser_worker`). A worker whose process
+    exited, that stopped sending them, or that has been stuck on one request for
+    longer than `hang_timeout` seconds is killed, which fails its pending requests
+    with BrowserCrashedError, and every env it hosted is restarted on a new worker
+    from its last session snapshot.
+    """
+
+    def __init__(
+        self,
+        interval: float = 5,
+        heartbeat_timeout: float = 30,
+        hang_timeout: float = 120,
+    ):
+        self.interval = interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.hang_timeout = hang_timeout
+        self._envs: set[Any] = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def watch(self, env: Any):
+        with self._lock:
+            self._envs.add(env)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._loop, name='browser-supervisor', daemon=True
+                )
+                self._thread.start()
+
+    def unwatch(self, env: Any):
+        with self._lock:
+            self._envs.discard(env)
+
+    def check(self):
+        """Restarts the envs of every worker that is dead or hung."""
+        with self._lock:
+            envs = list(self._envs)
+        by_worker: dict[int, tuple[Any, list]] = {}
+        for env in envs:
+            worker = env.worker
+            if worker is not None:
+                by_worker.setdefault(id(worker), (worker, []))[1].append(env)
+        for worker, worker_envs in by_worker.values():
+            problem = worker.health_problem(self.heartbeat_timeout, self.hang_timeout)
+            if not problem:
+                continue
+            logger.warning(
+                f'Browser worker failed ({problem}), restarting {len(worker_envs)} env(s)'
+            )
+            worker.abort(problem)
+            for env in worker_envs:
+                try:
+                    env.restart(worker)
+                except Exception:
+                    logger.error('Failed to restart browser env', exc_info=True)
+
+    def close(self):
+        self._stopped.set()
+
+    def _loop(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                logger.error('Browser supervisor check failed', exc_info=True)
+
+
+_supervisor: BrowserSupervisor | None = None
+_supervisor_lock = threading.Lock()
+
+
+def get_browser_supervisor() -> BrowserSupervisor | None:
+    """The process wide supervisor, None if browser heartbeats are disabled."""
+    global _supervisor
+    if config.browser_heartbeat_interval <= 0:
+        return None
+    with _supervisor_lock:
+        if _supervisor is None:
+            _supervisor = BrowserSupervisor(
+                interval=config.browser_heartbeat_interval,
+                heartbeat_timeout=config.browser_heartbeat_timeout,
+                hang_timeout=config.browser_hang_timeout,
+            )
+        return _supervisor
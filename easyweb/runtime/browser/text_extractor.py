@@ -0,0 +1,316 @@
+import re
+from abc import ABC, abstractmethod
+
+from browsergym.utils.obs import flatten_dom_to_str
+
+from easyweb.runtime.browser.utils import get_html_text_converter
+
+_WHITESPACE = re.compile(r'\s+')
+_SPACES = re.compile(r' {2,}')
+_BLANK_LINES = re.compile(r'\n{3,}')
+# <pre> text is shielded from whitespace normalization with these
+_PRE_ESCAPES = {ord('\n'): '\x00', ord(' '): '\x01', ord('\t'): '\x02'}
+_PRE_UNESCAPES = {ord('\x00'): '\n', ord('\x01'): ' ', ord('\x02'): '\t'}
+
+SKIPPED_TAGS = frozenset(
+    {
+        'head',
+        'title',
+        'script',
+        'style',
+        'noscript',
+        'template',
+        'svg',
+        'canvas',
+        'meta',
+        'link',
+        'input',
+        'select',
+        'option',
+        'button',
+    }
+)
+BLOCK_TAGS = frozenset(
+    {
+        'html',
+        'body',
+        'address',
+        'article',
+        'aside',
+        'blockquote',
+        'dd',
+        'details',
+        'dialog',
+        'div',
+        'dl',
+        'dt',
+        'fieldset',
+        'figcaption',
+        'figure',
+        'footer',
+        'form',
+        'header',
+        'iframe',
+        'main',
+        'nav',
+        'ol',
+        'p',
+        'section',
+        'summary',
+        'table',
+        'ul',
+    }
+)
+HEADINGS = {f'h{level}': '#' * level for level in range(1, 7)}
+# the steps of DomTextExtractor's walk of a tree
+_DOCUMENT, _NODE, _CLOSE = range(3)
+# the only attributes that end up in the text
+_TEXT_ATTRIBUTES = {'a': 'href', 'img': 'alt'}
+
+
+class TextExtractor(ABC):
+    """Turns the DOM snapshot of a browser observation into the page's text_content."""
+
+    @abstractmethod
+    def extract(self, dom_snapshot: dict) -> str:
+        pass
+
+
+class Html2TextExtractor(TextExtractor):
+    """Flattens the snapshot to HTML and converts it with html2text."""
+
+    def __init__(self):
+        self.converter = get_html_text_converter()
+
+    def extract(self, dom_snapshot: dict) -> str:
+        return self.converter.handle(flatten_dom_to_str(dom_snapshot))
+
+
+class DomTextExtractor(TextExtractor):
+    """
+    Renders markdown-like text straight from the columns of the DOM snapshot.
+
+    Every node gets a key hashed from its content and its children's keys, and
+    the text of each element is remembered by key, so subtrees that did not
+    change since the previous snapshot are not rendered again. The least recently
+    used texts are forgotten once they add up to more than `max_chars`.
+    """
+
+    def __init__(self, max_chars: int = 8_000_000):
+        self.max_chars = max_chars
+        self.memo: dict[tuple, str] = {}
+        self.memo_chars = 0
+        self.hits = 0
+
+    def extract(self, dom_snapshot: dict) -> str:
+        self.hits = 0
+        self._strings = dom_snapshot['strings']
+        self._documents = dom_snapshot['documents']
+        self._keys: dict[int, list[int]] = {}
+        self._children: dict[int, list[list[int]]] = {}
+        self._subdocuments: dict[int, dict[int, int]] = {}
+        text = self._render_document(0, False)
+        del self._strings, self._documents, self._keys, self._children
+        del self._subdocuments
+        # dicts keep insertion order, and reused texts are moved to the end
+        while self.memo_chars > self.max_chars and self.memo:
+            self.memo_chars -= len(self.memo.pop(next(iter(self.memo))))
+        return _normalize(text)
+
+    def _string(self, index: int) -> str | None:
+        return None if index == -1 else self._strings[index]
+
+    def _attribute(self, nodes: dict, node: int, name: str) -> str | None:
+        attributes = nodes['attributes'][node]
+        for i in range(0, len(attributes), 2):
+            if self._strings[attributes[i]] == name:
+                return self._string(attributes[i + 1])
+        return None
+
+    def _index(self, document: int):
+        """Computes the children and content keys of every node of a document."""
+        nodes = self._documents[document]['nodes']
+        parents = nodes['parentIndex']
+        types = nodes['nodeType']
+        names = nodes['nodeName']
+        values = nodes['nodeValue']
+        content_documents = nodes.get('contentDocumentIndex', {})
+        subdocuments = dict(
+            zip(content_documents.get('index', []), content_documents.get('value', []))
+        )
+        count = len(parents)
+        children: list[list[int]] = [[] for _ in range(count)]
+        for node in range(1, count):
+            if parents[node] != -1:
+                children[parents[node]].append(node)
+        keys = [0] * count
+        # parents come before their children in snapshot order
+        for node in range(count - 1, -1, -1):
+            name = self._string(names[node])
+            attribute_name = _TEXT_ATTRIBUTES.get(name.lower()) if name else None
+            keys[node] = hash(
+                (
+                    types[node],
+                    name,
+                    self._string(values[node]),
+                    self._attribute(nodes, node, attribute_name)
+                    if attribute_name
+                    else None,
+                    self._document_key(subdocuments[node])
+                    if node in subdocuments
+                    else None,
+                    tuple(keys[child] for child in children[node]),
+                )
+            )
+        self._keys[document] = keys
+        self._children[document] = children
+        self._subdocuments[document] = subdocuments
+
+    def _document_key(self, document: int) -> int:
+        if document not in self._keys:
+            self._index(document)
+        return self._keys[document][0] if self._keys[document] else 0
+
+    def _render_document(self, document: int, in_pre: bool) -> str:
+        """
+        Renders a document, with the documents of its frames. The tree is walked
+        with a stack of its own, as pages can nest deeper than Python recurses.
+        """
+        # (kind, document, node, in_pre, where the texts of the node's children start)
+        stack = [(_DOCUMENT, document, 0, in_pre, 0)]
+        # the texts of the nodes whose parents are still open
+        texts: list[str] = []
+        while stack:
+            kind, document, node, in_pre, start = stack.pop()
+            if kind == _DOCUMENT:
+                if document not in self._keys:
+                    self._index(document)
+                if self._keys[document]:
+                    stack.append((_NODE, document, 0, in_pre, 0))
+                else:
+                    texts.append('')
+                continue
+            if kind == _CLOSE:
+                content = ''.join(texts[start:])
+                del texts[start:]
+                text = self._close_element(document, node, in_pre, content)
+                self.memo_chars += len(text)
+                self.memo[(self._keys[document][node], in_pre)] = text
+                texts.append(text)
+                continue
+            text = self._render(document, node, in_pre)
+            if text is not None:
+                texts.append(text)
+                continue
+            # the element is closed once its frame's document and children are in
+            stack.append((_CLOSE, document, node, in_pre, len(texts)))
+            nodes = self._documents[document]['nodes']
+            tag = (self._string(nodes['nodeName'][node]) or '').lower()
+            in_pre = in_pre or tag == 'pre'
+            opened = [
+                (_NODE, document, child, in_pre, 0)
+                for child in self._children[document][node]
+            ]
+            if node in self._subdocuments[document]:
+                subdocument = self._subdocuments[document][node]
+                opened.insert(0, (_DOCUMENT, subdocument, 0, in_pre, 0))
+            stack.extend(reversed(opened))
+        return texts[0]
+
+    def _render(self, document: int, node: int, in_pre: bool) -> str | None:
+        """The text of a node, None for an element whose children must be rendered first."""
+        nodes = self._documents[document]['nodes']
+        node_type = nodes['nodeType'][node]
+        if node_type == 3:  # text
+            value = self._string(nodes['nodeValue'][node]) or ''
+            if in_pre:
+                return value.translate(_PRE_ESCAPES)
+            return _WHITESPACE.sub(' ', value)
+        if node_type not in (1, 9):  # only elements and documents have text
+            return ''
+
+        memo_key = (self._keys[document][node], in_pre)
+        text = self.memo.pop(memo_key, None)
+        if text is not None:
+            self.hits += 1
+        else:
+            text = self._render_empty_element(nodes, node)
+            if text is None:
+                return None
+            self.memo_chars += len(text)
+        self.memo[memo_key] = text
+        return text
+
+    def _render_empty_element(self, nodes: dict, node: int) -> str | None:
+        """The text of an element that does not depend on its children, if any."""
+        tag = (self._string(nodes['nodeName'][node]) or '').lower()
+        if tag in SKIPPED_TAGS:
+            return ''
+        if tag == 'img':
+            alt = self._attribute(nodes, node, 'alt')
+            return f' {alt} ' if alt else ''
+        if tag == 'br':
+            return '\n'
+        if tag == 'hr':
+            return '\n\n* * *\n\n'
+        return None
+
+    def _close_element(
+        self, document: int, node: int, in_pre: bool, content: str
+    ) -> str:
+        nodes = self._documents[document]['nodes']
+        tag = (self._string(nodes['nodeName'][node]) or '').lower()
+        in_pre = in_pre or tag == 'pre'
+        if tag == 'pre':
+            return f'\n\n```\x00{content}\x00```\n\n'
+        if in_pre:
+            return content
+        if tag in HEADINGS:
+            return f'\n\n{HEADINGS[tag]} {content.strip()}\n\n'
+        if tag == 'li':
+            return f'\n* {content.strip()}'
+        if tag == 'a':
+            href = self._attribute(nodes, node, 'href')
+            text = content.strip()
+            if href and text and not href.startswith('javascript:'):
+                return f'[{text}]({href})'
+            return content
+        if tag in ('strong', 'b'):
+            text = content.strip()
+            return f' **{text}** ' if text else ''
+        if tag in ('em', 'i'):
+            text = content.strip()
+            return f' _{text}_ ' if text else ''
+        if tag == 'code':
+            text = content.strip()
+            return f'`{text}`' if text else ''
+        if tag in ('td', 'th'):
+            return f'{content.strip()} | '
+        if tag == 'tr':
+            return f'\n| {content.strip()}\n'
+        if tag in BLOCK_TAGS:
+            return f'\n\n{content.strip()}\n\n'
+        return content
+
+
+def _normalize(text: str) -> str:
+    lines = (_SPACES.sub(' ', line).strip() for line in text.split('\n'))
+    text = _BLANK_LINES.sub('\n\n', '\n'.join(lines)).strip()
+    return text.translate(_PRE_UNESCAPES) + '\n'
+
+
+TEXT_EXTRACTORS: dict[str, type[TextExtractor]] = {
+    'html2text': Html2TextExtractor,
+    'dom': DomTextExtractor,
+}
+
+
+def register_text_extractor(name: str, extractor_cls: type[TextExtractor]):
+    TEXT_EXTRACTORS[name] = extractor_cls
+
+
+def get_text_extractor(name: str) -> TextExtractor:
+    """Creates the named text extractor, each browser env keeps its own."""
+    if name not in TEXT_EXTRACTORS:
+        raise ValueError(f'Unknown text extractor: {name}')
+    return TEXT_EXTRACTORS[name]()
@@ -0,0 +1,226 @@
+from dataclasses import dataclass
+from typing import Any
+
+# observation fields that can be sent as diffs
+TREE_FIELDS = ('dom_object', 'axtree_object')
+
+SAME = ('=',)
+PATCH_KINDS = ('=', 'set', 'splice', 'items', 'dict')
+
+
+@dataclass(frozen=True)
+class TreeDelta:
+    """
+    A DOM or AXTree snapshot sent as a change against the previous one.
+
+    `seq` numbers the snapshots of one field of one browser env. A keyframe holds
+    the full snapshot, otherwise `data` is a patch against snapshot `base`.
+    """
+
+    field: str
+    seq: int
+    base: int
+    keyframe: bool
+    data: Any
+
+
+def node_key(node: dict) -> str:
+    bid = node.get('browsergym_id')
+    if bid is not None:
+        return f'bid:{bid}'
+    return f'ax:{node["nodeId"]}'
+
+
+def diff_axtree(prev: dict, curr: dict) -> dict | None:
+    """
+    Diffs two AXTree snapshots node by node, keyed by bid (or AX node id for nodes
+    without one). Returns None if the nodes can't be keyed uniquely.
+    """
+    prev_nodes = {node_key(node): node for node in prev['nodes']}
+    curr_nodes = {node_key(node): node for node in curr['nodes']}
+    if len(prev_nodes) != len(prev['nodes']) or len(curr_nodes) != len(curr['nodes']):
+        return None
+    added = {key: node for key, node in curr_nodes.items() if key not in prev_nodes}
+    changed = {
+        key: node
+        for key, node in curr_nodes.items()
+        if key in prev_nodes and prev_nodes[key] != node
+    }
+    removed = [key for key in prev_nodes if key not in curr_nodes]
+    order = list(curr_nodes)
+    return {
+        'added': added,
+        'changed': changed,
+        'removed': removed,
+        # the node order drives the tree traversal, only sent when it moved
+        'order': None if order == list(prev_nodes) else order,
+        'meta': {key: value for key, value in curr.items() if key != 'nodes'},
+    }
+
+
+def apply_axtree(prev: dict, patch: dict) -> dict:
+    nodes = {node_key(node): node for node in prev['nodes']}
+    for key in patch['removed']:
+        nodes.pop(key, None)
+    nodes.update(patch['added'])
+    nodes.update(patch['changed'])
+    order = patch['order'] if patch['order'] is not None else list(nodes)
+    return {**patch['meta'], 'nodes': [nodes[key] for key in order]}
+
+
+def axtree_patch_weight(patch: dict) -> int:
+    return len(patch['added']) + len(patch['changed']) + len(patch['removed'])
+
+
+def diff_value(prev: Any, curr: Any) -> tuple:
+    """
+    Structural diff for the columnar DOM snapshot: dicts are diffed key by key,
+    lists of the same length item by item, other lists by their common prefix and
+    suffix, so that appended or locally edited nodes only ship the affected slice
+    of each column.
+    """
+    if prev == curr:
+        return SAME
+    if isinstance(prev, dict) and isinstance(curr, dict):
+        patch = {}
+        for key, value in curr.items():
+            if key not in prev:
+                patch[key] = ('set', value)
+                continue
+            value_patch = diff_value(prev[key], value)
+            if value_patch is not SAME:
+                patch[key] = value_patch
+        removed = [key for key in prev if key not in curr]
+        return ('dict', patch, removed)
+    if isinstance(prev, list) and isinstance(curr, list):
+        if len(prev) == len(curr):
+            # same shape, patch the items that changed in place
+            items = {}
+            for i, (prev_item, curr_item) in enumerate(zip(prev, curr)):
+                if prev_item != curr_item:
+                    items[i] = diff_value(prev_item, curr_item)
+            if len(items) * 2 <= len(curr):
+                return ('items', items)
+        limit = min(len(prev), len(curr))
+        start = 0
+        while start < limit and prev[start] == curr[start]:
+            start += 1
+        end = 0
+        while end < limit - start and prev[-1 - end] == curr[-1 - end]:
+            end += 1
+        if start == 0 and end == 0:
+            return ('set', curr)
+        return ('splice', start, len(prev) - start - end, curr[start : len(curr) - end])
+    return ('set', curr)
+
+
+def apply_value(prev: Any, patch: tuple) -> Any:
+    kind = patch[0]
+    if kind == '=':
+        return prev
+    if kind == 'set':
+        return patch[1]
+    if kind == 'splice':
+        _, start, deleted, inserted = patch
+        return prev[:start] + inserted + prev[start + deleted :]
+    if kind == 'items':
+        value = list(prev)
+        for i, change in patch[1].items():
+            value[i] = apply_value(prev[i], change)
+        return value
+    if kind == 'dict':
+        _, changes, removed = patch
+        value = dict(prev)
+        for key, change in changes.items():
+            value[key] = apply_value(prev.get(key), change)
+        for key in removed:
+            value.pop(key, None)
+        return value
+    raise ValueError(f'Unknown patch kind: {kind}')
+
+
+def value_weight(value: Any) -> int:
+    """Rough size of a snapshot or patch: the number of list items it carries."""
+    if isinstance(value, dict):
+        return sum(value_weight(item) for item in value.values())
+    if isinstance(value, tuple) and value and value[0] in PATCH_KINDS:
+        if value[0] == 'splice':
+            return len(value[3])
+        if value[0] == '=':
+            return 0
+        return value_weight(value[1])
+    if isinstance(value, list):
+        return len(value)
+    return 1
+
+
+class TreeDiffer:
+    """
+    Browser worker side: turns consecutive snapshots of one field into TreeDeltas.
+
+    A keyframe is sent for the first snapshot, every `keyframe_interval` snapshots,
+    and whenever the diff would be more than half the size of the snapshot.
+    """
+
+    def __init__(self, field: str, keyframe_interval: int = 10):
+        self.field = field
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.reset()
+
+    def reset(self):
+        self.seq = 0
+        self.prev: Any = None
+        self.since_keyframe = 0
+
+    def encode(self, tree: Any) -> TreeDelta:
+        base = self.seq
+        self.seq += 1
+        patch = None
+        if self.prev is not None and self.since_keyframe < self.keyframe_interval:
+            patch = self._diff(self.prev, tree)
+        self.prev = tree
+        if patch is None:
+            self.since_keyframe = 1
+            return TreeDelta(self.field, self.seq, base, True, tree)
+        self.since_keyframe += 1
+        return TreeDelta(self.field, self.seq, base, False, patch)
+
+    def _diff(self, prev: Any, curr: Any):
+        if self.field == 'axtree_object':
+            patch = diff_axtree(prev, curr)
+            if patch is None or axtree_patch_weight(patch) * 2 > len(curr['nodes']):
+                return None
+            return patch
+        patch = diff_value(prev, curr)
+        if value_weight(patch) * 2 > value_weight(curr):
+            return None
+        return patch
+
+
+class TreeReconstructor:
+    """Agent side: rebuilds full snapshots from the TreeDeltas of one field."""
+
+    def __init__(self, field: str):
+        self.field = field
+        self.reset()
+
+    def reset(self):
+        self.seq = 0
+        self.tree: Any = None
+
+    def apply(self, delta: TreeDelta) -> Any:
+        """Returns the full snapshot, or None if the delta is not based on the last one."""
+        if delta.keyframe:
+            tree = delta.data
+        elif self.tree is None or delta.base != self.seq:
+            return None
+        elif self.field == 'axtree_object':
+            tree = apply_axtree(self.tree, delta.data)
+        else:
+            tree = apply_value(self.tree, delta.data)
+        self.load(delta.seq, tree)
+        return tree
+
+    def load(self, seq: int, tree: Any):
+        self.seq = seq
+        self.tree = tree
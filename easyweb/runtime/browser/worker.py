@@ -0,0 +1,1079 @@
+import asyncio
+import atexit
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import Connection
+from typing import Any
+from urllib.parse import urlparse
+
+import browsergym.core  # noqa F401 (we register the openended task as a gym environment)
+import gymnasium as gym
+import playwright.sync_api
+from browsergym.core.action.base import execute_python_code
+from browsergym.utils.obs import flatten_dom_to_str
+
+from easyweb.core.config import config
+from easyweb.core.exceptions import (
+    BrowserCrashedError,
+    BrowserInitException,
+    BrowserUnavailableException,
+)
+from easyweb.core.logger import easyweb_logger as logger
+from easyweb.runtime.browser.asset_cache import get_asset_cache
+from easyweb.runtime.browser.axtree import AXTreeFlattener, parse_axtree_flags
+from easyweb.runtime.browser.channel import HEARTBEAT, BrowserChannel
+from easyweb.runtime.browser.load_profile import PageLoader, get_load_profile
+from easyweb.runtime.browser.prefetch import Prefetcher
+from easyweb.runtime.browser.profile import OBSERVATION_FIELDS, ObservationProfile
+from easyweb.runtime.browser.screenshot import ScreenshotPipeline, ScreenshotSettings
+from easyweb.runtime.browser.shm import SharedMemoryRing, pack, unpack
+from easyweb.runtime.browser.text_extractor import get_text_extractor
+from easyweb.runtime.browser.tree_diff import TREE_FIELDS, TreeDiffer
+
+# fields large enough to be worth moving through shared memory
+SHM_FIELDS = ('screenshot', 'dom_object', 'axtree_object')
+# how long batched actions give the page's JavaScript to run before the next
+# one, a shorter version of the half second BrowserGym waits after each step
+BATCH_SETTLE_MS = 100
+
+
+class GymContext:
+    """
+    One BrowserGym env hosted by a browser worker process.
+
+    Each session gets its own env, and with it its own Playwright BrowserContext
+    (cookies, storage, tabs). Only lives inside the worker process.
+    """
+
+    def __init__(
+        self,
+        browsergym_eval: str = '',
+        eval_dir: str = '',
+        screenshot_settings: dict | None = None,
+        tree_keyframe_interval: int = 0,
+        asset_cache: dict | None = None,
+        snapshot_session: bool = False,
+        session_state: dict | None = None,
+        text_extractor: str = 'html2text',
+        prefetch: dict | None = None,
+    ):
+        self.browsergym_eval = browsergym_eval
+        self.eval_mode = bool(browsergym_eval)
+        self.eval_dir = eval_dir
+        self.text_extractor = get_text_extractor(text_extractor)
+        self.env: Any = None
+        self.initial_chat_length = 0
+        self.visited_origins: set[str] = set()
+        self.rewards: list[float] = []  # store rewards if in eval mode
+        self.last_obs: dict | None = None
+        self.last_request_id = ''
+        self.raw_screenshot = False
+        self.screenshots = ScreenshotPipeline(
+            ScreenshotSettings(**(screenshot_settings or {}))
+        )
+        self.loader = PageLoader()
+        # send tabs, cookies and storage with every step, so that the env can be
+        # restored from `session_state` if its worker has to be restarted
+        self.snapshot_session = snapshot_session
+        self.session_state = session_state
+        # static assets shared with the other envs on this host
+        self.asset_cache = get_asset_cache(**asset_cache) if asset_cache else None
+        # warms the likely next pages while the agent thinks, None disables
+        self.prefetcher = Prefetcher(**prefetch) if prefetch else None
+        # remembers the text of unchanged AXTree subtrees between steps
+        self.axtree_flattener = AXTreeFlattener()
+        # send DOM and AXTree as diffs against the previous step, 0 disables
+        self.tree_differs = (
+            {field: TreeDiffer(field, tree_keyframe_interval) for field in TREE_FIELDS}
+            if tree_keyframe_interval
+            else {}
+        )
+
+    def start(self):
+        if self.eval_mode:
+            logger.info('Creating browser env for evaluation purpose.')
+            self.env = gym.make(self.browsergym_eval)
+        else:
+            self.env = gym.make(
+                'browsergym/openended',
+                task_kwargs={'start_url': 'about:blank', 'goal': 'PLACEHOLDER_GOAL'},
+                wait_for_user_message=False,
+                headless=True,
+                disable_env_checker=True,
+                timeout=10000,
+            )
+        obs, info = self.env.reset()
+        if self.asset_cache is not None:
+            # routed before the load profile, whose blocking rules run first
+            self.env.unwrapped.context.route('**/*', self.asset_cache.handle)
+        self.loader.attach(self.env.unwrapped)
+        if self.session_state:
+            self.restore(self.session_state)
+        # remember the blank state so the env can be scrubbed for reuse
+        self.initial_chat_length = len(self.env.unwrapped.chat.messages)
+        # EVAL only: save the goal into file for evaluation
+        if self.eval_mode:
+            logger.info(obs['goal'])
+            with open(
+                os.path.join(self.eval_dir, 'goal.txt'), 'w', encoding='utf-8'
+            ) as f:
+                f.write(obs['goal'])
+
+    def close(self):
+        if self.env is None:
+            return
+        try:
+            self.env.close()
+        except Exception:
+            pass
+        self.env = None
+
+    def step(
+        self,
+        action: str,
+        request_id: str,
+        profile: ObservationProfile,
+        load_profile: str = 'full',
+        hints: str = '',
+    ) -> dict:
+        self.loader.use(get_load_profile(load_profile))
+        # a prefetched tab already shows where the action leads
+        promoted = self.prefetcher is not None and self.prefetcher.take(
+            self.env.unwrapped, action
+        )
+        obs, reward, terminated, truncated, info = self.env.step(
+            'noop(0)' if promoted else action
+        )
+        if promoted:
+            self.env.unwrapped.last_action = obs['last_action'] = action
+        # keep the raw observation around, so that fields the profile skips can
+        # still be fetched on demand until the next step
+        self.last_obs = obs
+        self.last_request_id = request_id
+
+        for url in obs['open_pages_urls']:
+            origin = get_origin(url)
+            if origin:
+                self.visited_origins.add(origin)
+
+        # EVAL only: save the rewards into file for evaluation
+        if self.eval_mode:
+            self.rewards.append(reward)
+            with open(
+                os.path.join(self.eval_dir, 'rewards.json'),
+                'w',
+                encoding='utf-8',
+            ) as f:
+                f.write(json.dumps(self.rewards))
+
+        result = self._serialize(obs, request_id, profile)
+        # encode the screenshot in the background while the text is extracted
+        screenshot = None
+        if profile.screenshot and not self.raw_screenshot:
+            screenshot = self.screenshots.submit(
+                obs['screenshot'], profile.screenshot_format
+            )
+        for field in OBSERVATION_FIELDS:
+            if profile.wants(field) and field != 'screenshot':
+                result[field] = self.extract(field, profile)
+                if field in self.tree_differs:
+                    result[field] = self.tree_differs[field].encode(result[field])
+        if screenshot is not None:
+            encoded = screenshot.result()
+            result['screenshot_seq'] = encoded.seq
+            if encoded.unchanged:
+                # the agent side still has this frame, unless it dropped the
+                # response that sent it, see BrowserEnv._restore_screenshot
+                result['screenshot_unchanged'] = True
+            else:
+                result['screenshot'] = encoded.screenshot
+                if encoded.thumbnail:
+                    result['screenshot_thumbnail'] = encoded.thumbnail
+        elif profile.screenshot:
+            result['screenshot'] = obs['screenshot']
+        if self.snapshot_session:
+            result['session_state'] = self.snapshot()
+        if self.prefetcher is not None:
+            self.prefetcher.start(self.env.unwrapped, obs, hints)
+            result['prefetch_metrics'] = self.prefetcher.metrics.to_dict()
+        return result
+
+    def _serialize(self, obs: dict, request_id: str, profile: ObservationProfile):
+        """The plain fields of a BrowserGym observation, made serializable."""
+        result = {
+            key: value
+            for key, value in obs.items()
+            if key not in OBSERVATION_FIELDS and key != 'extra_element_properties'
+        }
+        result['active_page_index'] = obs['active_page_index'].item()
+        result['elapsed_time'] = obs['elapsed_time'].item()
+        result['request_id'] = request_id
+        if profile.axtree_object or profile.dom_object:
+            result['extra_element_properties'] = obs['extra_element_properties']
+        return result
+
+    def step_batch(
+        self,
+        actions: list[str],
+        request_id: str,
+        profile: ObservationProfile,
+        load_profile: str = 'full',
+        stop_on_error: bool = True,
+        hints: str = '',
+    ) -> dict:
+        """
+        Runs actions back to back and only observes the page after the last one.
+
+        The actions before it are just checked for the resulting URL and error,
+        reported in `batch_checks`. With `stop_on_error` the batch ends at the
+        first failing action, and the observation carries its error.
+        """
+        self.loader.use(get_load_profile(load_profile))
+        if self.prefetcher is not None:
+            self.prefetcher.discard(self.env.unwrapped)
+        checks = []
+        for action in actions[:-1]:
+            checks.append(self.execute(action))
+            if stop_on_error and checks[-1]['error']:
+                break
+        else:
+            result = self.step(actions[-1], request_id, profile, load_profile, hints)
+            result['batch_checks'] = checks + [
+                {
+                    'action': actions[-1],
+                    'url': result['url'],
+                    'error': result['last_action_error'],
+                }
+            ]
+            return result
+        # observe the page the failing action left behind
+        result = self.step('noop(0)', request_id, profile, load_profile, hints)
+        result['last_action'] = checks[-1]['action']
+        result['last_action_error'] = checks[-1]['error']
+        result['batch_checks'] = checks
+        return result
+
+    def execute(self, action: str) -> dict:
+        """Runs an action like BrowserGym's step does, without observing the page."""
+        unwrapped = self.env.unwrapped
+        unwrapped.last_action = action
+
+        def send_message_to_user(text: str):
+            if not isinstance(text, str):
+                raise ValueError(f'Forbidden value: {text} is not a string')
+            unwrapped.chat.add_message(role='assistant', msg=text)
+
+        def report_infeasible_instructions(reason: str):
+            if not isinstance(reason, str):
+                raise ValueError(f'Forbidden value: {reason} is not a string')
+            unwrapped.chat.add_message(role='infeasible', msg=reason)
+            unwrapped.infeasible_message_received = True
+
+        try:
+            code = (
+                unwrapped.action_mapping(action) if unwrapped.action_mapping else action
+            )
+            execute_python_code(
+                code,
+                unwrapped.page,
+                send_message_to_user=send_message_to_user,
+                report_infeasible_instructions=report_infeasible_instructions,
+            )
+            unwrapped.last_action_error = ''
+        except Exception as e:
+            unwrapped.last_action_error = f'{type(e).__name__}: {e}'
+        unwrapped.page.wait_for_timeout(BATCH_SETTLE_MS)
+        # trigger the Playwright callbacks that track the active page
+        unwrapped.context.cookies()
+        unwrapped._wait_dom_loaded()
+        unwrapped._active_page_check()
+        return {
+            'action': action,
+            'url': unwrapped.page.url,
+            'error': unwrapped.last_action_error,
+        }
+
+    def step_parallel(
+        self,
+        tabs: list[list[str]],
+        request_id: str,
+        profile: ObservationProfile,
+        load_profile: str = 'full',
+        close_tabs: bool = True,
+    ) -> dict:
+        """
+        Runs a list of actions in each of several new tabs, and observes every tab.
+
+        The tabs take turns running their next action. Navigations don't wait for
+        the page, so the pages load side by side in the browser, and the tabs only
+        wait for their page once everyone's action of the turn is under way. A tab
+        stops at its first error. The tabs share the env's cookies and storage;
+        with `close_tabs` they are closed after being observed. The active page
+        stays the same either way.
+        """
+        self.loader.use(get_load_profile(load_profile))
+        unwrapped = self.env.unwrapped
+        if self.prefetcher is not None:
+            self.prefetcher.discard(unwrapped)
+        active_page = unwrapped.page
+        pages = [_TabPage(unwrapped.context.new_page()) for _ in tabs]
+        last_actions = [''] * len(tabs)
+        errors = [''] * len(tabs)
+        try:
+            for turn in range(max((len(actions) for actions in tabs), default=0)):
+                running = [
+                    i
+                    for i, actions in enumerate(tabs)
+                    if turn < len(actions) and not errors[i]
+                ]
+                for i in running:
+                    last_actions[i] = tabs[i][turn]
+                    errors[i] = self._run_in_tab(pages[i], tabs[i][turn])
+                for i in running:
+                    error = pages[i].wait()
+                    errors[i] = errors[i] or error
+                    self._settle_tab(pages[i])
+            results = []
+            for page, last_action, error in zip(pages, last_actions, errors):
+                unwrapped.page = page._page
+                unwrapped.last_action = last_action
+                unwrapped.last_action_error = error
+                results.append(self._observe_tab(request_id, profile))
+        finally:
+            if close_tabs:
+                for page in pages:
+                    unwrapped.page_history.pop(page._page, None)
+                    page.close()
+            unwrapped.page = active_page
+            unwrapped._active_page_check()
+            unwrapped.page.bring_to_front()
+        for result in results:
+            origin = get_origin(result['url'])
+            if origin:
+                self.visited_origins.add(origin)
+        result = {
+            'request_id': request_id,
+            'tabs': results,
+            'url': unwrapped.page.url,
+            'open_pages_urls': [page.url for page in unwrapped.context.pages],
+        }
+        if self.snapshot_session:
+            result['session_state'] = self.snapshot()
+        return result
+
+    def _run_in_tab(self, page: '_TabPage', action: str) -> str:
+        """Runs an action on a background tab, returns its error."""
+        unwrapped = self.env.unwrapped
+        try:
+            code = (
+                unwrapped.action_mapping(action) if unwrapped.action_mapping else action
+            )
+            execute_python_code(
+                code,
+                page,
+                send_message_to_user=lambda text: None,
+                report_infeasible_instructions=lambda reason: None,
+            )
+            return ''
+        except Exception as e:
+            return f'{type(e).__name__}: {e}'
+
+    def _settle_tab(self, page: '_TabPage'):
+        try:
+            # what the navigation would have waited for on the active page
+            page.wait_for_load_state('load')
+        except playwright.sync_api.Error:
+            pass
+        self.loader.settle(page)
+
+    def _observe_tab(self, request_id: str, profile: ObservationProfile) -> dict:
+        """
+        Observes the env's current page in full: unlike a step's observation, a
+        tab's is neither diffed against the previous one nor sent through shared
+        memory, and its screenshot is always encoded here.
+        """
+        obs = self.env.unwrapped._get_obs()
+        result = self._serialize(obs, request_id, profile)
+        for field in OBSERVATION_FIELDS:
+            if not profile.wants(field):
+                continue
+            if field == 'screenshot':
+                encoded = self.screenshots.encode(
+                    obs['screenshot'], profile.screenshot_format
+                )
+                result['screenshot'] = encoded.screenshot
+                if encoded.thumbnail:
+                    result['screenshot_thumbnail'] = encoded.thumbnail
+            else:
+                result[field] = self.extract(field, profile, obs)
+        return result
+
+    @property
+    def prefetching(self) -> bool:
+        return self.prefetcher is not None and self.prefetcher.loading
+
+    def pump_prefetch(self):
+        if self.prefetching:
+            self.prefetcher.pump()
+
+    def snapshot(self) -> dict:
+        """The open tabs along with the Playwright storage state of the env."""
+        unwrapped = self.env.unwrapped
+        pages = unwrapped.context.pages
+        return {
+            'storage_state': unwrapped.context.storage_state(),
+            'urls': [page.url for page in pages],
+            'active_page_index': (
+                pages.index(unwrapped.page) if unwrapped.page in pages else 0
+            ),
+        }
+
+    def restore(self, state: dict):
+        """Brings back the cookies, local storage and tabs of a snapshot."""
+        unwrapped = self.env.unwrapped
+        context = unwrapped.context
+        storage_state = state.get('storage_state') or {}
+        if storage_state.get('cookies'):
+            context.add_cookies(storage_state['cookies'])
+        page = context.pages[0] if context.pages else context.new_page()
+
+        def blank(route):
+            route.fulfill(status=200, content_type='text/html', body='')
+
+        # local storage can only be written from a page of its origin, which is
+        # served blank instead of loading the site
+        for origin in storage_state.get('origins', []):
+            items = origin.get('localStorage') or []
+            if not items:
+                continue
+            url = origin['origin'] + '/'
+            # so that scrubbing the env clears it again
+            self.visited_origins.add(origin['origin'])
+            page.route(url, blank)
+            try:
+                page.goto(url)
+                page.evaluate(
+                    """items => {
+                        for (const {name, value} of items) {
+                            localStorage.setItem(name, value);
+                        }
+                    }""",
+                    items,
+                )
+            except Exception as e:
+                logger.warning(f'Failed to restore local storage of {url}: {e}')
+            finally:
+                page.unroute(url, blank)
+
+        urls = state.get('urls') or ['about:blank']
+        pages = [page] + [context.new_page() for _ in urls[1:]]
+        for tab, url in zip(pages, urls):
+            try:
+                tab.goto(url)
+            except Exception as e:
+                logger.warning(f'Failed to restore tab {url}: {e}')
+        active_page_index = state.get('active_page_index', 0)
+        if not 0 <= active_page_index < len(pages):
+            active_page_index = 0
+        unwrapped.page = pages[active_page_index]
+        unwrapped.page.bring_to_front()
+        logger.info(f'Restored browser session with {len(pages)} tab(s).')
+
+    def fetch(self, request_id: str, field: str, profile: ObservationProfile):
+        """Extracts a field of the latest observation, None if a newer step replaced it."""
+        if self.last_obs is None or request_id != self.last_request_id:
+            return None
+        return self.extract(field, profile)
+
+    def extract(self, field: str, profile: ObservationProfile, obs: dict | None = None):
+        """Extracts a field from `obs`, the latest step's observation by default."""
+        obs = self.last_obs if obs is None else obs
+        if field == 'text_content':
+            # add text content of the page
+            if profile.text_format == 'html':
+                return flatten_dom_to_str(obs['dom_object'])
+            return self.text_extractor.extract(obs['dom_object'])
+        elif field == 'screenshot':
+            if self.raw_screenshot:
+                return obs['screenshot']
+            return self.screenshots.encode(
+                obs['screenshot'], profile.screenshot_format
+            ).screenshot
+        elif field == 'scroll_position':
+            scroll_position = self.env.unwrapped.page.evaluate("""() => {
+                const scrollTop = window.scrollY;
+                const windowHeight = window.innerHeight;
+                const documentHeight = document.documentElement.scrollHeight;
+                const remainingPixels = documentHeight - (scrollTop + windowHeight);
+
+                return {
+                    'scrollTop': scrollTop,
+                    'windowHeight': windowHeight,
+                    'documentHeight': documentHeight,
+                    'remainingPixels': remainingPixels
+                };
+            }""")
+            logger.info(scroll_position)
+            return scroll_position
+        elif field == 'axtree_txt':
+            return self.axtree_flattener.flatten(
+                obs['axtree_object'],
+                obs['extra_element_properties'],
+                parse_axtree_flags(profile.axtree_flags),
+            )
+        elif field in ('dom_object', 'axtree_object'):
+            return obs[field]
+        raise ValueError(f'Unknown observation field: {field}')
+
+    def scrub(self):
+        """Brings the env back to a blank page with no tabs, cookies or storage left."""
+        unwrapped = self.env.unwrapped
+        if self.prefetcher is not None:
+            self.prefetcher.reset(unwrapped)
+        context = unwrapped.context
+        pages = context.pages
+        for page in pages:
+            self.visited_origins.add(get_origin(page.url))
+        self.visited_origins.discard('')
+        if pages:
+            page = pages[0]
+            for extra_page in pages[1:]:
+                extra_page.close()
+        else:
+            page = context.new_page()
+        page.goto('about:blank')
+
+        context.clear_cookies()
+        context.clear_permissions()
+        # cookies are per context, but storage (local storage, indexeddb, cache
+        # storage, service workers) has to be cleared origin by origin
+        cdp = context.new_cdp_session(page)
+        try:
+            for origin in self.visited_origins:
+                cdp.send(
+                    'Storage.clearDataForOrigin',
+                    {'origin': origin, 'storageTypes': 'all'},
+                )
+        finally:
+            cdp.detach()
+        self.visited_origins.clear()
+
+        unwrapped.page = page
+        unwrapped.page_history = {page: None}
+        del unwrapped.chat.messages[self.initial_chat_length :]
+        unwrapped.last_action = ''
+        unwrapped.last_action_error = ''
+        unwrapped.start_time = time.time()
+        self.last_obs = None
+        self.last_request_id = ''
+        self.screenshots.reset()
+        self.loader.reset()
+        self.axtree_flattener.reset()
+        for differ in self.tree_differs.values():
+            differ.reset()
+        if self.eval_mode:
+            self.rewards.clear()
+
+
+class _TabPage:
+    """
+    A page whose navigations start in the background and return right away, so
+    that the tabs of a parallel step load at the same time. `wait` collects the
+    navigations once every tab has had its turn.
+
+    Playwright's sync API runs the event loop whenever it waits for something,
+    which also moves the background navigations along.
+    """
+
+    def __init__(self, page: playwright.sync_api.Page):
+        self._page = page
+        self._navigations: list[asyncio.Task] = []
+
+    def goto(self, url: str, timeout: float | None = None, wait_until=None):
+        self._start(
+            self._page._impl_obj.goto(url, timeout=timeout, waitUntil=wait_until)
+        )
+
+    def go_back(self, timeout: float | None = None, wait_until=None):
+        self._start(self._page._impl_obj.go_back(timeout=timeout, waitUntil=wait_until))
+
+    def go_forward(self, timeout: float | None = None, wait_until=None):
+        self._start(
+            self._page._impl_obj.go_forward(timeout=timeout, waitUntil=wait_until)
+        )
+
+    def wait(self) -> str:
+        """Waits for the navigations started so far, returns the first one's error."""
+        navigations, self._navigations = self._navigations, []
+        if not navigations:
+            return ''
+
+        async def wait_all():
+            return await asyncio.gather(*navigations, return_exceptions=True)
+
+        for outcome in self._page._sync(wait_all()):
+            if isinstance(outcome, Exception):
+                return f'{type(outcome).__name__}: {outcome}'
+        return ''
+
+    def _start(self, navigation):
+        self._navigations.append(self._page._loop.create_task(navigation))
+
+    def __getattr__(self, name):
+        return getattr(self._page, name)
+
+
+def get_origin(url: str) -> str:
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.netloc:
+        return ''
+    return f'{parsed.scheme}://{parsed.netloc}'
+
+
+class _SharedBrowser:
+    """
+    Handed to BrowserGym in place of a freshly launched browser.
+
+    New contexts are opened in the worker's single Chromium, and closing only
+    closes the contexts that were opened through this handle.
+    """
+
+    def __init__(self, browser: playwright.sync_api.Browser):
+        self._browser = browser
+        self._contexts: list[playwright.sync_api.BrowserContext] = []
+
+    def new_context(self, **kwargs):
+        context = self._browser.new_context(**kwargs)
+        self._contexts.append(context)
+        return context
+
+    def close(self):
+        for context in self._contexts:
+            try:
+                context.close()
+            except Exception:
+                pass
+        self._contexts.clear()
+
+    def __getattr__(self, name):
+        return getattr(self._browser, name)
+
+
+class _SharedChromium:
+    """
+    Hands out contexts of one Chromium for every browser BrowserGym launches.
+
+    BrowserGym launches one browser for the env and one for the chat of every
+    session. The first launch starts the Chromium with its options, later ones
+    must not ask for different options, which the running Chromium could not
+    honour; options they leave out are fine. Window size args are dropped, as
+    each session sizes its own pages.
+    """
+
+    def __init__(self, chromium: playwright.sync_api.BrowserType):
+        self._chromium = chromium
+        self._browser: playwright.sync_api.Browser | None = None
+        self._options: dict = {}
+
+    def launch(self, headless: bool = True, **kwargs):
+        options = _launch_options(headless=headless, **kwargs)
+        if self._browser is None or not self._browser.is_connected():
+            self._browser = self._chromium.launch(**options)
+            self._options = options
+        else:
+            different = {
+                name: value
+                for name, value in options.items()
+                if self._options.get(name) != value
+            }
+            if different:
+                raise ValueError(
+                    f'The shared Chromium was launched with {self._options}, not {different}. '
+                    "Use browser_worker_mode 'process' for envs with their own launch options."
+                )
+        return _SharedBrowser(self._browser)
+
+    def __getattr__(self, name):
+        return getattr(self._chromium, name)
+
+
+def _launch_options(**kwargs) -> dict:
+    """The launch options that matter for a shared Chromium."""
+    args = [
+        arg
+        for arg in kwargs.pop('args', None) or []
+        if not arg.startswith('--window-size=')
+    ]
+    if args:
+        kwargs['args'] = args
+    return {name: value for name, value in kwargs.items() if value is not None}
+
+
+class _SharedPlaywright:
+    def __init__(self, pw: playwright.sync_api.Playwright):
+        self._pw = pw
+        self.chromium = _SharedChromium(pw.chromium)
+
+    def __getattr__(self, name):
+        return getattr(self._pw, name)
+
+
+def run_browser_worker(
+    conn: Connection,
+    shared: bool,
+    ring_spec: tuple | None = None,
+    heartbeat_interval: float = 0,
+):
+    """
+    Entry point of a browser worker process.
+
+    Serves `(request_id, kind, payload)` requests for the BrowserGym envs it hosts,
+    routed by the `context_id` in the payload. Playwright's sync API is bound to
+    the thread that started it, so requests are handled one at a time.
+    A dedicated worker hosts a single env and exits when that env fails; a shared
+    worker runs every env in one Chromium and only drops the failing env.
+    With a `(name, slots, slot_size)` ring spec, screenshots go back as raw pixels
+    and large payloads through shared memory.
+    With a `heartbeat_interval`, a thread reports every so many seconds that the
+    process is alive, which request it is handling and for how long, so that
+    the agent side can tell a dead or hung worker from a slow one.
+    """
+    ring = SharedMemoryRing.attach(*ring_spec) if ring_spec else None
+    if shared:
+        browsergym.core._set_global_playwright(
+            _SharedPlaywright(playwright.sync_api.sync_playwright().start())
+        )
+    contexts: dict[str, GymContext] = {}
+    send_lock = threading.Lock()
+    # when the request being handled started and its id, None while waiting
+    busy_since: list[tuple[float, str] | None] = [None]
+    stopped = threading.Event()
+
+    def respond(request_id: str, result, error: str | None = None):
+        try:
+            with send_lock:
+                conn.send((request_id, result, error))
+        except (OSError, ValueError):
+            logger.warning('Failed to send response, agent side is gone.')
+
+    def heartbeat():
+        while not stopped.wait(heartbeat_interval):
+            busy = busy_since[0]
+            busy_for = 0.0 if busy is None else time.monotonic() - busy[0]
+            request_id = None if busy is None else busy[1]
+            try:
+                with send_lock:
+                    conn.send((HEARTBEAT, (busy_for, request_id), None))
+            except (OSError, ValueError):
+                return
+
+    if heartbeat_interval > 0:
+        threading.Thread(target=heartbeat, name='heartbeat', daemon=True).start()
+
+    def close_all():
+        stopped.set()
+        for context in contexts.values():
+            context.close()
+        contexts.clear()
+        if ring is not None:
+            ring.close()
+
+    logger.info('Browser worker started.')
+    while True:
+        try:
+            # let prefetching tabs load until the agent side sends a request
+            while not conn.poll(0) and any(
+                context.prefetching for context in contexts.values()
+            ):
+                for context in contexts.values():
+                    context.pump_prefetch()
+            # block until the agent side sends a request, no busy waiting
+            request_id, kind, payload = conn.recv()
+            busy_since[0] = (time.monotonic(), request_id)
+        except (EOFError, OSError):
+            logger.info(
+                'Agent side closed the channel, shutting down browser worker...'
+            )
+            close_all()
+            return
+        payload = payload or {}
+        context_id = payload.get('context_id')
+        try:
+            if kind == 'SHUTDOWN':
+                logger.info('SHUTDOWN recv, shutting down browser worker...')
+                close_all()
+                respond(request_id, None)
+                return
+            elif kind == 'IS_ALIVE':
+                if context_id is None or context_id in contexts:
+                    respond(request_id, 'ALIVE')
+                else:
+                    respond(request_id, 'CLOSED')
+            elif kind == 'OPEN':
+                context = GymContext(**payload.get('env_kwargs', {}))
+                # the agent side encodes screenshots it gets through shared memory
+                context.raw_screenshot = ring is not None
+                contexts[context_id] = context
+                context.start()
+                logger.info('Browser env started.')
+                respond(request_id, True)
+            elif kind == 'CLOSE':
+                context = contexts.pop(context_id, None)
+                if context is not None:
+                    context.close()
+                respond(request_id, True)
+            elif kind == 'STEP_PARALLEL':
+                profile = ObservationProfile(**payload.get('profile', {}))
+                obs = _get_context(contexts, context_id).step_parallel(
+                    payload['tabs'],
+                    request_id,
+                    profile,
+                    payload.get('load_profile', 'full'),
+                    payload.get('close_tabs', True),
+                )
+                respond(request_id, obs)
+            elif kind in ('STEP', 'STEP_BATCH'):
+                profile = ObservationProfile(**payload.get('profile', {}))
+                context = _get_context(contexts, context_id)
+                load_profile = payload.get('load_profile', 'full')
+                if kind == 'STEP':
+                    obs = context.step(
+                        payload['action'],
+                        request_id,
+                        profile,
+                        load_profile,
+                        payload.get('hints', ''),
+                    )
+                else:
+                    obs = context.step_batch(
+                        payload['actions'],
+                        request_id,
+                        profile,
+                        load_profile,
+                        payload.get('stop_on_error', True),
+                        payload.get('hints', ''),
+                    )
+                for key in SHM_FIELDS:
+                    if key in obs:
+                        obs[key] = pack(ring, obs[key])
+                respond(request_id, obs)
+            elif kind == 'FETCH':
+                profile = ObservationProfile(**payload.get('profile', {}))
+                value = _get_context(contexts, context_id).fetch(
+                    payload['request_id'], payload['field'], profile
+                )
+                if payload['field'] in SHM_FIELDS:
+                    value = pack(ring, value)
+                respond(request_id, value)
+            elif kind == 'RESET':
+                _get_context(contexts, context_id).scrub()
+                respond(request_id, True)
+            else:
+                respond(request_id, None, f'Unknown request kind: {kind}')
+        except KeyboardInterrupt:
+            logger.info('Browser worker process interrupted by user.')
+            close_all()
+            return
+        except Exception as e:
+            logger.error(f'{type(e).__name__}: {str(e)}')
+            respond(request_id, None, f'{type(e).__name__}: {str(e)}')
+            context = contexts.pop(context_id, None)
+            if context is not None:
+                context.close()
+            if not shared:
+                close_all()
+                return
+        finally:
+            busy_since[0] = None
+
+
+def _get_context(contexts: dict[str, GymContext], context_id: str | None) -> GymContext:
+    if context_id not in contexts:
+        raise KeyError(f'Unknown browser context {context_id}')
+    return contexts[context_id]
+
+
+class BrowserWorker:
+    """
+    Agent-side handle of a browser worker process.
+
+    A dedicated worker (one per BrowserEnv) launches a separate Chromium for every
+    env, as BrowserGym does by default. A shared worker hosts up to `max_contexts`
+    envs as isolated BrowserContexts of a single Chromium, which saves the memory
+    of a browser process per session at the cost of serving their steps one at a
+    time.
+    """
+
+    def __init__(self, shared: bool = False, max_contexts: int = 1):
+        self.shared = shared
+        self.max_contexts = max(1, max_contexts) if shared else 1
+        self._slots = 0
+        self._lock = threading.Lock()
+        multiprocessing.set_start_method('spawn', force=True)
+        self.ring: SharedMemoryRing | None = None
+        ring_spec = None
+        if config.browser_shared_memory:
+            self.ring = SharedMemoryRing.create(
+                config.browser_shm_slots, config.browser_shm_slot_size
+            )
+            ring_spec = (self.ring.name, self.ring.slots, self.ring.slot_size)
+        agent_side, browser_side = multiprocessing.Pipe()
+        self.channel = BrowserChannel(
+            agent_side, decode=lambda result: unpack(self.ring, result)
+        )
+        self.process = multiprocessing.Process(
+            target=run_browser_worker,
+            args=(browser_side, shared, ring_spec, config.browser_heartbeat_interval),
+            daemon=True,
+        )
+        self.process.start()
+        # the worker process owns this end now, closing our copy lets the
+        # channel notice when the process exits
+        browser_side.close()
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive() and not self.channel.closed
+
+    def health_problem(self, heartbeat_timeout: float, hang_timeout: float) -> str:
+        """Why the worker has to be restarted, empty if it is healthy."""
+        if not self.process.is_alive():
+            return f'process exited with code {self.process.exitcode}'
+        if self.channel.closed:
+            return 'channel closed'
+        silent_for = time.monotonic() - self.channel.last_heartbeat
+        if silent_for > heartbeat_timeout:
+            return f'no heartbeat for {silent_for:.0f}s'
+        # requests that may take long, e.g. batches of actions, get their timeout
+        limit = max(hang_timeout, self.channel.busy_timeout or 0)
+        if self.channel.busy_for > limit:
+            return f'request running for {self.channel.busy_for:.0f}s'
+        return ''
+
+    def abort(self, reason: str):
+        """Kills a dead or hung worker, failing its pending requests right away."""
+        self.channel.close(
+            BrowserCrashedError(f'Browser environment crashed: {reason}')
+        )
+        try:
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join(5)
+        finally:
+            if self.ring is not None:
+                self.ring.close(unlink=True)
+                self.ring = None
+
+    def reserve(self) -> bool:
+        """Claims a context slot, returns False if the worker is full."""
+        with self._lock:
+            if self._slots >= self.max_contexts:
+                return False
+            self._slots += 1
+            return True
+
+    def open_context(self, context_id: str, env_kwargs: dict) -> Future:
+        """
+        Asks the worker to create an env for a reserved slot.
+
+        Returns the future of the response, so requests sent afterwards queue up
+        behind the env creation.
+        """
+        try:
+            _, future = self.channel.submit(
+                'OPEN', {'context_id': context_id, 'env_kwargs': env_kwargs}
+            )
+        except BrowserUnavailableException:
+            self._free_slot()
+            raise
+        return future
+
+    def close_context(self, context_id: str, timeout: float = 10):
+        try:
+            self.channel.request('CLOSE', {'context_id': context_id}, timeout=timeout)
+        except (TimeoutError, BrowserUnavailableException):
+            logger.warning(f'Failed to close browser context {context_id}')
+        finally:
+            self._free_slot()
+
+    def request(
+        self, context_id: str, kind: str, payload: dict | None = None, timeout=None
+    ):
+        return self.channel.request(
+            kind, {'context_id': context_id, **(payload or {})}, timeout=timeout
+        )
+
+    async def arequest(
+        self, context_id: str, kind: str, payload: dict | None = None, timeout=None
+    ):
+        return await self.channel.arequest(
+            kind, {'context_id': context_id, **(payload or {})}, timeout=timeout
+        )
+
+    def close(self):
+        try:
+            if self.process.is_alive():
+                try:
+                    self.channel.submit('SHUTDOWN')
+                except BrowserUnavailableException:
+                    pass
+                self.process.join(5)  # Wait for the process to terminate
+            if self.process.is_alive():
+                logger.error(
+                    'Browser process did not terminate, forcefully terminating...'
+                )
+                self.process.terminate()
+                self.process.join(5)  # Wait for the process to terminate
+                if self.process.is_alive():
+                    self.process.kill()
+                    self.process.join(5)  # Wait for the process to terminate
+        except Exception:
+            logger.error(
+                'Encountered an error when closing browser worker', exc_info=True
+            )
+        finally:
+            self.channel.close()
+            if self.ring is not None:
+                self.ring.close(unlink=True)
+                self.ring = None
+
+    def _free_slot(self):
+        with self._lock:
+            self._slots = max(0, self._slots - 1)
+
+
+_shared_workers: list[BrowserWorker] = []
+_shared_workers_lock = threading.Lock()
+
+
+def acquire_shared_worker() -> BrowserWorker:
+    """
+    Returns a shared browser worker with a context slot reserved for the caller,
+    starting a new worker when all running ones are full.
+    """
+    with _shared_workers_lock:
+        for worker in list(_shared_workers):
+            if not worker.is_alive():
+                _shared_workers.remove(worker)
+                worker.close()
+                continue
+            if worker.reserve():
+                return worker
+        worker = BrowserWorker(
+            shared=True, max_contexts=config.browser_worker_max_contexts
+        )
+        if not worker.reserve():
+            raise BrowserInitException('Browser worker has no context slots.')
+        _shared_workers.append(worker)
+        return worker
+
+
+@atexit.register
+def _close_shared_workers():
+    with _shared_workers_lock:
+        for worker in _shared_workers:
+            worker.close()
+        _shared_workers.clear()
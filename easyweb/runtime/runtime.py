@@ -10,6 +10,7 @@ from easyweb.events.action import (
     Action,
     AgentRecallAction,
     BrowseInteractiveAction,
+    BrowseParallelAction,
     BrowseURLAction,
     CmdKillAction,
     CmdRunAction,
@@ -33,6 +34,9 @@ from easyweb.runtime import (
     Sandbox,
 )
 from easyweb.runtime.browser.browser_env import BrowserEnv
+from easyweb.runtime.browser.load_profile import get_load_profile
+from easyweb.runtime.browser.pool import BrowserEnvPool, get_browser_pool
+from easyweb.runtime.browser.profile import ObservationProfile
 from easyweb.runtime.plugins import PluginRequirement
 from easyweb.runtime.tools import RuntimeTool
 from easyweb.storage import FileStore, InMemoryFileStore
@@ -76,6 +80,7 @@ class Runtime:
             self.sandbox = sandbox
             self._is_external_sandbox = True
         self.browser: BrowserEnv | None = None
+        self._browser_pool: BrowserEnvPool | None = None
         self.file_store = InMemoryFileStore()
         self.event_stream = event_stream
         self.event_stream.subscribe(EventStreamSubscriber.RUNTIME, self.on_event)
@@ -85,7 +90,10 @@ class Runtime:
         if not self._is_external_sandbox:
             self.sandbox.close()
         if self.browser is not None:
-            self.browser.close()
+            if self._browser_pool is not None:
+                self._browser_pool.release(self.browser)
+            else:
+                self.browser.close()
         self._bg_task.cancel()
 
     def init_sandbox_plugins(self, plugins: list[PluginRequirement]) -> None:
@@ -96,14 +104,28 @@ class Runtime:
         runtime_tools: list[RuntimeTool],
         runtime_tools_config: Optional[dict[RuntimeTool, Any]] = None,
         is_async: bool = True,
+        observation_profile: ObservationProfile | None = None,
+        load_profile: str = '',
     ) -> None:
         # if browser in runtime_tools, init it
         if RuntimeTool.BROWSER in runtime_tools:
             if runtime_tools_config is None:
                 runtime_tools_config = {}
             browser_env_config = runtime_tools_config.get(RuntimeTool.BROWSER, {})
+            # pooled envs are blank, eval envs need their own browsergym task
+            pool = get_browser_pool() if not browser_env_config else None
             try:
-                self.browser = BrowserEnv(is_async=is_async, **browser_env_config)
+                if pool is not None:
+                    self.browser = pool.lease()
+                    self._browser_pool = pool
+                else:
+                    self.browser = BrowserEnv(is_async=is_async, **browser_env_config)
+                if observation_profile is not None:
+                    self.browser.observation_profile = observation_profile
+                # pooled envs may still carry the profile of their last session
+                load_profile = load_profile or config.browser_load_profile
+                get_load_profile(load_profile)  # fail early on unknown names
+                self.browser.load_profile = load_profile
             except BrowserInitException:
                 logger.warn(
                     'Failed to start browser environment, web browsing functionality will not work'
@@ -185,6 +207,10 @@ class Runtime:
     async def browse_interactive(self, action: BrowseInteractiveAction) -> Observation:
         pass
 
+    @abstractmethod
+    async def browse_parallel(self, action: BrowseParallelAction) -> Observation:
+        pass
+
     @abstractmethod
     async def recall(self, action: AgentRecallAction) -> Observation:
         pass
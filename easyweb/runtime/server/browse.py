@@ -2,8 +2,14 @@ import os
 
 from easyweb.core.exceptions import BrowserUnavailableException
 from easyweb.core.schema import ActionType
-from easyweb.events.observation import BrowserOutputObservation
+from easyweb.events.observation import (
+    BrowserOutputObservation,
+    BrowserParallelObservation,
+    ErrorObservation,
+    Observation,
+)
 from easyweb.runtime.browser.browser_env import BrowserEnv
+from easyweb.runtime.browser.utils import split_browser_actions
 
 
 async def browse(action, browser: BrowserEnv | None) -> BrowserOutputObservation:
@@ -23,26 +29,12 @@ async def browse(action, browser: BrowserEnv | None) -> BrowserOutputObservation
         raise ValueError(f'Invalid action type: {action.action}')
     try:
         # obs provided by BrowserGym: see https://github.com/ServiceNow/BrowserGym/blob/main/core/src/browsergym/core/env.py#L396
-        obs = browser.step(action_str)
-        return BrowserOutputObservation(
-            content=obs['text_content'],  # text content of the page
-            open_pages_urls=obs['open_pages_urls'],  # list of open pages
-            active_page_index=obs['active_page_index'],  # index of the active page
-            dom_object=obs['dom_object'],  # DOM object
-            axtree_object=obs['axtree_object'],  # accessibility tree object
-            extra_element_properties=obs[
-                'extra_element_properties'
-            ],  # extra element properties
-            last_browser_action=obs['last_action'],  # last browser env action performed
-            focused_element_bid=obs['focused_element_bid'],  # focused element bid
-            screenshot=obs['screenshot'],  # base64-encoded screenshot, png
-            url=obs['url'],  # URL of the page
-            error=True if obs['last_action_error'] else False,  # error flag
-            last_browser_action_error=obs[
-                'last_action_error'
-            ],  # last browser env action error
-            scroll_position=obs['scroll_position'],
-        )
+        # fields left out of the browser's observation profile are missing
+        if action.action == ActionType.BROWSE_INTERACTIVE and action.batch:
+            obs = await browser.astep_batch(split_browser_actions(action_str))
+        else:
+            obs = await browser.astep(action_str, hints=getattr(action, 'thought', ''))
+        return _to_observation(obs)
     except Exception as e:
         return BrowserOutputObservation(
             content=str(e),
@@ -51,3 +43,49 @@ async def browse(action, browser: BrowserEnv | None) -> BrowserOutputObservation
             last_browser_action_error=str(e),
             url=asked_url if action.action == ActionType.BROWSE else '',
         )
+
+
+async def browse_parallel(action, browser: BrowserEnv | None) -> Observation:
+    if browser is None:
+        raise BrowserUnavailableException()
+    tabs = action.tabs
+    if not tabs:
+        return ErrorObservation(
+            'BrowseParallelAction needs at least one URL or action list'
+        )
+    try:
+        obs = await browser.astep_parallel(tabs, close_tabs=action.close_tabs)
+    except Exception as e:
+        return ErrorObservation(f'Parallel browsing failed: {e}')
+    observations = [_to_observation(tab) for tab in obs['tabs']]
+    content = '\n\n'.join(
+        f'=== Tab {i}: {tab.url} ===\n{tab.content}'
+        for i, tab in enumerate(observations)
+    )
+    return BrowserParallelObservation(content=content, tabs=observations)
+
+
+def _to_observation(obs: dict) -> BrowserOutputObservation:
+    return BrowserOutputObservation(
+        content=obs.get('text_content', ''),  # text content of the page
+        open_pages_urls=obs['open_pages_urls'],  # list of open pages
+        active_page_index=obs['active_page_index'],  # index of the active page
+        dom_object=obs.get('dom_object', {}),  # DOM object
+        axtree_object=obs.get('axtree_object', {}),  # accessibility tree object
+        axtree_txt=obs.get('axtree_txt', ''),  # flattened accessibility tree
+        extra_element_properties=obs.get(
+            'extra_element_properties', {}
+        ),  # extra element properties
+        last_browser_action=obs['last_action'],  # last browser env action performed
+        focused_element_bid=obs['focused_element_bid'],  # focused element bid
+        screenshot=obs.get('screenshot', ''),  # base64-encoded screenshot
+        url=obs['url'],  # URL of the page
+        error=True if obs['last_action_error'] else False,  # error flag
+        last_browser_action_error=obs[
+            'last_action_error'
+        ],  # last browser env action error
+        scroll_position=obs.get('scroll_position', {}),
+        screenshot_thumbnail=obs.get('screenshot_thumbnail', ''),
+        screenshot_unchanged=obs.get('screenshot_unchanged', False),
+        batch_checks=obs.get('batch_checks', []),
+    )
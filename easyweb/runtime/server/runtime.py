@@ -2,6 +2,7 @@ from easyweb.core.config import config
 from easyweb.events.action import (
     AgentRecallAction,
     BrowseInteractiveAction,
+    BrowseParallelAction,
     BrowseURLAction,
     CmdKillAction,
     CmdRunAction,
@@ -21,7 +22,7 @@ from easyweb.runtime import Sandbox
 from easyweb.runtime.runtime import Runtime
 from easyweb.storage.local import LocalFileStore
 
-from .browse import browse
+from .browse import browse, browse_parallel
 from .files import read_file, write_file
 
 
@@ -119,6 +120,9 @@ class ServerRuntime(Runtime):
     async def browse_interactive(self, action: BrowseInteractiveAction) -> Observation:
         return await browse(action, self.browser)
 
+    async def browse_parallel(self, action: BrowseParallelAction) -> Observation:
+        return await browse_parallel(action, self.browser)
+
     async def recall(self, action: AgentRecallAction) -> Observation:
         return NullObservation('')
 
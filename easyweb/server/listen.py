@@ -21,6 +21,7 @@ from easyweb.events.action import ChangeAgentStateAction, NullAction
 from easyweb.events.observation import AgentStateChangedObservation, NullObservation
 from easyweb.events.serialization import event_to_dict
 from easyweb.llm import bedrock
+from easyweb.runtime.browser.pool import get_browser_pool
 from easyweb.server.auth import get_sid_from_token, sign_token
 from easyweb.server.session import session_manager
 
@@ -36,6 +37,20 @@ app.add_middleware(
 security_scheme = HTTPBearer()
 
 
+@app.on_event('startup')
+async def prewarm_browser_pool():
+    # creating the pool starts launching `browser_pool_min_size` envs in the background
+    if get_browser_pool() is not None:
+        logger.info('Pre-warming browser env pool')
+
+
+@app.on_event('shutdown')
+async def close_browser_pool():
+    pool = get_browser_pool()
+    if pool is not None:
+        pool.close()
+
+
 @app.middleware('http')
 async def attach_session(request: Request, call_next):
     if request.url.path.startswith('/api/options/') or not request.url.path.startswith(
@@ -1,3 +1,4 @@
+import asyncio
 from typing import Optional
 
 # from agenthub.codeact_agent.codeact_agent import CodeActAgent
@@ -88,13 +89,13 @@ class AgentSession:
         agent_cls = args.get(ConfigType.AGENT, config.agent.name)
         model = args.get(ConfigType.LLM_MODEL, config.llm.model)
         api_key = args.get(ConfigType.LLM_API_KEY, config.llm.api_key)
-        api_base = config.llm.base_url
+        endpoints = None
         if config.llm.model_port_config_file:
-            model, api_base = get_model_port_arg(
+            model, endpoints = get_model_port_arg(
                 config.llm.model_port_config_file, model
             )
         logger.info(f'Creating agent {agent_cls} using LLM {model}')
-        llm = LLM(model=model, api_key=api_key, base_url=api_base)
+        llm = LLM(model=model, api_key=api_key, endpoints=endpoints)
         agent = Agent.get_cls(agent_cls)(llm)
 
         max_iterations = args.get(ConfigType.MAX_ITERATIONS, config.max_iterations)
@@ -105,7 +106,13 @@ class AgentSession:
         #             'CodeActAgent requires DockerSSHBox as sandbox! Using other sandbox that are not stateful (LocalBox, DockerExecBox) will not work properly.'
         #         )
         self.runtime.init_sandbox_plugins(agent.sandbox_plugins)
-        self.runtime.init_runtime_tools(agent.runtime_tools)
+        # leasing a browser env may wait for one, the other sessions go on meanwhile
+        await asyncio.to_thread(
+            self.runtime.init_runtime_tools,
+            agent.runtime_tools,
+            observation_profile=agent.observation_profile,
+            load_profile=args.get(ConfigType.BROWSER_LOAD_PROFILE, agent.load_profile),
+        )
 
         self.controller = AgentController(
             sid=self.sid,
@@ -9,7 +9,11 @@ from easyweb.core.schema import AgentState
 from easyweb.core.schema.action import ActionType
 from easyweb.events.action import ChangeAgentStateAction, NullAction
 from easyweb.events.event import Event, EventSource
-from easyweb.events.observation import AgentStateChangedObservation, NullObservation
+from easyweb.events.observation import (
+    AgentStateChangedObservation,
+    BrowserOutputObservation,
+    NullObservation,
+)
 from easyweb.events.serialization import event_from_dict, event_to_dict
 from easyweb.events.stream import EventStreamSubscriber
 
@@ -33,9 +37,16 @@ class Session:
         self.agent_session.event_stream.subscribe(
             EventStreamSubscriber.SERVER, self.on_event
         )
+        # pieces of the LLM's responses, as they are streamed
+        self.agent_session.event_stream.subscribe_transient(
+            EventStreamSubscriber.SERVER, self.on_event
+        )
 
     async def close(self):
         self.is_alive = False
+        self.agent_session.event_stream.unsubscribe_transient(
+            EventStreamSubscriber.SERVER
+        )
         await self.agent_session.close()
 
     async def loop_recv(self):
@@ -88,7 +99,15 @@ class Session:
         if event.source == EventSource.AGENT and not isinstance(
             event, (NullAction, NullObservation)
         ):
-            await self.send(event_to_dict(event))
+            data = event_to_dict(event)
+            if (
+                isinstance(event, BrowserOutputObservation)
+                and event.screenshot_unchanged
+            ):
+                # the client already shows this frame
+                data['extras'].pop('screenshot', None)
+                data['extras'].pop('screenshot_thumbnail', None)
+            await self.send(data)
 
     async def dispatch(self, data: dict):
         action = data.get('action', '')
@@ -202,6 +202,17 @@ class EasyWebSession:
                 self.action_history.append((0, message['message']))
 
             printable = {k: v for k, v in message.items() if k not in 'args'}
+        elif (
+            'extras' in message
+            and message['extras'].get('screenshot_unchanged')
+            and self.browser_history
+        ):
+            # the server skips frames that did not change, keep showing the last one
+            screenshot, _ = self.browser_history[-1]
+            self.browser_history.append((screenshot, message['extras']['url']))
+            printable = {
+                k: v for k, v in message.items() if k not in ['extras', 'content']
+            }
         elif 'extras' in message and 'screenshot' in message['extras']:
             image_data = base64.b64decode(message['extras']['screenshot'])
             try:
@@ -477,11 +488,26 @@ def get_messages(
 
         website_counter = 0
         message_list = []
+        # the LLM's response while it streams, see llm.stream
+        streamed_reply = None
         for message in session.run(user_message, request):
             message_list.append(message['message'])
             if website_counter == 1:
                 options_visible = True
 
+            if message.get('observation') == 'thought_chunk':
+                if streamed_reply is None:
+                    streamed_reply = ''
+                    chat_history.append(gr.ChatMessage(role='assistant', content=''))
+                streamed_reply += message['content']
+                chat_history[-1] = gr.ChatMessage(
+                    role='assistant', content=streamed_reply
+                )
+            elif streamed_reply is not None and 'action' in message:
+                # the step's action is shown in place of the raw response
+                chat_history.pop()
+                streamed_reply = None
+
             finished = session.agent_state in ['finished', 'stopped']
             clear = gr.Button('🗑️ Clear', interactive=finished)
             upvote = gr.Button('👍 Good Response', interactive=finished)
@@ -0,0 +1,138 @@
+"""
+Compares the text extractors of browser observations on recorded pages.
+
+Record DOM snapshots of some pages (needs Playwright's Chromium):
+
+    python tests/benchmark/bench_text_extraction.py record --out pages https://www.amazon.com ...
+
+Then time every extractor on them; without recorded pages a synthetic product
+listing is used:
+
+    python tests/benchmark/bench_text_extraction.py run pages
+
+Each page is extracted cold (new extractor) and warm (same extractor, same
+snapshot again, as after an action that didn't change the page).
+"""
+
+import argparse
+import glob
+import json
+import os
+import statistics
+import time
+from functools import partial
+
+from easyweb.runtime.browser.text_extractor import TEXT_EXTRACTORS
+
+
+def record(urls: list[str], out: str):
+    from browsergym.core.observation import extract_dom_snapshot
+    from playwright.sync_api import sync_playwright
+
+    os.makedirs(out, exist_ok=True)
+    with sync_playwright() as pw:
+        browser = pw.chromium.launch(headless=True)
+        page = browser.new_page()
+        for i, url in enumerate(urls):
+            page.goto(url, wait_until='load', timeout=30000)
+            path = os.path.join(out, f'page_{i}.json')
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(extract_dom_snapshot(page), f)
+            print(f'{url} -> {path}')
+        browser.close()
+
+
+def synthetic_page(products: int = 2000) -> dict:
+    strings: list[str] = []
+    index: dict[str, int] = {}
+    nodes: dict[str, list] = {
+        'parentIndex': [],
+        'nodeType': [],
+        'nodeName': [],
+        'nodeValue': [],
+        'attributes': [],
+    }
+
+    def string(value):
+        if value is None:
+            return -1
+        if value not in index:
+            index[value] = len(strings)
+            strings.append(value)
+        return index[value]
+
+    def add(parent, node_type, name, value=None, **attributes):
+        nodes['parentIndex'].append(parent)
+        nodes['nodeType'].append(node_type)
+        nodes['nodeName'].append(string(name))
+        nodes['nodeValue'].append(string(value))
+        nodes['attributes'].append(
+            [string(part) for item in attributes.items() for part in item]
+        )
+        return len(nodes['parentIndex']) - 1
+
+    document = add(-1, 9, '#document')
+    body = add(add(document, 1, 'HTML'), 1, 'BODY')
+    grid = add(body, 1, 'UL')
+    for i in range(products):
+        item = add(grid, 1, 'LI', bid=str(i))
+        add(add(item, 1, 'A', href=f'/product/{i}'), 3, '#text', f' Product {i} ')
+        add(add(item, 1, 'SPAN'), 3, '#text', f'${i}.99')
+        add(item, 1, 'IMG', alt=f'Photo of product {i}')
+        add(add(item, 1, 'P'), 3, '#text', 'A fine product. ' * 4)
+    return {
+        'strings': strings,
+        'documents': [
+            {'nodes': {**nodes, 'contentDocumentIndex': {'index': [], 'value': []}}}
+        ],
+    }
+
+
+def timed(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def extract_cold(extractor_cls, snapshot: dict) -> str:
+    return extractor_cls().extract(snapshot)
+
+
+def run(directory: str | None, repeat: int):
+    pages = {}
+    paths = glob.glob(os.path.join(directory, '*.json')) if directory else []
+    for path in sorted(paths):
+        with open(path, encoding='utf-8') as f:
+            pages[os.path.basename(path)] = json.load(f)
+    if not pages:
+        pages['synthetic'] = synthetic_page()
+
+    print(f'{"page":<24}{"extractor":<12}{"cold ms":>10}{"warm ms":>10}{"chars":>10}')
+    for name, snapshot in pages.items():
+        for extractor_name, extractor_cls in TEXT_EXTRACTORS.items():
+            cold = timed(partial(extract_cold, extractor_cls, snapshot), repeat)
+            extractor = extractor_cls()
+            text = extractor.extract(snapshot)
+            warm = timed(partial(extractor.extract, snapshot), repeat)
+            print(
+                f'{name:<24}{extractor_name:<12}{cold:>10.1f}{warm:>10.1f}{len(text):>10}'
+            )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    commands = parser.add_subparsers(dest='command', required=True)
+    record_parser = commands.add_parser('record')
+    record_parser.add_argument('urls', nargs='+')
+    record_parser.add_argument('--out', default='pages')
+    run_parser = commands.add_parser('run')
+    run_parser.add_argument('directory', nargs='?')
+    run_parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    if args.command == 'record':
+        record(args.urls, args.out)
+    else:
+        run(args.directory, args.repeat)
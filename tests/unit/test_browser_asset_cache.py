@@ -0,0 +1,139 @@
+import os
+import time
+
+import pytest
+
+from easyweb.runtime.browser.asset_cache import AssetCache, freshness_lifetime
+
+CACHEABLE = {'cache-control': 'public, max-age=3600', 'content-type': 'text/css'}
+
+
+class FakeRequest:
+    def __init__(self, url, resource_type='stylesheet', method='GET', headers=None):
+        self.url = url
+        self.resource_type = resource_type
+        self.method = method
+        self.headers = headers or {}
+
+
+class FakeResponse:
+    def __init__(self, headers, body=b'body{}'):
+        self.status = 200
+        self.headers = {**headers, 'content-encoding': 'gzip'}
+        self._body = body
+
+    def body(self):
+        return self._body
+
+
+class FakeRoute:
+    def __init__(self, response):
+        self.response = response
+        self.fetched = 0
+        self.result = None
+
+    def fetch(self):
+        self.fetched += 1
+        return self.response
+
+    def fulfill(self, status, headers, body):
+        self.result = ('fulfill', status, headers, body)
+
+    def fallback(self):
+        self.result = ('fallback',)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return AssetCache(str(tmp_path), 1024 * 1024)
+
+
+@pytest.mark.parametrize(
+    'headers, lifetime',
+    [
+        ({'cache-control': 'max-age=60'}, 60),
+        ({'cache-control': 'public, s-maxage=120, max-age=60'}, 120),
+        ({'cache-control': 'private, max-age=60'}, 0),
+        ({'cache-control': 'no-store'}, 0),
+        ({'cache-control': 'max-age=60', 'set-cookie': 'a=b'}, 0),
+        ({'cache-control': 'max-age=60', 'vary': 'Cookie'}, 0),
+        (
+            {
+                'date': 'Mon, 01 Jan 2024 00:00:00 GMT',
+                'expires': 'Mon, 01 Jan 2024 01:00:00 GMT',
+            },
+            3600,
+        ),
+        ({'last-modified': 'Mon, 01 Jan 2024 00:00:00 GMT'}, 0),
+    ],
+)
+def test_freshness_lifetime(headers, lifetime):
+    assert freshness_lifetime(headers) == lifetime
+
+
+def test_put_and_get(cache):
+    url = 'https://example.com/app.css'
+    assert cache.get(url) is None
+    assert cache.put(url, 200, {**CACHEABLE, 'content-length': '6'}, b'body{}')
+    status, headers, body = cache.get(url)
+    assert status == 200 and body == b'body{}'
+    assert 'content-length' not in headers
+    assert not cache.put('https://example.com/me.css', 200, {}, b'body{}')
+
+
+def test_expired_entries_are_misses(cache):
+    url = 'https://example.com/app.css'
+    cache.put(url, 200, {'cache-control': 'max-age=1'}, b'body{}')
+    assert cache.get(url) is not None
+    meta_path = cache._path(url, '.json')
+    with open(meta_path) as f:
+        meta = f.read()
+    with open(meta_path, 'w') as f:
+        f.write(meta.replace('"expires": ', '"expires": -'))
+    assert cache.get(url) is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = AssetCache(str(tmp_path), 40 * 1024)
+    body = b'x' * 3000
+    urls = [f'https://example.com/{i}.js' for i in range(16)]
+    for i, url in enumerate(urls):
+        cache.put(url, 200, CACHEABLE, body)
+        # mtimes have a coarse resolution on some file systems
+        os.utime(cache._path(url, '.json'), (time.time(), time.time() - 100 + i))
+        if i == 10:
+            # touch the first entry, it becomes the most recently used
+            assert cache.get(urls[0]) is not None
+    cache.evict()
+    sizes = sum(entry.stat().st_size for entry in os.scandir(tmp_path))
+    assert sizes <= 40 * 1024
+    assert cache.get(urls[0]) is not None
+    assert cache.get(urls[1]) is None
+    assert cache.get(urls[-1]) is not None
+
+
+def test_route_handler(cache):
+    request = FakeRequest('https://example.com/app.css')
+    route = FakeRoute(FakeResponse(CACHEABLE))
+    cache.handle(route, request)
+    assert route.fetched == 1 and route.result[0] == 'fulfill'
+    assert 'content-encoding' not in route.result[2]
+
+    route = FakeRoute(FakeResponse(CACHEABLE))
+    cache.handle(route, request)
+    assert route.fetched == 0 and route.result[3] == b'body{}'
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@pytest.mark.parametrize(
+    'request_',
+    [
+        FakeRequest('https://example.com/', resource_type='document'),
+        FakeRequest('https://example.com/app.css', method='POST'),
+        FakeRequest('https://example.com/app.css', headers={'authorization': 'x'}),
+    ],
+)
+def test_route_handler_passes_uncacheable_requests(cache, request_):
+    route = FakeRoute(FakeResponse(CACHEABLE))
+    cache.handle(route, request_)
+    assert route.result == ('fallback',) and route.fetched == 0
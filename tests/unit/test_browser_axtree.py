@@ -0,0 +1,121 @@
+import copy
+
+import pytest
+from browsergym.utils.obs import flatten_axtree_to_str
+
+from easyweb.runtime.browser.axtree import AXTreeFlattener, parse_axtree_flags
+from easyweb.runtime.browser.profile import ObservationProfile
+
+
+def node(node_id, role, name=None, children=(), bid=None, value=None, **properties):
+    result = {
+        'nodeId': str(node_id),
+        'role': {'value': role},
+        'childIds': [str(child) for child in children],
+        'properties': [
+            {'name': key, 'value': {'value': prop}} for key, prop in properties.items()
+        ],
+    }
+    if name is not None:
+        result['name'] = {'value': name}
+    if bid is not None:
+        result['browsergym_id'] = bid
+    if value is not None:
+        result['value'] = {'value': value}
+    return result
+
+
+def axtree() -> dict:
+    nodes = [
+        node(0, 'RootWebArea', 'Shop', [1, 2, 9]),
+        node(1, 'generic', '', [3, 4]),
+        node(2, 'navigation', 'Menu', [5, 6], bid='2'),
+        node(3, 'heading', 'Results', [7], bid='3', level=1),
+        node(4, 'textbox', 'Search', [], bid='4', value='kettle', focused=True),
+        node(5, 'link', 'Home', [8], bid='5'),
+        node(6, 'link', 'Hidden', [], bid='6'),
+        node(7, 'StaticText', 'Results', []),
+        node(8, 'StaticText', 'Home page', []),
+        node(9, 'button', 'Buy', [], bid='9', disabled=False),
+    ]
+    # a cycle and a dangling child, as Chrome's trees sometimes have
+    nodes[5]['childIds'] += ['5', '99']
+    return {'nodes': nodes}
+
+
+EXTRA_PROPERTIES = {
+    bid: {
+        'visibility': 0.0 if bid == '6' else 1.0,
+        'bbox': [0, 10 * int(bid), 100, 10],
+        'clickable': bid in ('5', '6', '9'),
+        'set_of_marks': bid != '2',
+    }
+    for bid in ('2', '3', '4', '5', '6', '9')
+}
+
+
+@pytest.mark.parametrize(
+    'flags',
+    [
+        '',
+        'with_clickable,filter_visible_only',
+        'with_visible,with_center_coords,with_bounding_box_coords,with_som',
+        'filter_som_only,hide_all_children',
+        'hide_bid_if_invisible',
+        'hide_all_bids,filter_with_bid_only',
+    ],
+)
+def test_same_text_as_browsergym(flags):
+    flattener = AXTreeFlattener()
+    options = {flag: True for flag in parse_axtree_flags(flags)}
+    expected = flatten_axtree_to_str(
+        axtree(), extra_properties=EXTRA_PROPERTIES, **options
+    )
+    assert expected
+    flags = parse_axtree_flags(flags)
+    assert flattener.flatten(axtree(), EXTRA_PROPERTIES, flags) == expected
+    # and again from the cache
+    assert flattener.flatten(axtree(), EXTRA_PROPERTIES, flags) == expected
+    assert flattener.hits == 1
+
+
+def test_changed_subtree_is_rendered_again():
+    flags = parse_axtree_flags('with_clickable,filter_visible_only')
+    flattener = AXTreeFlattener()
+    flattener.flatten(axtree(), EXTRA_PROPERTIES, flags)
+
+    tree = axtree()
+    tree['nodes'][4]['value']['value'] = 'teapot'
+    extra_properties = copy.deepcopy(EXTRA_PROPERTIES)
+    extra_properties['6']['visibility'] = 1.0
+    text = flattener.flatten(tree, extra_properties, flags)
+    assert text == flatten_axtree_to_str(
+        tree,
+        extra_properties=extra_properties,
+        with_clickable=True,
+        filter_visible_only=True,
+    )
+    assert "value='teapot'" in text and "[6] link 'Hidden'" in text
+    # the heading, the Home link and the button are unchanged
+    assert flattener.hits == 3
+
+
+def test_cache_is_bounded():
+    flattener = AXTreeFlattener(max_chars=50)
+    flattener.flatten(axtree(), EXTRA_PROPERTIES)
+    assert flattener.memo_chars <= 50
+    assert flattener.memo_chars == sum(len(text) for text in flattener.memo.values())
+    flattener.reset()
+    assert not flattener.memo and flattener.memo_chars == 0
+
+
+def test_missing_extra_properties_count_as_invisible():
+    flags = parse_axtree_flags('hide_bid_if_invisible')
+    text = AXTreeFlattener().flatten(axtree(), None, flags)
+    assert text == AXTreeFlattener().flatten(axtree(), {}, flags)
+    assert "link 'Home'" in text and '[5]' not in text
+
+
+def test_unknown_flag():
+    with pytest.raises(ValueError):
+        ObservationProfile(axtree_flags='with_clickable,with_colors')
@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+
+from easyweb.runtime.browser.profile import ObservationProfile
+from easyweb.runtime.browser.utils import split_browser_actions
+from easyweb.runtime.browser.worker import GymContext
+
+PROFILE = ObservationProfile(
+    text_content=False,
+    dom_object=False,
+    axtree_object=False,
+    screenshot=False,
+    scroll_position=False,
+)
+
+
+class FakePage:
+    url = 'about:blank'
+
+    def goto(self, url):
+        self.url = url
+
+    def wait_for_timeout(self, ms):
+        pass
+
+
+class FakeContext:
+    def cookies(self):
+        return []
+
+
+class FakeGymEnv:
+    """Runs actions as plain Python against a fake page, like BrowserGym without an action set."""
+
+    action_mapping = None
+
+    def __init__(self):
+        self.page = FakePage()
+        self.context = FakeContext()
+        self.last_action = ''
+        self.last_action_error = ''
+        self.executed = []
+        self.observed = 0
+
+    @property
+    def unwrapped(self):
+        return self
+
+    def _wait_dom_loaded(self):
+        pass
+
+    def _active_page_check(self):
+        pass
+
+    def step(self, action):
+        self.last_action = action
+        if action != 'noop(0)':
+            self.executed.append(action)
+            try:
+                exec(action, {'page': self.page})
+                self.last_action_error = ''
+            except Exception as e:
+                self.last_action_error = f'{type(e).__name__}: {e}'
+        self.observed += 1
+        obs = {
+            'url': self.page.url,
+            'open_pages_urls': [self.page.url],
+            'active_page_index': np.int64(0),
+            'elapsed_time': np.float64(1.0),
+            'last_action': self.last_action,
+            'last_action_error': self.last_action_error,
+            'focused_element_bid': '',
+        }
+        return obs, 0.0, False, False, {}
+
+
+@pytest.fixture
+def context():
+    context = GymContext()
+    context.env = FakeGymEnv()
+    return context
+
+
+def test_batch_observes_once(context):
+    obs = context.step_batch(
+        ["page.goto('https://a.com/')", "page.goto('https://b.com/')", 'x = 1'],
+        'req-1',
+        PROFILE,
+    )
+    assert context.env.observed == 1
+    assert obs['url'] == 'https://b.com/' and obs['request_id'] == 'req-1'
+    assert [check['url'] for check in obs['batch_checks']] == [
+        'https://a.com/',
+        'https://b.com/',
+        'https://b.com/',
+    ]
+    assert context.visited_origins == {'https://b.com'}
+
+
+def test_batch_stops_at_the_first_error(context):
+    obs = context.step_batch(
+        ["page.goto('https://a.com/')", "raise ValueError('boom')", 'x = 1'],
+        'req-1',
+        PROFILE,
+    )
+    assert context.env.observed == 1 and context.env.executed == []
+    assert obs['last_action'] == "raise ValueError('boom')"
+    assert obs['last_action_error'] == 'ValueError: boom'
+    assert len(obs['batch_checks']) == 2
+
+
+def test_batch_can_go_on_after_errors(context):
+    obs = context.step_batch(
+        ["raise ValueError('boom')", "page.goto('https://a.com/')"],
+        'req-1',
+        PROFILE,
+        stop_on_error=False,
+    )
+    assert obs['url'] == 'https://a.com/' and obs['last_action_error'] == ''
+    assert obs['batch_checks'][0]['error'] == 'ValueError: boom'
+
+
+def test_split_browser_actions():
+    assert split_browser_actions('fill("12", "a")\nfill("13",\n "b")\nclick("14")') == [
+        'fill("12", "a")',
+        'fill("13",\n "b")',
+        'click("14")',
+    ]
+    assert split_browser_actions('click(') == ['click(']
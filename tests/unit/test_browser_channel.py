@@ -0,0 +1,155 @@
+import multiprocessing
+import threading
+
+import pytest
+
+from easyweb.core.exceptions import BrowserCrashedError, BrowserUnavailableException
+from easyweb.runtime.browser.channel import HEARTBEAT, BrowserChannel
+
+
+def serve(conn, handler):
+    """Answers requests on the browser side of the pipe from a thread."""
+
+    def loop():
+        while True:
+            try:
+                request_id, kind, payload = conn.recv()
+            except (EOFError, OSError):
+                return
+            if kind == 'SHUTDOWN':
+                conn.close()
+                return
+            handler(conn, request_id, kind, payload)
+
+    thread = threading.Thread(target=loop, daemon=True)
+    thread.start()
+    return thread
+
+
+def echo(conn, request_id, kind, payload):
+    conn.send((request_id, {'kind': kind, 'payload': payload}, None))
+
+
+@pytest.fixture
+def pipe():
+    agent_side, browser_side = multiprocessing.Pipe()
+    yield agent_side, browser_side
+    browser_side.close()
+
+
+def test_request_response(pipe):
+    agent_side, browser_side = pipe
+    serve(browser_side, echo)
+    channel = BrowserChannel(agent_side)
+    assert channel.request('STEP', {'action': 'noop()'}, timeout=5) == {
+        'kind': 'STEP',
+        'payload': {'action': 'noop()'},
+    }
+    channel.close()
+
+
+def test_out_of_order_responses_are_correlated(pipe):
+    agent_side, browser_side = pipe
+    held = []
+
+    def reply_in_reverse(conn, request_id, kind, payload):
+        held.append((request_id, payload))
+        if len(held) == 2:
+            for held_id, held_payload in reversed(held):
+                conn.send((held_id, held_payload, None))
+
+    serve(browser_side, reply_in_reverse)
+    channel = BrowserChannel(agent_side)
+    _, first = channel.submit('STEP', 'first')
+    _, second = channel.submit('STEP', 'second')
+    assert first.result(5) == 'first'
+    assert second.result(5) == 'second'
+    channel.close()
+
+
+def test_timeout_drops_late_response(pipe):
+    agent_side, browser_side = pipe
+    release = threading.Event()
+
+    def slow(conn, request_id, kind, payload):
+        if payload == 'slow':
+            release.wait(5)
+        conn.send((request_id, payload, None))
+
+    serve(browser_side, slow)
+    channel = BrowserChannel(agent_side)
+    with pytest.raises(TimeoutError):
+        channel.request('STEP', 'slow', timeout=0.1)
+    release.set()
+    assert channel.request('STEP', 'fast', timeout=5) == 'fast'
+    channel.close()
+
+
+@pytest.mark.asyncio
+async def test_arequest(pipe):
+    agent_side, browser_side = pipe
+    serve(browser_side, echo)
+    channel = BrowserChannel(agent_side)
+    response = await channel.arequest('IS_ALIVE', timeout=5)
+    assert response['kind'] == 'IS_ALIVE'
+    channel.close()
+
+
+def test_error_response(pipe):
+    agent_side, browser_side = pipe
+
+    def fail(conn, request_id, kind, payload):
+        conn.send((request_id, None, 'ValueError: boom'))
+
+    serve(browser_side, fail)
+    channel = BrowserChannel(agent_side)
+    with pytest.raises(BrowserUnavailableException, match='boom'):
+        channel.request('STEP', timeout=5)
+    channel.close()
+
+
+def test_pending_requests_fail_when_browser_side_exits(pipe):
+    agent_side, browser_side = pipe
+    thread = serve(browser_side, lambda *args: None)
+    channel = BrowserChannel(agent_side)
+    _, pending = channel.submit('STEP', 'never answered')
+    channel.submit('SHUTDOWN')
+    thread.join(5)
+    with pytest.raises(BrowserUnavailableException):
+        pending.result(5)
+    with pytest.raises(BrowserUnavailableException):
+        channel.submit('STEP')
+
+
+def test_heartbeats_are_recorded(pipe):
+    agent_side, browser_side = pipe
+    serve(browser_side, echo)
+    channel = BrowserChannel(agent_side)
+    before = channel.last_heartbeat
+    browser_side.send((HEARTBEAT, (12.5, None), None))
+    assert channel.request('IS_ALIVE', timeout=5)['kind'] == 'IS_ALIVE'
+    assert channel.busy_for == 12.5 and channel.last_heartbeat > before
+    assert channel.busy_timeout is None
+    channel.close()
+
+
+def test_heartbeats_tell_the_timeout_of_the_busy_request(pipe):
+    agent_side, browser_side = pipe
+    channel = BrowserChannel(agent_side)
+    request_id, _ = channel.submit('STEP_BATCH', timeout=300)
+    browser_side.recv()
+    browser_side.send((HEARTBEAT, (150.0, request_id), None))
+    serve(browser_side, echo)
+    # answered after the heartbeat was read
+    channel.request('IS_ALIVE', timeout=5)
+    assert channel.busy_for == 150.0 and channel.busy_timeout == 300
+    channel.close()
+
+
+def test_exited_browser_side_fails_as_crashed(pipe):
+    agent_side, browser_side = pipe
+    channel = BrowserChannel(agent_side)
+    _, pending = channel.submit('STEP')
+    browser_side.close()
+    with pytest.raises(BrowserCrashedError):
+        pending.result(5)
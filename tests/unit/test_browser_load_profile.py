@@ -0,0 +1,120 @@
+import pytest
+
+from easyweb.core.config import config
+from easyweb.runtime.browser.load_profile import (
+    LOAD_PROFILES,
+    LoadProfile,
+    PageLoader,
+    get_load_profile,
+)
+
+
+class FakeContext:
+    def __init__(self):
+        self.routes = []
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def route(self, url, handler):
+        self.routes.append(handler)
+
+    def unroute(self, url, handler):
+        self.routes.remove(handler)
+
+
+class FakeGymEnv:
+    def __init__(self):
+        self.context = FakeContext()
+        self.page = FakePage(self.context)
+        self.waited = 0
+
+    def _wait_dom_loaded(self):
+        self.waited += 1
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.load_states = []
+        self.pending = ['request']
+
+    def wait_for_load_state(self, state, timeout):
+        self.load_states.append(state)
+
+    def wait_for_timeout(self, ms):
+        # requests finish while Playwright is waiting
+        if self.pending:
+            self.context.handlers['requestfinished'](self.pending.pop())
+
+
+@pytest.fixture(autouse=True)
+def clear_profile_cache():
+    get_load_profile.cache_clear()
+    yield
+    get_load_profile.cache_clear()
+
+
+def test_blocking():
+    full = LOAD_PROFILES['full']
+    no_media = LOAD_PROFILES['no-media']
+    assert not full.blocks_requests
+    assert not full.blocks('image', 'https://example.com/a.png')
+    assert no_media.blocks('image', 'https://example.com/a.png')
+    assert no_media.blocks('script', 'https://stats.g.doubleclick.net/x.js')
+    assert not no_media.blocks('script', 'https://example.com/app.js')
+    assert not no_media.blocks('stylesheet', 'https://example.com/app.css')
+    assert LOAD_PROFILES['text-only'].blocks(
+        'stylesheet', 'https://example.com/app.css'
+    )
+
+
+def test_third_party_frames():
+    profile = LOAD_PROFILES['no-media']
+    top = 'https://www.example.com/page'
+    assert profile.blocks('document', 'https://widgets.other.com/embed', top)
+    assert not profile.blocks('document', 'https://static.example.com/frame', top)
+    # main frame navigations have no top url
+    assert not profile.blocks('document', 'https://other.com/')
+
+
+def test_configured_domains(monkeypatch):
+    monkeypatch.setattr(config, 'browser_blocked_domains', 'cdn.example.org, ')
+    assert get_load_profile('no-media').blocks('script', 'https://cdn.example.org/a')
+    assert get_load_profile('full').blocked_domains == ()
+
+
+def test_invalid_profiles():
+    with pytest.raises(ValueError):
+        get_load_profile('fast')
+    with pytest.raises(ValueError):
+        LoadProfile('custom', wait_until='idle')
+
+
+def test_page_loader():
+    env = FakeGymEnv()
+    loader = PageLoader()
+    loader.attach(env)
+    loader.use(get_load_profile('full'))
+    assert env.context.routes == []
+    loader.use(get_load_profile('no-media'))
+    loader.use(get_load_profile('text-only'))
+    assert len(env.context.routes) == 1
+    loader.use(get_load_profile('full'))
+    assert env.context.routes == []
+
+    loader.use(get_load_profile('no-media'))
+    env._wait_dom_loaded()
+    assert env.waited == 1 and env.page.load_states == ['load']
+
+
+def test_quiescence():
+    env = FakeGymEnv()
+    loader = PageLoader()
+    loader.attach(env)
+    loader.use(LoadProfile('quiet', wait_until='quiescence', quiet_period=0))
+    env.context.handlers['request']('request')
+    assert loader.in_flight
+    env._wait_dom_loaded()
+    assert not loader.in_flight and not env.page.pending
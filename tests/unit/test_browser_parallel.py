@@ -0,0 +1,178 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from easyweb.events.action import BrowseParallelAction
+from easyweb.events.observation import (
+    BrowserOutputObservation,
+    BrowserParallelObservation,
+)
+from easyweb.events.serialization import event_from_dict, event_to_dict
+from easyweb.runtime.browser.profile import ObservationProfile
+from easyweb.runtime.browser.worker import GymContext
+from easyweb.runtime.server.browse import _to_observation
+
+PROFILE = ObservationProfile(
+    text_content=False,
+    dom_object=False,
+    axtree_object=False,
+    screenshot=False,
+    scroll_position=False,
+)
+DELAY = 0.5
+
+
+class FakePageImpl:
+    """The async side of a Playwright page, where navigations take DELAY."""
+
+    def __init__(self, page):
+        self.page = page
+
+    async def goto(self, url, timeout=None, waitUntil=None):
+        await asyncio.sleep(DELAY)
+        if 'unreachable' in url:
+            raise ConnectionError(f'cannot reach {url}')
+        self.page.url = url
+
+
+class FakePage:
+    def __init__(self, context, loop):
+        self.context = context
+        self.url = 'about:blank'
+        self.closed = False
+        self._loop = loop
+        self._impl_obj = FakePageImpl(self)
+
+    def _sync(self, coro):
+        # Playwright runs its event loop until the call is done
+        return self._loop.run_until_complete(coro)
+
+    def goto(self, url):
+        self._sync(self._impl_obj.goto(url))
+
+    def wait_for_load_state(self, state='load', timeout=None):
+        pass
+
+    def bring_to_front(self):
+        pass
+
+    def close(self):
+        self.closed = True
+        self.context.pages.remove(self)
+
+
+class FakeContext:
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.pages = []
+
+    def new_page(self):
+        self.pages.append(FakePage(self, self.loop))
+        return self.pages[-1]
+
+
+class FakeGymEnv:
+    action_mapping = None
+
+    def __init__(self):
+        self.context = FakeContext()
+        self.page = self.context.new_page()
+        self.page_history = {self.page: None}
+        self.last_action = ''
+        self.last_action_error = ''
+
+    @property
+    def unwrapped(self):
+        return self
+
+    def _active_page_check(self):
+        assert self.page in self.context.pages
+
+    def _get_obs(self):
+        return {
+            'url': self.page.url,
+            'open_pages_urls': [page.url for page in self.context.pages],
+            'active_page_index': np.int64(self.context.pages.index(self.page)),
+            'elapsed_time': np.float64(1.0),
+            'last_action': self.last_action,
+            'last_action_error': self.last_action_error,
+            'focused_element_bid': '',
+        }
+
+
+@pytest.fixture
+def context():
+    context = GymContext()
+    context.env = FakeGymEnv()
+    yield context
+    context.env.context.loop.close()
+
+
+def test_tabs_load_side_by_side(context):
+    tabs = [[f'page.goto("https://{name}.com/")'] for name in 'abc']
+    start = time.monotonic()
+    obs = context.step_parallel(tabs, 'req-1', PROFILE)
+    # one after the other would take 3 * DELAY
+    assert time.monotonic() - start < 2 * DELAY
+    assert [tab['url'] for tab in obs['tabs']] == [
+        f'https://{name}.com/' for name in 'abc'
+    ]
+    assert all(tab['last_action_error'] == '' for tab in obs['tabs'])
+    assert obs['request_id'] == 'req-1'
+    # the tabs are closed again, the active page is untouched
+    assert obs['open_pages_urls'] == ['about:blank']
+    assert context.env.page_history == {context.env.page: None}
+    assert context.visited_origins == {f'https://{name}.com' for name in 'abc'}
+
+
+def test_a_tab_stops_at_its_first_error(context):
+    obs = context.step_parallel(
+        [
+            ['page.goto("https://unreachable.com/")', 'page.goto("https://a.com/")'],
+            ['undefined_action()', 'page.goto("https://b.com/")'],
+            ['page.goto("https://c.com/")', 'page.goto("https://d.com/")'],
+        ],
+        'req-2',
+        PROFILE,
+        close_tabs=False,
+    )
+    unreachable, undefined, ok = obs['tabs']
+    assert unreachable['url'] == 'about:blank'
+    assert unreachable['last_action_error'].startswith('ConnectionError')
+    assert undefined['last_action'] == 'undefined_action()'
+    assert undefined['last_action_error'].startswith('NameError')
+    assert ok['url'] == 'https://d.com/' and ok['last_action_error'] == ''
+    assert len(obs['open_pages_urls']) == 4
+    assert context.env.page is context.env.context.pages[0]
+
+
+def test_parallel_action_serialization():
+    action = BrowseParallelAction(
+        urls=['https://a.com'],
+        action_lists=[['goto("https://b.com")', 'scroll(0, 200)']],
+    )
+    assert action.tabs == [
+        ['goto("https://a.com")'],
+        ['goto("https://b.com")', 'scroll(0, 200)'],
+    ]
+    assert event_from_dict(event_to_dict(action)) == action
+
+
+def test_parallel_observation_serialization():
+    tab = _to_observation(
+        {
+            'url': 'https://a.com/',
+            'text_content': 'A',
+            'open_pages_urls': ['about:blank'],
+            'active_page_index': 0,
+            'last_action': 'goto("https://a.com")',
+            'last_action_error': '',
+            'focused_element_bid': '',
+        }
+    )
+    obs = BrowserParallelObservation(content='A', tabs=[tab])
+    restored = event_from_dict(event_to_dict(obs))
+    assert isinstance(restored.tabs[0], BrowserOutputObservation)
+    assert restored.tabs[0].url == 'https://a.com/' and not restored.error
@@ -0,0 +1,128 @@
+import threading
+import time
+
+import pytest
+
+from easyweb.core.exceptions import BrowserInitException
+from easyweb.runtime.browser.pool import BrowserEnvPool
+
+
+class FakeProcess:
+    def __init__(self):
+        self.alive = True
+
+    def is_alive(self):
+        return self.alive
+
+
+class FakeEnv:
+    def __init__(self, scrub_ok=True):
+        self.process = FakeProcess()
+        self.scrub_ok = scrub_ok
+        self.scrubbed = 0
+        self.closed = False
+
+    def scrub(self, timeout=30):
+        self.scrubbed += 1
+        return self.scrub_ok
+
+    def check_alive(self, timeout=60):
+        return self.process.alive
+
+    def close(self):
+        self.closed = True
+        self.process.alive = False
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(**kwargs):
+        kwargs.setdefault('env_factory', FakeEnv)
+        pool = BrowserEnvPool(**kwargs)
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.close()
+
+
+def test_prewarms_min_size(make_pool):
+    pool = make_pool(min_size=2, max_size=3)
+    assert wait_for(lambda: pool.idle_count == 2)
+    env = pool.lease()
+    assert isinstance(env, FakeEnv)
+    # the maintainer tops the idle queue back up
+    assert wait_for(lambda: pool.idle_count == 2 and pool.size == 3)
+
+
+def test_release_scrubs_and_reuses(make_pool):
+    pool = make_pool(min_size=0, max_size=1)
+    env = pool.lease()
+    pool.release(env)
+    assert wait_for(lambda: pool.idle_count == 1)
+    assert env.scrubbed == 1
+    assert pool.lease() is env
+
+
+def test_failed_scrub_discards_env(make_pool):
+    pool = make_pool(
+        min_size=0, max_size=1, env_factory=lambda: FakeEnv(scrub_ok=False)
+    )
+    env = pool.lease()
+    pool.release(env)
+    assert wait_for(lambda: env.closed)
+    assert pool.size == 0
+    assert pool.lease() is not env
+
+
+def test_lease_waits_for_release(make_pool):
+    pool = make_pool(min_size=0, max_size=1)
+    env = pool.lease()
+    with pytest.raises(BrowserInitException):
+        pool.lease(timeout=0.1)
+    threading.Timer(0.1, pool.release, args=(env,)).start()
+    assert pool.lease(timeout=5) is env
+
+
+def test_dead_idle_env_is_replaced(make_pool):
+    pool = make_pool(min_size=0, max_size=1)
+    env = pool.lease()
+    pool.release(env)
+    assert wait_for(lambda: pool.idle_count == 1)
+    env.process.alive = False
+    leased = pool.lease()
+    assert leased is not env
+    assert leased.process.is_alive()
+
+
+def test_close_closes_envs_being_scrubbed(make_pool):
+    scrubbing, done = threading.Event(), threading.Event()
+
+    class SlowEnv(FakeEnv):
+        def scrub(self, timeout=30):
+            scrubbing.set()
+            done.wait(5)
+            return super().scrub(timeout)
+
+    pool = make_pool(min_size=0, max_size=1, env_factory=SlowEnv)
+    env = pool.lease()
+    pool.release(env)
+    assert scrubbing.wait(5)
+    pool.close()
+    assert env.closed
+    done.set()
+    # the scrub that ends after the close does not put it back
+    assert wait_for(lambda: pool.size == 0)
+    assert pool.idle_count == 0
@@ -0,0 +1,225 @@
+import asyncio
+
+import pytest
+
+from easyweb.runtime.browser.prefetch import (
+    Prefetcher,
+    candidate_urls,
+    is_action_link,
+    link_targets,
+    target_url,
+)
+
+PAGE_URL = 'https://shop.com/search?q=kettle'
+LINKS = [
+    ('1', '/', 'Home'),
+    ('2', '/p/steel-kettle', 'Stainless Steel Electric Kettle 1.7L with Auto Shutoff'),
+    ('3', '/p/glass-kettle', 'Glass Kettle with Blue LED'),
+    ('4', '/help', 'Help'),
+    ('5', 'javascript:void(0)', 'Menu'),
+    ('6', '#top', 'Back to top'),
+    ('7', '/account/log-out', 'Log out of your kettle shop account'),
+]
+
+
+def dom_snapshot() -> dict:
+    strings = ['#document', 'A', 'bid', 'href']
+    nodes = {'nodeName': [0], 'attributes': [[]]}
+    for bid, href, _ in LINKS:
+        strings += [bid, href]
+        nodes['nodeName'].append(1)
+        nodes['attributes'].append([2, len(strings) - 2, 3, len(strings) - 1])
+    return {'strings': strings, 'documents': [{'nodes': nodes}]}
+
+
+def axtree() -> dict:
+    return {
+        'nodes': [
+            {
+                'role': {'value': 'link'},
+                'name': {'value': name},
+                'browsergym_id': bid,
+            }
+            for bid, _, name in LINKS
+        ]
+    }
+
+
+def test_link_targets():
+    assert link_targets(dom_snapshot(), PAGE_URL) == {
+        '1': 'https://shop.com/',
+        '2': 'https://shop.com/p/steel-kettle',
+        '3': 'https://shop.com/p/glass-kettle',
+        '4': 'https://shop.com/help',
+        '6': 'https://shop.com/search?q=kettle#top',
+        '7': 'https://shop.com/account/log-out',
+    }
+
+
+def test_candidates_follow_the_plan_then_the_most_descriptive_links():
+    targets = link_targets(dom_snapshot(), PAGE_URL)
+    assert candidate_urls(axtree(), targets, PAGE_URL, limit=2) == [
+        'https://shop.com/p/steel-kettle',
+        'https://shop.com/p/glass-kettle',
+    ]
+    hints = 'The glass kettle looks nice, I will open it to check the price.'
+    assert candidate_urls(axtree(), targets, PAGE_URL, hints, limit=1) == [
+        'https://shop.com/p/glass-kettle'
+    ]
+
+
+def test_target_url():
+    targets = {'12': 'https://shop.com/p/steel-kettle'}
+    assert target_url('goto("https://a.com/")', targets) == 'https://a.com/'
+    assert target_url("click('12')", targets) == 'https://shop.com/p/steel-kettle'
+    assert target_url("click('12', button='right')", targets) is None
+    assert target_url("click('13')", targets) is None
+    assert target_url('goto("https://a.com/")\nclick("12")', targets) is None
+    assert target_url('scroll(0, 200)', targets) is None
+
+
+class FakePageImpl:
+    def __init__(self, page):
+        self.page = page
+
+    async def goto(self, url, timeout=None, waitUntil=None):
+        self.page.url = url
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.url = 'about:blank'
+        self.closed = False
+        self.routes = []
+        self.listeners = {}
+        self._loop = context.loop
+        self._impl_obj = FakePageImpl(self)
+
+    def on(self, event, handler):
+        self.listeners[event] = handler
+
+    def remove_listener(self, event, handler):
+        if self.listeners.get(event) is handler:
+            del self.listeners[event]
+
+    def route(self, url, handler):
+        self.routes.append(handler)
+
+    def unroute(self, url, handler):
+        self.routes.remove(handler)
+
+    def wait_for_timeout(self, ms):
+        self._loop.run_until_complete(asyncio.sleep(0))
+
+    def bring_to_front(self):
+        pass
+
+    def is_closed(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+        self.context.pages.remove(self)
+
+
+class FakeContext:
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.pages = []
+
+    def new_page(self):
+        self.pages.append(FakePage(self))
+        return self.pages[-1]
+
+
+class FakeEnv:
+    def __init__(self):
+        self.context = FakeContext()
+        self.page = self.context.new_page()
+        self.page.url = PAGE_URL
+        self.page_history = {self.page: None}
+
+
+@pytest.fixture
+def env():
+    env = FakeEnv()
+    yield env
+    env.context.loop.close()
+
+
+def observe(env) -> dict:
+    return {
+        'url': env.page.url,
+        'dom_object': dom_snapshot(),
+        'axtree_object': axtree(),
+    }
+
+
+def test_prefetched_tab_is_promoted(env):
+    prefetcher = Prefetcher(tabs=2)
+    original = env.page
+    prefetcher.start(env, observe(env))
+    assert len(env.context.pages) == 3
+    prefetcher.pump()
+    # loading tabs activate themselves in BrowserGym
+    env.page = env.context.pages[-1]
+
+    assert prefetcher.take(env, "click('3')")
+    assert env.page.url == 'https://shop.com/p/glass-kettle'
+    assert env.context.pages == [env.page] and original.closed
+    assert env.page_history == {env.page: None}
+    assert env.page.routes == [] and 'requestfinished' not in env.page.listeners
+    metrics = prefetcher.metrics.to_dict()
+    assert metrics['started'] == 2 and metrics['hits'] == 1
+    assert metrics['misses'] == 0 and metrics['wasted'] == 1
+
+
+def test_missed_prefetch_is_wasted(env):
+    prefetcher = Prefetcher(tabs=2)
+    original = env.page
+    prefetcher.start(env, observe(env))
+    assert not prefetcher.take(env, 'goto("https://other.com/")')
+    assert env.context.pages == [original] and env.page is original
+    assert prefetcher.metrics.misses == 1 and prefetcher.metrics.wasted == 2
+
+
+def test_budget_stops_prefetching(env):
+    prefetcher = Prefetcher(tabs=2, budget=100)
+    prefetcher.metrics.bytes = 100
+    prefetcher.start(env, observe(env))
+    assert len(env.context.pages) == 1
+    assert not prefetcher.take(env, "click('3')")
+
+
+def test_links_that_look_like_actions_are_not_prefetched():
+    assert is_action_link('https://shop.com/account/log-out')
+    assert is_action_link('https://shop.com/cart?action=delete&item=3')
+    assert not is_action_link('https://shop.com/p/glass-kettle')
+    targets = link_targets(dom_snapshot(), PAGE_URL)
+    hints = 'I am done with my kettle shop account, so I will log out.'
+    assert 'https://shop.com/account/log-out' not in candidate_urls(
+        axtree(), targets, PAGE_URL, hints, limit=5
+    )
+
+
+class FakeRequestImpl:
+    async def sizes(self):
+        return {'responseHeadersSize': 200, 'responseBodySize': 4000}
+
+
+class FakeRequest:
+    _impl_obj = FakeRequestImpl()
+
+
+def test_the_budget_counts_what_was_downloaded(env):
+    prefetcher = Prefetcher(tabs=1, budget=5000)
+    prefetcher.start(env, observe(env))
+    tab = next(iter(prefetcher.tabs.values()))
+    # a chunked response, without a content-length
+    tab.page.listeners['requestfinished'](FakeRequest())
+    prefetcher.pump()
+    assert tab.bytes == prefetcher.metrics.bytes == 4200
+    tab.page.listeners['requestfinished'](FakeRequest())
+    prefetcher.pump()
+    assert prefetcher.exhausted
@@ -0,0 +1,126 @@
+import base64
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from easyweb.runtime.browser.browser_env import BrowserEnv
+from easyweb.runtime.browser.profile import ObservationProfile
+from easyweb.runtime.browser.screenshot import (
+    EncodedScreenshot,
+    ScreenshotPipeline,
+    ScreenshotSettings,
+    fit,
+    frame_hash,
+)
+
+
+def frame(value: int = 0, size=(720, 1280)) -> np.ndarray:
+    pixels = np.full((*size, 3), 255, dtype=np.uint8)
+    pixels[100:120, 100:110] = value
+    return pixels
+
+
+def decode(data: str) -> Image.Image:
+    return Image.open(io.BytesIO(base64.b64decode(data)))
+
+
+@pytest.mark.parametrize('format', ['jpeg', 'webp', 'png'])
+def test_formats(format):
+    pipeline = ScreenshotPipeline(ScreenshotSettings(format=format, quality=50))
+    encoded = pipeline.submit(frame()).result()
+    assert decode(encoded.screenshot).format == format.upper()
+
+
+def test_downscale_and_thumbnail():
+    settings = ScreenshotSettings(max_width=640, max_height=640, thumbnail_width=160)
+    encoded = ScreenshotPipeline(settings).encode(frame())
+    assert decode(encoded.screenshot).size == (640, 360)
+    assert decode(encoded.thumbnail).size == (160, 90)
+
+
+def test_unchanged_frames_reuse_the_encoding():
+    pipeline = ScreenshotPipeline(ScreenshotSettings())
+    first = pipeline.submit(frame(0)).result()
+    again = pipeline.submit(frame(0)).result()
+    assert not first.unchanged
+    assert again.unchanged and again.screenshot == first.screenshot
+    changed = pipeline.submit(frame(128)).result()
+    assert not changed.unchanged
+    pipeline.reset()
+    assert not pipeline.submit(frame(128)).result().unchanged
+
+
+def test_format_change_is_not_a_duplicate():
+    pipeline = ScreenshotPipeline(ScreenshotSettings())
+    pipeline.encode(frame(), 'jpeg', dedup=True)
+    assert not pipeline.encode(frame(), 'png', dedup=True).unchanged
+
+
+def test_frame_hash_ignores_tiny_noise():
+    pixels = frame()
+    noisy = pixels.copy()
+    noisy[0, 0] = 254
+    assert frame_hash(Image.fromarray(pixels)) == frame_hash(Image.fromarray(noisy))
+
+
+def test_fit_keeps_small_images():
+    image = Image.new('RGB', (100, 50))
+    assert fit(image, 640, 0) is image
+
+
+def test_invalid_format():
+    with pytest.raises(ValueError):
+        ScreenshotSettings(format='gif')
+
+
+def test_frames_are_numbered_across_resets():
+    pipeline = ScreenshotPipeline(ScreenshotSettings())
+    first = pipeline.encode(frame(0), dedup=True)
+    again = pipeline.encode(frame(0), dedup=True)
+    assert first.seq == again.seq == 1
+    pipeline.reset()
+    assert pipeline.encode(frame(0), dedup=True).seq == 2
+
+
+class FakeWorker:
+    """Encodes frames like a browser worker, dropping the responses asked to."""
+
+    def __init__(self):
+        self.screenshots = ScreenshotPipeline(ScreenshotSettings())
+        self.pixels = frame(0)
+        self.fetches = 0
+
+    def request(self, context_id, kind, payload, timeout=30):
+        if kind == 'FETCH':
+            self.fetches += 1
+            return self.screenshots.encode(self.pixels).screenshot
+        encoded = self.screenshots.encode(self.pixels, dedup=True)
+        obs = {'request_id': kind, 'screenshot_seq': encoded.seq}
+        if encoded.unchanged:
+            obs['screenshot_unchanged'] = True
+        else:
+            obs['screenshot'] = encoded.screenshot
+        return obs
+
+
+def test_a_frame_whose_response_was_dropped_is_fetched_again():
+    env = BrowserEnv.__new__(BrowserEnv)
+    env.context_id = 'ctx'
+    env.observation_profile = ObservationProfile()
+    env.trees = {}
+    env.prefetch_metrics = {}
+    env._last_screenshot = EncodedScreenshot('')
+    env.worker = worker = FakeWorker()
+    first = env._observe('STEP', {}, 30)['screenshot']
+    assert env._observe('STEP', {}, 30)['screenshot'] == first
+    # the page changes, and the response with the new frame is lost
+    worker.pixels = frame(128)
+    worker.request('ctx', 'STEP', {})
+    obs = env._observe('STEP', {}, 30)
+    assert worker.fetches == 1
+    assert obs['screenshot'] != first
+    assert decode(obs['screenshot']).getpixel((105, 110)) != (255, 255, 255)
+    assert env._observe('STEP', {}, 30)['screenshot'] == obs['screenshot']
+    assert worker.fetches == 1
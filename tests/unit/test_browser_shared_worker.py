@@ -0,0 +1,50 @@
+import pytest
+
+from easyweb.runtime.browser.worker import _SharedChromium
+
+
+class FakeBrowser:
+    def is_connected(self):
+        return True
+
+    def new_context(self, **kwargs):
+        return kwargs
+
+
+class FakeChromium:
+    def __init__(self):
+        self.launches = []
+
+    def launch(self, **kwargs):
+        self.launches.append(kwargs)
+        return FakeBrowser()
+
+
+def test_first_launch_options_are_passed_through():
+    chromium = FakeChromium()
+    shared = _SharedChromium(chromium)
+    shared.launch(
+        headless=True,
+        slow_mo=100,
+        args=['--window-size=1280,720', '--lang=de'],
+        proxy={'server': 'http://proxy:3128'},
+    )
+    # the chat leaves the other options out
+    shared.launch(headless=True, args=['--window-size=500,800'])
+    assert chromium.launches == [
+        {
+            'headless': True,
+            'slow_mo': 100,
+            'args': ['--lang=de'],
+            'proxy': {'server': 'http://proxy:3128'},
+        }
+    ]
+
+
+def test_launches_with_other_options_are_refused():
+    shared = _SharedChromium(FakeChromium())
+    shared.launch(headless=True, slow_mo=100)
+    with pytest.raises(ValueError, match="browser_worker_mode 'process'"):
+        shared.launch(headless=True, slow_mo=500)
+    with pytest.raises(ValueError):
+        shared.launch(headless=False)
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from easyweb.runtime.browser.shm import SharedMemoryRing, ShmHandle, pack, unpack
+
+
+@pytest.fixture
+def ring():
+    ring = SharedMemoryRing.create(slots=2, slot_size=1024)
+    yield ring
+    ring.close(unlink=True)
+
+
+def test_array_round_trip(ring):
+    pixels = np.arange(4 * 5 * 3, dtype=np.uint8).reshape(4, 5, 3)
+    handle = pack(ring, pixels)
+    assert isinstance(handle, ShmHandle)
+    restored = unpack(ring, handle)
+    assert restored.shape == (4, 5, 3)
+    assert np.array_equal(restored, pixels)
+
+
+def test_object_round_trip_in_response(ring):
+    tree = {'nodes': [{'nodeId': str(i)} for i in range(10)]}
+    response = {'url': 'about:blank', 'axtree_object': pack(ring, tree)}
+    assert isinstance(response['axtree_object'], ShmHandle)
+    assert unpack(ring, response) == {'url': 'about:blank', 'axtree_object': tree}
+
+
+def test_falls_back_inline_when_too_large_or_full(ring):
+    large = np.zeros(2048, dtype=np.uint8)
+    assert pack(ring, large) is large
+    first = pack(ring, [1])
+    second = pack(ring, [2])
+    assert pack(ring, [3]) == [3]
+    # reading a payload frees its slot
+    assert unpack(ring, first) == [1]
+    assert isinstance(pack(ring, [4]), ShmHandle)
+    assert unpack(ring, second) == [2]
+
+
+def test_worker_side_attaches_by_name(ring):
+    worker_side = SharedMemoryRing.attach(ring.name, ring.slots, ring.slot_size)
+    handle = worker_side.put({'a': 1})
+    worker_side.close()
+    assert ring.get(handle) == {'a': 1}
+
+
+def test_no_ring_is_a_no_op():
+    pixels = np.zeros(3)
+    assert pack(None, pixels) is pixels
+    assert unpack(None, pixels) is pixels
@@ -0,0 +1,100 @@
+import time
+
+import pytest
+
+from easyweb.core.config import config
+from easyweb.core.exceptions import BrowserUnavailableException
+from easyweb.runtime.browser.supervisor import BrowserSupervisor
+from easyweb.runtime.browser.worker import BrowserWorker
+
+
+class FakeWorker:
+    def __init__(self, problem=''):
+        self.problem = problem
+        self.aborted = ''
+
+    def health_problem(self, heartbeat_timeout, hang_timeout):
+        return self.problem
+
+    def abort(self, reason):
+        self.aborted = reason
+
+
+class FakeEnv:
+    def __init__(self, worker):
+        self.worker = worker
+        self.restarted_from = None
+
+    def restart(self, crashed):
+        self.restarted_from = crashed
+        self.worker = FakeWorker()
+
+
+def test_only_failed_workers_are_restarted():
+    healthy, hung = FakeWorker(), FakeWorker('request running for 300s')
+    envs = [FakeEnv(healthy), FakeEnv(hung), FakeEnv(hung), FakeEnv(None)]
+    supervisor = BrowserSupervisor()
+    for env in envs:
+        supervisor.watch(env)
+    supervisor.check()
+    supervisor.close()
+    assert not healthy.aborted and envs[0].restarted_from is None
+    assert hung.aborted == 'request running for 300s'
+    assert envs[1].restarted_from is hung and envs[2].restarted_from is hung
+    assert envs[3].restarted_from is None
+
+
+def test_unwatched_envs_are_left_alone():
+    env = FakeEnv(FakeWorker('channel closed'))
+    supervisor = BrowserSupervisor()
+    supervisor.watch(env)
+    supervisor.unwatch(env)
+    supervisor.check()
+    supervisor.close()
+    assert env.restarted_from is None
+
+
+def wait_for(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError()
+        time.sleep(0.05)
+
+
+def test_worker_heartbeats_and_crash(monkeypatch):
+    monkeypatch.setattr(config, 'browser_heartbeat_interval', 0.1)
+    monkeypatch.setattr(config, 'browser_shared_memory', False)
+    worker = BrowserWorker()
+    try:
+        started = worker.channel.last_heartbeat
+        wait_for(lambda: worker.channel.last_heartbeat > started)
+        assert worker.health_problem(30, 120) == ''
+        assert worker.health_problem(30, 0.05) == ''  # idle, not hung
+        assert worker.channel.request('IS_ALIVE', timeout=30) == 'ALIVE'
+        worker.process.kill()
+        wait_for(lambda: worker.channel.closed and not worker.process.is_alive())
+        assert 'exited' in worker.health_problem(30, 120)
+        with pytest.raises(BrowserUnavailableException):
+            worker.channel.submit('IS_ALIVE')
+    finally:
+        worker.close()
+
+
+def test_requests_with_a_longer_timeout_are_not_hung():
+    worker = BrowserWorker.__new__(BrowserWorker)
+    worker.process = type('Process', (), {'is_alive': lambda self: True})()
+    worker.channel = type(
+        'Channel',
+        (),
+        {
+            'closed': False,
+            'last_heartbeat': time.monotonic(),
+            'busy_for': 150.0,
+            'busy_timeout': 300,
+        },
+    )()
+    # a batch of ten actions gets 300s
+    assert worker.health_problem(30, 120) == ''
+    worker.channel.busy_timeout = None
+    assert worker.health_problem(30, 120) == 'request running for 150s'
@@ -0,0 +1,133 @@
+import sys
+
+import pytest
+
+from easyweb.runtime.browser.text_extractor import (
+    DomTextExtractor,
+    Html2TextExtractor,
+    TextExtractor,
+    get_text_extractor,
+)
+
+
+class SnapshotBuilder:
+    """Builds CDP DOMSnapshots the way Chromium lays them out: nodes in document order."""
+
+    def __init__(self):
+        self.strings: list[str] = []
+        self.documents: list[dict] = []
+
+    def string(self, value: str | None) -> int:
+        if value is None:
+            return -1
+        if value not in self.strings:
+            self.strings.append(value)
+        return self.strings.index(value)
+
+    def document(self) -> int:
+        self.documents.append(
+            {
+                'nodes': {
+                    'parentIndex': [],
+                    'nodeType': [],
+                    'nodeName': [],
+                    'nodeValue': [],
+                    'attributes': [],
+                    'contentDocumentIndex': {'index': [], 'value': []},
+                }
+            }
+        )
+        self.add(len(self.documents) - 1, -1, 9, '#document')
+        return len(self.documents) - 1
+
+    def add(self, document, parent, node_type, name, value=None, **attributes):
+        nodes = self.documents[document]['nodes']
+        nodes['parentIndex'].append(parent)
+        nodes['nodeType'].append(node_type)
+        nodes['nodeName'].append(self.string(name))
+        nodes['nodeValue'].append(self.string(value))
+        nodes['attributes'].append(
+            [self.string(part) for item in attributes.items() for part in item]
+        )
+        return len(nodes['parentIndex']) - 1
+
+    def element(self, document, parent, tag, text=None, **attributes):
+        node = self.add(document, parent, 1, tag.upper(), **attributes)
+        if text is not None:
+            self.add(document, node, 3, '#text', text)
+        return node
+
+    def snapshot(self) -> dict:
+        return {'strings': self.strings, 'documents': self.documents}
+
+
+def page(price: str = '$10') -> dict:
+    builder = SnapshotBuilder()
+    doc = builder.document()
+    html = builder.element(doc, 0, 'html')
+    head = builder.element(doc, html, 'head')
+    builder.element(doc, head, 'script', 'var tracking = 1;')
+    body = builder.element(doc, html, 'body')
+    builder.element(doc, body, 'h2', 'Shop\n  now')
+    items = builder.element(doc, body, 'ul')
+    for name in ('Kettle', 'Toaster'):
+        item = builder.element(doc, items, 'li')
+        builder.element(doc, item, 'a', f' {name} ', href=f'/p/{name}')
+        builder.element(doc, item, 'img', alt=f'{name} photo')
+    paragraph = builder.element(doc, body, 'p', 'Price: ')
+    builder.element(doc, paragraph, 'b', price)
+    builder.element(doc, body, 'pre', 'a = 1\n    b = 2')
+    frame = builder.element(doc, body, 'iframe')
+    sub = builder.document()
+    builder.element(sub, 0, 'p', 'Framed text')
+    nodes = builder.documents[doc]['nodes']
+    nodes['contentDocumentIndex'] = {'index': [frame], 'value': [sub]}
+    return builder.snapshot()
+
+
+def test_dom_extractor_renders_markdown():
+    text = DomTextExtractor().extract(page())
+    assert text == (
+        '## Shop now\n\n'
+        '* [Kettle](/p/Kettle) Kettle photo\n'
+        '* [Toaster](/p/Toaster) Toaster photo\n\n'
+        'Price: **$10**\n\n'
+        '```\na = 1\n    b = 2\n```\n\n'
+        'Framed text\n'
+    )
+    assert 'tracking' not in text
+
+
+def test_unchanged_subtrees_are_reused():
+    extractor = DomTextExtractor()
+    first = extractor.extract(page())
+    assert extractor.extract(page()) == first
+    # the whole document comes from the cache
+    assert extractor.hits == 1
+    changed = extractor.extract(page('$12'))
+    assert '**$12**' in changed
+    # the list, the pre and the iframe are reused, only the paragraph is new
+    assert extractor.hits >= 3
+
+
+def test_deeply_nested_pages_are_rendered():
+    builder = SnapshotBuilder()
+    doc = builder.document()
+    parent = builder.element(doc, 0, 'html')
+    for _ in range(sys.getrecursionlimit() * 2):
+        parent = builder.element(doc, parent, 'div')
+    builder.element(doc, parent, 'p', 'Deep down')
+    assert DomTextExtractor().extract(builder.snapshot()) == 'Deep down\n'
+
+
+def test_html2text_extractor_matches_the_old_path():
+    text = Html2TextExtractor().extract(page())
+    assert '(/p/Kettle)' in text and 'tracking' not in text
+
+
+def test_get_text_extractor():
+    assert isinstance(get_text_extractor('dom'), DomTextExtractor)
+    with pytest.raises(ValueError):
+        get_text_extractor('lynx')
+    with pytest.raises(TypeError):
+        TextExtractor()
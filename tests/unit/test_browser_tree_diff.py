@@ -0,0 +1,104 @@
+import copy
+
+from easyweb.runtime.browser.tree_diff import (
+    TreeDiffer,
+    TreeReconstructor,
+    apply_value,
+    diff_value,
+)
+
+
+def axtree(*names: str) -> dict:
+    return {
+        'nodes': [
+            {'nodeId': f'ax-{name}', 'browsergym_id': name, 'name': {'value': name}}
+            for name in names
+        ]
+    }
+
+
+def dom(*texts: str) -> dict:
+    return {
+        'documents': [
+            {'nodes': {'nodeValue': list(range(len(texts))), 'nodeName': [0] * 30}},
+            {'nodes': {'nodeValue': [], 'nodeName': [1] * 30}},
+        ],
+        'strings': ['div', 'span', *texts],
+    }
+
+
+def roundtrip(field: str, snapshots: list, keyframe_interval: int = 10) -> list:
+    differ = TreeDiffer(field, keyframe_interval)
+    reconstructor = TreeReconstructor(field)
+    deltas = []
+    for snapshot in snapshots:
+        delta = differ.encode(copy.deepcopy(snapshot))
+        assert reconstructor.apply(delta) == snapshot
+        deltas.append(delta)
+    return deltas
+
+
+def test_axtree_diffs():
+    names = [str(i) for i in range(20)]
+    renamed = axtree(*names)
+    renamed['nodes'][3]['name']['value'] = 'renamed'
+    deltas = roundtrip(
+        'axtree_object',
+        [
+            axtree(*names),
+            axtree(*names, 'added'),
+            axtree(*names[1:], 'added'),
+            axtree('added', *names[1:]),
+            renamed,
+        ],
+    )
+    assert deltas[0].keyframe
+    assert not any(delta.keyframe for delta in deltas[1:])
+    assert deltas[1].data['added'] == {
+        'bid:added': axtree(*names, 'added')['nodes'][-1]
+    }
+    assert deltas[1].data['order'] is not None
+    assert deltas[2].data['removed'] == ['bid:0']
+    assert list(deltas[4].data['changed']) == ['bid:3']
+
+
+def test_dom_diffs():
+    texts = [f'text {i}' for i in range(20)]
+    edited = dom(*texts)
+    edited['documents'][0]['nodes']['nodeName'][5] = 1
+    deltas = roundtrip(
+        'dom_object', [dom(*texts), dom(*texts, 'appended'), edited, edited]
+    )
+    assert not any(delta.keyframe for delta in deltas[1:])
+    assert deltas[1].data[1]['strings'] == ('splice', 22, 0, ['appended'])
+
+
+def test_list_patches():
+    for prev, curr in [
+        ([1, 2, 3, 4], [1, 2, 9, 4]),
+        ([1, 2, 3, 4], [1, 2, 3]),
+        ([1, 2, 3, 4], [0, 1, 2, 3, 4]),
+        ([1, 2], [3, 4]),
+        ({'a': [1], 'b': 2}, {'a': [1, 2], 'c': 3}),
+    ]:
+        assert apply_value(prev, diff_value(prev, curr)) == curr
+
+
+def test_keyframes():
+    names = [str(i) for i in range(20)]
+    deltas = roundtrip(
+        'axtree_object',
+        [axtree(*names), axtree(*names, 'a'), axtree(*names), axtree('x', 'y')],
+        keyframe_interval=2,
+    )
+    assert [delta.keyframe for delta in deltas] == [True, False, True, True]
+
+
+def test_reconstructor_needs_the_base():
+    differ = TreeDiffer('axtree_object')
+    differ.encode(axtree(*'abcd'))
+    delta = differ.encode(axtree(*'abcde'))
+    reconstructor = TreeReconstructor('axtree_object')
+    assert reconstructor.apply(delta) is None
+    reconstructor.load(delta.seq, axtree(*'abcde'))
+    assert reconstructor.apply(differ.encode(axtree(*'abcdef'))) == axtree(*'abcdef')
@@ -0,0 +1,81 @@
+from agenthub.browsing_agent.response_parser import BrowsingResponseParser
+from easyweb.events.action import BrowseInteractiveAction, BrowseParallelAction
+
+
+def test_action_is_complete_once_its_block_is_closed():
+    parser = BrowsingResponseParser()
+    assert not parser.is_action_complete('The glass kettle is cheaper. ```click("12")')
+    assert not parser.is_action_complete('Empty ``````')
+    assert not parser.is_action_complete('```click("12"```')
+    assert parser.is_action_complete('```click("12")\nscroll(0, 200)```')
+    assert parser.is_action_complete('```python\nclick("12")\n``` and more')
+
+
+def test_response_cut_after_the_action_parses():
+    parser = BrowsingResponseParser()
+    action = parser.parse_action(
+        parser.parse_response(
+            {'choices': [{'message': {'content': 'The glass one. ```click("12")```'}}]}
+        )
+    )
+    assert action.browser_actions == 'click("12")'
+    assert action.thought == 'The glass one.'
+
+
+def test_response_cut_by_until_drops_what_follows_the_action():
+    parser = BrowsingResponseParser()
+    text = ''
+    for delta in ['The glass one. ```cli', 'ck("12")', '```\nThen I will go', ' back']:
+        text += delta
+        if parser.is_action_complete(text):
+            break
+    assert text == 'The glass one. ```click("12")```\nThen I will go'
+    action = parser.parse({'choices': [{'message': {'content': text}}]})
+    assert action.browser_actions == 'click("12")'
+    assert action.thought == 'The glass one.'
+
+
+def test_several_actions_run_as_a_batch():
+    parser = BrowsingResponseParser()
+    action = parser.parse(
+        {
+            'choices': [
+                {'message': {'content': '```fill("12", "kettle")\nclick("13")```'}}
+            ]
+        }
+    )
+    assert action.batch
+    assert action.browser_actions == 'fill("12", "kettle")\nclick("13")'
+    single = parser.parse({'choices': [{'message': {'content': '```click("13")```'}}]})
+    assert not single.batch
+
+
+def test_browse_parallel_opens_tabs():
+    parser = BrowsingResponseParser()
+    action = parser.parse(
+        {
+            'choices': [
+                {
+                    'message': {
+                        'content': "Compare both shops. ```browse_parallel(['https://a.com/k', 'https://b.com/k'])```"
+                    }
+                }
+            ]
+        }
+    )
+    assert isinstance(action, BrowseParallelAction)
+    assert action.urls == ['https://a.com/k', 'https://b.com/k']
+    assert action.thought == 'Compare both shops.'
+    # anything else is left to BrowserGym
+    mixed = parser.parse(
+        {
+            'choices': [
+                {
+                    'message': {
+                        'content': "```browse_parallel(['https://a.com'])\nclick('12')```"
+                    }
+                }
+            ]
+        }
+    )
+    assert isinstance(mixed, BrowseInteractiveAction)
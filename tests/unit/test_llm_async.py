@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+from litellm.exceptions import APIConnectionError
+
+from easyweb.controller.agent import Agent
+from easyweb.events.action import MessageAction
+from easyweb.llm.clients import close_async_clients
+from easyweb.llm.llm import LLM
+
+RESPONSE = {'choices': [{'message': {'content': 'Hello'}}]}
+MESSAGES = [{'role': 'user', 'content': 'Hi'}]
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    async def fake_acompletion(*args, **kwargs):
+        calls.append(kwargs)
+        await asyncio.sleep(0.1)
+        if kwargs['messages'][0]['content'] == 'flaky' and len(calls) == 1:
+            raise APIConnectionError(
+                message='reset', llm_provider='openai', model=kwargs['model']
+            )
+        return RESPONSE
+
+    monkeypatch.setattr('easyweb.llm.llm.litellm_acompletion', fake_acompletion)
+    return calls
+
+
+def make_llm(base_url='http://localhost:8000/v1'):
+    return LLM(
+        model='gpt-4o',
+        api_key='sk-test',
+        base_url=base_url,
+        num_retries=2,
+        retry_min_wait=0,
+        retry_max_wait=0,
+    )
+
+
+def test_concurrent_calls_share_a_connection_pool(calls):
+    first, second, other = make_llm(), make_llm(), make_llm('http://other:8000/v1')
+
+    async def run():
+        responses = await asyncio.gather(
+            *(llm.acompletion(messages=MESSAGES) for llm in (first, second, other))
+        )
+        await close_async_clients()
+        return responses
+
+    responses = asyncio.run(run())
+    assert responses == [RESPONSE] * 3
+    assert calls[0]['client'] is calls[1]['client']
+    assert calls[2]['client'] is not calls[0]['client']
+    assert calls[0]['model'] == 'gpt-4o'
+
+
+def test_acompletion_retries(calls):
+    llm = make_llm()
+    messages = [{'role': 'user', 'content': 'flaky'}]
+    assert asyncio.run(llm.acompletion(messages=messages)) == RESPONSE
+    assert len(calls) == 2
+
+
+class SyncAgent(Agent):
+    def step(self, state):
+        return MessageAction('done')
+
+    def search_memory(self, query):
+        return []
+
+
+def test_agents_without_astep_step_on_a_thread():
+    agent = SyncAgent(llm=None)
+    assert asyncio.run(agent.astep(None)) == MessageAction('done')
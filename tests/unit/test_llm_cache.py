@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+import pytest
+from litellm import acompletion, completion
+
+from easyweb.core.config import config
+from easyweb.llm.cache import ResponseCache, cache_key
+from easyweb.llm.llm import LLM
+
+MESSAGES = [{'role': 'user', 'content': 'Which kettle is cheaper?'}]
+
+
+def response(text: str):
+    return completion(model='gpt-4o', messages=MESSAGES, mock_response=text)
+
+
+def test_key_ignores_transport_params():
+    params = {'model': 'gpt-4o', 'messages': MESSAGES, 'temperature': 0}
+    assert cache_key(params) == cache_key(
+        {**params, 'api_key': 'sk-1', 'timeout': 30, 'stop': None}
+    )
+    assert cache_key(params) != cache_key({**params, 'stop': [')```']})
+    assert cache_key(params) != cache_key({**params, 'model': 'gpt-4o-mini'})
+
+
+def test_disk_tier_survives_restarts(tmp_path):
+    ResponseCache(directory=str(tmp_path)).put('a', response('The glass one.'))
+    cache = ResponseCache(directory=str(tmp_path))
+    cached = cache.get('a')
+    assert cached['choices'][0]['message']['content'] == 'The glass one.'
+    assert cached._hidden_params['cache_hit']
+    assert cache.get('b') is None
+
+
+def test_least_recently_used_are_evicted(tmp_path):
+    size = len(response('x' * 100).model_dump_json())
+    cache = ResponseCache(entries=1, directory=str(tmp_path), max_size=3 * size)
+    for key in 'abcd':
+        cache.put(key, response(key * 100))
+        cache.get('a')
+    assert len(cache.memory) == 1
+    assert cache.get('a') is not None
+    assert cache.get('b') is None
+    assert cache.get('d') is not None
+
+
+def test_expired_responses_are_not_used(tmp_path):
+    cache = ResponseCache(directory=str(tmp_path), ttl=60)
+    cache.put('a', response('old'))
+    cache.memory['a'] = (time.time() - 120, cache.memory['a'][1])
+    cache.db.execute('UPDATE responses SET created = ?', (time.time() - 120,))
+    assert cache.get('a') is None
+
+
+@pytest.fixture
+def calls(monkeypatch, tmp_path):
+    calls = []
+
+    def fake_completion(**kwargs):
+        calls.append(kwargs)
+        return completion(**kwargs, mock_response=f'Answer {len(calls)}')
+
+    monkeypatch.setattr('easyweb.llm.llm.litellm_completion', fake_completion)
+    monkeypatch.setattr(config.llm, 'response_cache', True)
+    monkeypatch.setattr(config.llm, 'response_cache_dir', str(tmp_path))
+    return calls
+
+
+def test_llm_answers_repeated_requests_from_the_cache(calls):
+    llm = LLM(model='gpt-4o', api_key='sk-test', llm_temperature=0)
+    first = llm.completion(messages=MESSAGES)
+    second = llm.completion(messages=MESSAGES)
+    assert len(calls) == 1
+    assert first['choices'][0]['message']['content'] == 'Answer 1'
+    assert second['choices'][0]['message']['content'] == 'Answer 1'
+    assert llm.completion_cost(second) == 0.0
+    assert llm.metrics.cache_hits == 1 and llm.metrics.cache_misses == 1
+    # the disk tier still has it
+    llm.cache.memory.clear()
+    llm.completion(messages=MESSAGES)
+    assert len(calls) == 1
+
+
+def test_sampled_responses_are_not_cached(calls):
+    llm = LLM(model='gpt-4o', api_key='sk-test', llm_temperature=0.7)
+    llm.completion(messages=MESSAGES)
+    llm.completion(messages=MESSAGES)
+    assert len(calls) == 2 and llm.metrics.cache_misses == 0
+
+
+def test_responses_cut_by_until_are_not_cached(calls, monkeypatch):
+    async def fake_acompletion(*args, client=None, **kwargs):
+        calls.append(kwargs)
+        return await acompletion(
+            *args, **kwargs, mock_response='```click("12")``` and then more'
+        )
+
+    monkeypatch.setattr('easyweb.llm.llm.litellm_acompletion', fake_acompletion)
+    llm = LLM(model='gpt-4o', api_key='sk-test', llm_temperature=0)
+    for _ in range(2):
+        asyncio.run(
+            llm.astream(messages=MESSAGES, until=lambda text: text.count('```') == 2)
+        )
+    assert len(calls) == 2
+    # the whole response is cached
+    asyncio.run(llm.astream(messages=MESSAGES))
+    asyncio.run(llm.astream(messages=MESSAGES))
+    assert len(calls) == 3
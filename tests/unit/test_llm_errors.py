@@ -0,0 +1,202 @@
+import asyncio
+
+import litellm
+import pytest
+from litellm.exceptions import (
+    APIConnectionError,
+    BadRequestError,
+    ContextWindowExceededError,
+    RateLimitError,
+)
+
+from easyweb.core.config import config
+from easyweb.core.exceptions import LLMCircuitOpenError
+from easyweb.llm.llm import LLM
+from easyweb.llm.router import CircuitBreaker, get_circuit_breaker
+
+RESPONSE = {'choices': [{'message': {'content': 'Hello'}}]}
+
+
+def make_llm(base_url):
+    return LLM(
+        model='gpt-4o',
+        api_key='sk-test',
+        base_url=base_url,
+        num_retries=3,
+        retry_min_wait=0,
+        retry_max_wait=0,
+    )
+
+
+def test_bad_requests_are_not_retried(monkeypatch):
+    calls = []
+
+    def fake_completion(**kwargs):
+        calls.append(kwargs)
+        raise BadRequestError(
+            message='unknown parameter', model='gpt-4o', llm_provider='openai'
+        )
+
+    monkeypatch.setattr('easyweb.llm.llm.litellm_completion', fake_completion)
+    with pytest.raises(BadRequestError):
+        make_llm('http://bad-request:8000/v1').completion(
+            messages=[{'role': 'user', 'content': 'Hi'}]
+        )
+    assert len(calls) == 1
+
+
+def test_prompts_too_long_go_to_the_hook(monkeypatch):
+    sent = []
+
+    def fake_completion(**kwargs):
+        content = kwargs['messages'][0]['content']
+        sent.append(content)
+        if len(content) > 10:
+            raise ContextWindowExceededError(
+                message='too long', model='gpt-4o', llm_provider='openai'
+            )
+        return RESPONSE
+
+    monkeypatch.setattr('easyweb.llm.llm.litellm_completion', fake_completion)
+    llm = make_llm('http://too-long:8000/v1')
+
+    def halve(messages):
+        return [{'role': 'user', 'content': messages[0]['content'][:8]}]
+
+    messages = [{'role': 'user', 'content': 'Open the cheapest kettle.'}]
+    response = llm.completion(messages=messages, on_context_window_exceeded=halve)
+    assert response == RESPONSE
+    assert sent == ['Open the cheapest kettle.', 'Open the']
+
+    sent.clear()
+    with pytest.raises(ContextWindowExceededError):
+        llm.completion(messages=messages)
+    assert len(sent) == 1
+
+
+def test_circuit_opens_and_lets_one_call_through_after_the_cooldown(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('easyweb.llm.router.time.time', lambda: now[0])
+    breaker = CircuitBreaker(failures=2, cooldown=30)
+    for _ in range(2):
+        assert breaker.acquire()
+        breaker.record(False)
+    assert breaker.is_open and not breaker.acquire()
+    now[0] += 31
+    assert breaker.acquire()
+    assert not breaker.acquire()
+    breaker.record(False)
+    assert breaker.is_open
+    now[0] += 31
+    assert breaker.acquire()
+    breaker.record(True)
+    assert not breaker.is_open and breaker.acquire()
+
+
+def test_calls_to_a_failing_endpoint_fail_fast(monkeypatch):
+    calls = []
+
+    async def fake_acompletion(*args, **kwargs):
+        calls.append(kwargs)
+        raise APIConnectionError(message='refused', llm_provider='openai', model='m')
+
+    monkeypatch.setattr('easyweb.llm.llm.litellm_acompletion', fake_acompletion)
+    monkeypatch.setattr(config.llm, 'circuit_breaker_failures', 2)
+    llm = make_llm('http://failing:8000/v1')
+    messages = [{'role': 'user', 'content': 'Hi'}]
+    # the retry after the second failure already finds the circuit open
+    with pytest.raises(LLMCircuitOpenError):
+        asyncio.run(llm.acompletion(messages=messages))
+    assert len(calls) == 2
+    with pytest.raises(LLMCircuitOpenError):
+        asyncio.run(llm.acompletion(messages=messages))
+    assert len(calls) == 2
+
+
+def test_rate_limits_do_not_open_the_circuit(monkeypatch):
+    calls = []
+
+    async def fake_acompletion(*args, **kwargs):
+        calls.append(kwargs)
+        raise RateLimitError(message='slow down', llm_provider='openai', model='m')
+
+    monkeypatch.setattr('easyweb.llm.llm.litellm_acompletion', fake_acompletion)
+    monkeypatch.setattr(config.llm, 'circuit_breaker_failures', 2)
+    llm = make_llm('http://busy:8000/v1')
+    with pytest.raises(RateLimitError):
+        asyncio.run(llm.acompletion(messages=[{'role': 'user', 'content': 'Hi'}]))
+    assert len(calls) == 3
+    assert not llm.router.endpoints[0].breaker.is_open
+
+
+def test_circuits_are_kept_per_model():
+    first = get_circuit_breaker('http://shared:8000/v1', 'gpt-4o', 2, 30)
+    second = get_circuit_breaker('http://shared:8000/v1', 'llama', 2, 30)
+    for _ in range(2):
+        first.record(False)
+    assert first.is_open and not second.is_open
+
+
+def test_a_cancelled_stream_does_not_hold_the_circuit_trial(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('easyweb.llm.router.time.time', lambda: now[0])
+    calls = []
+    closed = []
+
+    class HangingStream:
+        def __init__(self, first):
+            self.first = first
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            if self.first is not None:
+                chunk, self.first = self.first, None
+                return chunk
+            await asyncio.sleep(3600)
+
+        async def aclose(self):
+            closed.append(self)
+
+    async def fake_acompletion(*args, client=None, **kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            raise APIConnectionError(
+                message='refused', llm_provider='openai', model='m'
+            )
+        stream = await litellm.acompletion(*args, **kwargs, mock_response='Hello')
+        if len(calls) == 2:
+            return HangingStream(await stream.__anext__())
+        return stream
+
+    monkeypatch.setattr('easyweb.llm.llm.litellm_acompletion', fake_acompletion)
+    monkeypatch.setattr(config.llm, 'circuit_breaker_failures', 1)
+    monkeypatch.setattr(config.llm, 'circuit_breaker_cooldown', 30)
+    llm = LLM(model='gpt-4o', api_key='sk-test', base_url='http://flaky:8000/v1')
+    endpoint = llm.router.endpoints[0]
+    messages = [{'role': 'user', 'content': 'Hi'}]
+    with pytest.raises(LLMCircuitOpenError):
+        asyncio.run(llm.acompletion(messages=messages))
+    assert endpoint.breaker.is_open
+    now[0] += 31
+
+    async def cancel_during_the_trial():
+        pieces = []
+
+        async def on_delta(text):
+            pieces.append(text)
+
+        task = asyncio.create_task(llm.astream(messages=messages, on_delta=on_delta))
+        while not pieces:
+            await asyncio.sleep(0)
+        assert endpoint.breaker.trial
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_during_the_trial())
+    assert closed and not endpoint.breaker.trial and endpoint.outstanding == 0
+    response = asyncio.run(llm.astream(messages=messages))
+    assert response['choices'][0]['message']['content'] == 'Hello'
+    assert not endpoint.breaker.is_open
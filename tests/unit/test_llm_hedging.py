@@ -0,0 +1,100 @@
+import asyncio
+
+import litellm
+import pytest
+
+from easyweb.core.config import config
+from easyweb.llm.llm import LLM
+
+MESSAGES = [{'role': 'user', 'content': 'Which kettle is cheaper?'}]
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    async def fake_acompletion(*args, client=None, **kwargs):
+        calls.append('sent')
+        try:
+            # the first request hangs
+            await asyncio.sleep(0.5 if len(calls) == 1 else 0)
+        except asyncio.CancelledError:
+            calls.append('cancelled')
+            raise
+        return await litellm.acompletion(
+            *args, **kwargs, mock_response=f'Answer {len(calls)}'
+        )
+
+    monkeypatch.setattr('easyweb.llm.llm.litellm_acompletion', fake_acompletion)
+    monkeypatch.setattr(config.llm, 'hedge_percentile', 90)
+    return calls
+
+
+def make_llm(base_url):
+    llm = LLM(model='gpt-4o', api_key='sk-test', base_url=base_url)
+    for _ in range(20):
+        llm.router.observe('response', 0.05)
+        llm.router.observe('first_token', 0.05)
+    return llm
+
+
+def test_slow_completions_are_sent_again(calls):
+    llm = make_llm('http://hedge-a:8000/v1')
+    response = asyncio.run(llm.acompletion(messages=MESSAGES))
+    assert response['choices'][0]['message']['content'] == 'Answer 2'
+    assert calls == ['sent', 'sent', 'cancelled']
+    assert llm.metrics.hedged_requests == 1
+    # the prompt of the cancelled request is paid for, but wasted
+    assert llm.metrics.wasted_cost == llm.metrics.accumulated_cost > 0
+    assert [e.outstanding for e in llm.router.endpoints] == [0]
+
+
+def test_hedging_stops_when_the_budget_is_spent(calls, monkeypatch):
+    monkeypatch.setattr(config.llm, 'hedge_budget', 0)
+    llm = make_llm('http://hedge-b:8000/v1')
+    response = asyncio.run(llm.acompletion(messages=MESSAGES))
+    assert response['choices'][0]['message']['content'] == 'Answer 1'
+    assert calls == ['sent'] and llm.metrics.hedged_requests == 0
+
+
+def test_streams_are_hedged_until_their_first_piece(calls):
+    llm = make_llm('http://hedge-c:8000/v1')
+    pieces = []
+
+    async def on_delta(text):
+        pieces.append(text)
+
+    response = asyncio.run(llm.astream(messages=MESSAGES, on_delta=on_delta))
+    assert ''.join(pieces) == 'Answer 2'
+    assert response['choices'][0]['message']['content'] == 'Answer 2'
+    assert calls == ['sent', 'sent', 'cancelled']
+    assert [e.outstanding for e in llm.router.endpoints] == [0]
+
+
+def test_an_unused_answer_is_wasted_cost_not_a_completion(calls):
+    llm = make_llm('http://hedge-d:8000/v1')
+    answers = [
+        litellm.completion(model='gpt-4o', messages=MESSAGES, mock_response=text)
+        for text in ('Answer 1', 'Answer 2')
+    ]
+    arrived = asyncio.Event()
+    discarded = []
+
+    async def send():
+        answer = answers[len(calls)]
+        calls.append('sent')
+        if len(calls) == 2:
+            # both answers arrive at once
+            arrived.set()
+        await arrived.wait()
+        return answer
+
+    async def discard(resp):
+        discarded.append(resp)
+        llm._charge_unused(resp)
+
+    response = asyncio.run(llm._hedge(send, 'response', MESSAGES, discard))
+    assert discarded == [a for a in answers if a is not response]
+    llm.completion_cost(response)
+    assert llm.metrics.completions == 1
+    assert 0 < llm.metrics.wasted_cost < llm.metrics.accumulated_cost
@@ -0,0 +1,59 @@
+from easyweb.llm.llm import LLM
+from easyweb.llm.prompt import PromptSection, fit_prompt, get_token_counter
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+def sections(tree_lines=50, actions=20):
+    return [
+        PromptSection('# Goal\nBuy the cheapest kettle.'),
+        PromptSection(
+            '\n'.join(f'[{i}] link kettle {i}' for i in range(tree_lines)),
+            priority=1,
+            name='axtree',
+        ),
+        PromptSection(
+            '\n'.join(f'click("{i}")' for i in range(actions)),
+            title='# Previous Actions',
+            priority=0,
+            keep_end=True,
+            name='actions',
+        ),
+    ]
+
+
+def test_prompts_within_the_budget_are_left_alone():
+    fitted = fit_prompt(sections(), 1000, count_words)
+    assert fitted.cut == {}
+    assert fitted.text == '\n\n'.join(s.prompt for s in sections())
+
+
+def test_lowest_priority_is_cut_first_keeping_its_end():
+    full = fit_prompt(sections(), 1000, count_words).tokens
+    fitted = fit_prompt(sections(), full - 10, count_words)
+    assert fitted.tokens <= full - 10
+    assert set(fitted.cut) == {'actions'}
+    assert '[49] link kettle 49' in fitted.text
+    assert 'Deleted' in fitted.text and 'click("19")' in fitted.text
+    assert 'click("0")' not in fitted.text
+    assert '# Previous Actions\n... Deleted' in fitted.text
+
+
+def test_higher_priorities_are_cut_once_the_lower_ones_are_gone():
+    fitted = fit_prompt(sections(), 60, count_words)
+    assert fitted.tokens <= 60
+    assert set(fitted.cut) == {'actions', 'axtree'}
+    assert fitted.text.startswith('# Goal\nBuy the cheapest kettle.')
+    assert '[0] link kettle 0' in fitted.text
+    assert '[49] link kettle 49' not in fitted.text
+
+
+def test_llm_fits_prompts_to_its_context_window():
+    llm = LLM(model='gpt-4o', max_input_tokens=600, max_output_tokens=100)
+    fitted = llm.fit_prompt(sections(tree_lines=500), reserved=100)
+    count = get_token_counter('gpt-4o')
+    assert count(fitted.text) <= 400
+    assert fitted.cut['axtree'] > 0
+    assert llm.metrics.truncated_tokens == fitted.cut_tokens
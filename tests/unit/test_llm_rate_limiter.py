@@ -0,0 +1,144 @@
+import asyncio
+import threading
+
+import pytest
+from litellm import acompletion, completion
+
+from easyweb.core.config import config
+from easyweb.llm.llm import LLM
+from easyweb.llm.rate_limiter import (
+    ConcurrencyLimiter,
+    RateLimiter,
+    get_rate_limiter,
+)
+
+MESSAGES = [{'role': 'user', 'content': 'Which kettle is cheaper?'}]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr('easyweb.llm.rate_limiter.time.time', lambda: clock[0])
+    return clock
+
+
+def test_requests_wait_until_the_bucket_refills(clock):
+    limiter = RateLimiter(requests_per_minute=60)
+    waits = [limiter.reserve() for _ in range(62)]
+    assert waits[:60] == [0.0] * 60
+    assert waits[60:] == [pytest.approx(1.0), pytest.approx(2.0)]
+    clock[0] += 2
+    assert limiter.reserve() == pytest.approx(1.0)
+
+
+def test_tokens_are_charged_after_the_response(clock):
+    limiter = RateLimiter(tokens_per_minute=600)
+    assert limiter.reserve(500) == 0.0
+    limiter.charge(200)
+    assert limiter.reserve(0) == pytest.approx(10.0)
+    # unused tokens are given back
+    limiter.charge(-100)
+    assert limiter.reserve(0) == 0.0
+
+
+def test_processes_share_the_state_file(clock, tmp_path):
+    first = RateLimiter(requests_per_minute=2, state_file=str(tmp_path / 'a.json'))
+    second = RateLimiter(requests_per_minute=2, state_file=str(tmp_path / 'a.json'))
+    assert first.reserve() == 0.0
+    assert second.reserve() == 0.0
+    assert first.reserve() == pytest.approx(30.0)
+
+
+def test_llm_waits_for_the_rate_limit(monkeypatch, clock):
+    waits = []
+    monkeypatch.setattr('easyweb.llm.llm.time.sleep', waits.append)
+    monkeypatch.setattr(
+        'easyweb.llm.llm.litellm_completion',
+        lambda **kwargs: completion(**kwargs, mock_response='The glass one.'),
+    )
+    monkeypatch.setattr(config.llm, 'requests_per_minute', 1)
+    get_rate_limiter.cache_clear()
+    llm = LLM(model='gpt-4o', api_key='sk-rate-limit-test')
+    llm.completion(messages=MESSAGES)
+    llm.completion(messages=MESSAGES)
+    assert waits == [0.0, pytest.approx(60.0)]
+    # other LLMs with the same model and key share the limit
+    assert LLM(model='gpt-4o', api_key='sk-rate-limit-test').rate_limiter is (
+        llm.rate_limiter
+    )
+
+
+def test_llm_keeps_requests_at_once_under_the_limit(monkeypatch):
+    running = [0, 0]
+
+    async def fake_acompletion(*args, client=None, **kwargs):
+        running[0] += 1
+        running[1] = max(running)
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+        return await acompletion(*args, **kwargs, mock_response='Answer')
+
+    monkeypatch.setattr('easyweb.llm.llm.litellm_acompletion', fake_acompletion)
+    monkeypatch.setattr(config.llm, 'max_concurrent_requests', 2)
+    llm = LLM(model='gpt-4o', api_key='sk-concurrency')
+
+    async def main():
+        return await asyncio.gather(
+            *(llm.acompletion(messages=MESSAGES) for _ in range(5))
+        )
+
+    assert len(asyncio.run(main())) == 5
+    assert running == [0, 2]
+    assert llm.concurrency.running == 0
+
+
+def test_waiting_for_the_rate_limit_does_not_hold_a_slot(monkeypatch, clock):
+    held = []
+    monkeypatch.setattr(
+        'easyweb.llm.llm.time.sleep', lambda wait: held.append(llm.concurrency.running)
+    )
+    monkeypatch.setattr(
+        'easyweb.llm.llm.litellm_completion',
+        lambda **kwargs: completion(**kwargs, mock_response='The glass one.'),
+    )
+    monkeypatch.setattr(config.llm, 'requests_per_minute', 1)
+    monkeypatch.setattr(config.llm, 'max_concurrent_requests', 1)
+    llm = LLM(model='gpt-4o', api_key='sk-slot-test')
+    llm.completion(messages=MESSAGES)
+    llm.completion(messages=MESSAGES)
+    assert held == [0, 0]
+    assert llm.concurrency.running == 0
+
+
+def test_cancelled_waiters_pass_their_slot_on():
+    limiter = ConcurrencyLimiter(1)
+
+    async def main():
+        await limiter.aacquire()
+        cancelled = asyncio.create_task(limiter.aacquire())
+        waiting = asyncio.create_task(limiter.aacquire())
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        limiter.release()
+        await asyncio.wait_for(waiting, 1)
+        limiter.release()
+
+    asyncio.run(main())
+    assert limiter.running == 0 and not limiter.waiters
+
+
+def test_threads_wait_for_a_free_slot():
+    limiter = ConcurrencyLimiter(1)
+    limiter.acquire()
+    entered = threading.Event()
+
+    def call():
+        with limiter:
+            entered.set()
+
+    thread = threading.Thread(target=call)
+    thread.start()
+    assert not entered.wait(0.05)
+    limiter.release()
+    thread.join(1)
+    assert entered.is_set() and limiter.running == 0
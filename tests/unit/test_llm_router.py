@@ -0,0 +1,107 @@
+import asyncio
+import json
+
+import pytest
+from litellm.exceptions import APIConnectionError
+
+from easyweb.core.config import get_model_port_arg
+from easyweb.llm.llm import LLM
+from easyweb.llm.router import EndpointRouter
+
+RESPONSE = {'choices': [{'message': {'content': 'Hello'}}]}
+MESSAGES = [{'role': 'user', 'content': 'Hi'}]
+
+
+def connection_error():
+    return APIConnectionError(message='refused', llm_provider='openai', model='m')
+
+
+def test_least_requests_follows_the_weights():
+    router = EndpointRouter([('a', 2.0), ('b', 1.0)])
+    picked = []
+    for _ in range(3):
+        endpoint = router.pick()
+        router.start(endpoint)
+        picked.append(endpoint.base_url)
+    assert sorted(picked) == ['a', 'a', 'b']
+
+
+def test_latency_routing_prefers_the_faster_endpoint():
+    router = EndpointRouter([('a', 1.0), ('b', 1.0)], strategy='latency')
+    fast, slow = router.endpoints
+    fast.latency, slow.latency = 0.5, 2.0
+    assert router.pick() is fast
+    fast.outstanding = 4
+    assert router.pick() is slow
+
+
+def test_failing_endpoints_are_left_out_for_a_while(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('easyweb.llm.router.time.time', lambda: now[0])
+    router = EndpointRouter(
+        [('a', 1.0), ('b', 1.0)],
+        eject_after=2,
+        eject_time=30,
+        errors=(APIConnectionError,),
+    )
+    bad, good = router.endpoints
+    for _ in range(2):
+        router.finish(bad, router.start(bad), connection_error())
+    assert all(router.pick() is good for _ in range(10))
+    now[0] += 31
+    router.finish(bad, router.start(bad), connection_error())
+    # back in, and out twice as long after failing again
+    assert bad.ejected_until == now[0] + 60
+    router.finish(bad, router.start(bad))
+    assert bad.failures == 0
+
+
+def test_llm_fails_over_to_the_next_endpoint(monkeypatch):
+    calls = []
+
+    async def fake_acompletion(*args, **kwargs):
+        calls.append(kwargs['base_url'])
+        if kwargs['base_url'] == 'http://down:8000/v1':
+            raise connection_error()
+        return RESPONSE
+
+    monkeypatch.setattr('easyweb.llm.llm.litellm_acompletion', fake_acompletion)
+    # ties go to the first endpoint
+    monkeypatch.setattr('easyweb.llm.router.random.choice', lambda c: c[0])
+    llm = LLM(
+        model='gpt-4o',
+        api_key='sk-test',
+        num_retries=1,
+        endpoints=[('http://down:8000/v1', 1), ('http://up:8000/v1', 1)],
+    )
+    for _ in range(4):
+        assert asyncio.run(llm.acompletion(messages=MESSAGES)) == RESPONSE
+    assert calls.count('http://up:8000/v1') == 4
+    # ejected after the default 3 failures
+    assert calls.count('http://down:8000/v1') == 3
+
+
+def test_model_port_config_takes_a_list_of_endpoints(tmp_path):
+    path = tmp_path / 'model_port_config.json'
+    path.write_text(
+        json.dumps(
+            {
+                'llama': {
+                    'provider': 'openai',
+                    'endpoints': [
+                        {'port': 8001, 'weight': 3},
+                        {'base_url': 'http://b/v1'},
+                    ],
+                },
+                'gpt-4o': {'base_url': 'https://api.openai.com/v1/'},
+            }
+        )
+    )
+    model, endpoints = get_model_port_arg(str(path), 'llama')
+    assert model == 'openai/llama'
+    assert endpoints == [('http://localhost:8001/v1/', 3.0), ('http://b/v1', 1.0)]
+    assert get_model_port_arg(str(path), 'gpt-4o')[1] == [
+        ('https://api.openai.com/v1/', 1.0)
+    ]
+    with pytest.raises(ValueError):
+        EndpointRouter([])
@@ -0,0 +1,91 @@
+import litellm
+import pytest
+
+from easyweb.events import EventSource, EventStream
+from easyweb.events.observation import AgentThoughtChunkObservation, NullObservation
+from easyweb.events.serialization import event_to_dict
+from easyweb.events.stream import EventStreamSubscriber
+from easyweb.llm.llm import LLM
+
+MESSAGES = [{'role': 'user', 'content': 'Open the cheapest kettle.'}]
+ANSWER = 'The glass kettle is cheaper. ```click("12")```'
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    async def fake_acompletion(*args, client=None, **kwargs):
+        return await litellm.acompletion(*args, **kwargs, mock_response=ANSWER)
+
+    monkeypatch.setattr('easyweb.llm.llm.litellm_acompletion', fake_acompletion)
+    return LLM(model='gpt-4o', api_key='sk-test')
+
+
+@pytest.mark.asyncio
+async def test_astream_passes_pieces_on_and_returns_the_response(llm):
+    pieces = []
+
+    async def on_delta(text):
+        pieces.append(text)
+
+    response = await llm.astream(messages=MESSAGES, on_delta=on_delta)
+    assert len(pieces) > 1
+    assert ''.join(pieces) == ANSWER
+    assert response['choices'][0]['message']['content'] == ANSWER
+    assert response['usage']['completion_tokens'] > 0
+
+
+@pytest.mark.asyncio
+async def test_transient_events_are_not_stored():
+    stream = EventStream('transient')
+    received = []
+    transient = []
+
+    async def on_event(event):
+        received.append(event)
+
+    async def on_transient_event(event):
+        transient.append(event)
+
+    stream.subscribe(EventStreamSubscriber.TEST, on_event)
+    stream.subscribe_transient(EventStreamSubscriber.TEST, on_transient_event)
+    chunk = AgentThoughtChunkObservation(content='The glass', iteration=3)
+    await stream.add_transient_event(chunk, EventSource.AGENT)
+    await stream.add_event(NullObservation(''), EventSource.AGENT)
+
+    assert received == [NullObservation('')]
+    assert transient == [chunk]
+    assert len(list(stream.get_events())) == 1
+    data = event_to_dict(chunk)
+    assert 'id' not in data
+    assert data['observation'] == 'thought_chunk'
+    assert data['extras'] == {'iteration': 3}
+
+
+@pytest.mark.asyncio
+async def test_astream_stops_when_asked_to(monkeypatch):
+    long_answer = ANSWER + ' Next I will compare the prices of the other kettles.'
+
+    async def fake_acompletion(*args, client=None, **kwargs):
+        return await litellm.acompletion(*args, **kwargs, mock_response=long_answer)
+
+    monkeypatch.setattr('easyweb.llm.llm.litellm_acompletion', fake_acompletion)
+    llm = LLM(model='gpt-4o', api_key='sk-test')
+    response = await llm.astream(
+        messages=MESSAGES, until=lambda text: text.count('```') == 2
+    )
+    content = response['choices'][0]['message']['content']
+    # up to the end of the piece that closed the block
+    assert content.startswith(ANSWER) and 'kettles' not in content
+    assert response['choices'][0]['finish_reason'] == 'stop'
+
+
+@pytest.mark.asyncio
+async def test_closed_sessions_stop_receiving_transient_events():
+    # the server package starts its session manager on import
+    from easyweb.server.session.session import Session
+
+    session = Session('transient-close', None)
+    stream = session.agent_session.event_stream
+    assert EventStreamSubscriber.SERVER in stream._transient_subscribers
+    await session.close()
+    assert EventStreamSubscriber.SERVER not in stream._transient_subscribers
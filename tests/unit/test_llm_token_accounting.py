@@ -0,0 +1,140 @@
+import litellm
+import pytest
+
+from easyweb.controller.agent import Agent
+from easyweb.controller.agent_controller import AgentController
+from easyweb.controller.state.state import State
+from easyweb.core.schema import AgentState
+from easyweb.events import EventStream
+from easyweb.events.action import AgentDelegateAction, MessageAction
+from easyweb.events.observation import NullObservation
+from easyweb.llm.llm import LLM
+
+
+def test_history_entries_are_counted_once():
+    counted = []
+
+    def count(text):
+        counted.append(text)
+        return len(text.split())
+
+    state = State()
+    state.add_history(
+        MessageAction('Buy the cheapest kettle'), NullObservation(''), count
+    )
+    state.add_history(MessageAction('Done'), NullObservation(''), count)
+    assert len(counted) == 2
+    assert state.num_of_tokens == sum(state.history_tokens) > 0
+    assert state.num_of_chars == sum(len(text) for text in counted)
+    assert len(state.history) == len(state.updated_info) == 2
+
+
+def test_text_messages_are_counted_like_litellm():
+    llm = LLM(model='gpt-4o', api_key='sk-test')
+    messages = [
+        {'role': 'system', 'content': 'You are a browsing agent.'},
+        {'role': 'user', 'content': 'Open the cheapest kettle. ' * 40},
+    ]
+    assert llm.get_token_count(messages) == litellm.token_counter(
+        model='gpt-4o', messages=messages
+    )
+
+
+def test_estimate_uses_the_average_response_length():
+    llm = LLM(model='gpt-4o', api_key='sk-test')
+    llm.metrics.completions = 2
+    llm.metrics.completion_tokens = 200
+    prompt_cost, completion_cost = litellm.cost_per_token(
+        model='gpt-4o', prompt_tokens=1000, completion_tokens=100
+    )
+    assert llm.estimate_cost(1000) == pytest.approx(prompt_cost + completion_cost)
+
+
+class CountingAgent(Agent):
+    steps = 0
+
+    def step(self, state):
+        self.steps += 1
+        return MessageAction('done')
+
+    def search_memory(self, query):
+        return []
+
+
+Agent.register('CountingAgent', CountingAgent)
+
+
+@pytest.mark.asyncio
+async def test_steps_that_would_exceed_the_budget_are_refused():
+    agent = CountingAgent(llm=LLM(model='gpt-4o', api_key='sk-test'))
+    controller = AgentController(
+        agent,
+        EventStream('budget'),
+        max_budget_per_task=0.01,
+        is_delegate=True,
+    )
+    controller.state.agent_state = AgentState.RUNNING
+    controller.state.num_of_tokens = 100_000
+    await controller._step()
+    assert agent.steps == 0
+    assert controller.state.agent_state == AgentState.ERROR
+    assert 'budget would be exceeded' in controller.state.error
+
+
+@pytest.mark.asyncio
+async def test_delegates_count_their_own_history_within_the_budget():
+    agent = CountingAgent(llm=LLM(model='gpt-4o', api_key='sk-test'))
+    controller = AgentController(
+        agent,
+        EventStream('delegate-budget'),
+        max_budget_per_task=0.01,
+        is_delegate=True,
+    )
+    controller.state.add_history(
+        MessageAction('Buy the cheapest kettle'), NullObservation(''), len
+    )
+    await controller.start_delegate(AgentDelegateAction('CountingAgent', {}))
+    delegate = controller.delegate
+    assert delegate.state.num_of_tokens == sum(delegate.state.history_tokens) == 0
+    assert delegate.max_budget_per_task == 0.01
+    # a delegate with a long history of its own is stopped like its parent
+    delegate.state.num_of_tokens = 100_000
+    await delegate._step()
+    assert delegate.agent.steps == 0
+    assert delegate.state.agent_state == AgentState.ERROR
+
+
+@pytest.mark.asyncio
+async def test_steps_are_estimated_from_the_last_prompt():
+    agent = CountingAgent(llm=LLM(model='gpt-4o', api_key='sk-test'))
+    controller = AgentController(
+        agent,
+        EventStream('last-prompt'),
+        max_budget_per_task=0.01,
+        is_delegate=True,
+    )
+    controller.state.agent_state = AgentState.RUNNING
+    # a long history, of which the agent only sent a short window
+    controller.state.num_of_tokens = 100_000
+    controller._step_tokens = 99_900
+    agent.llm.metrics.completions = 1
+    agent.llm.metrics.completion_tokens = 50
+    agent.llm.metrics.last_prompt_tokens = 1000
+    await controller._step()
+    assert agent.steps == 1
+    assert controller.state.error is None
+
+
+@pytest.mark.asyncio
+async def test_the_controller_counts_the_history_before_the_step():
+    agent = CountingAgent(llm=LLM(model='gpt-4o', api_key='sk-test'))
+    controller = AgentController(agent, EventStream('lazy-count'), is_delegate=True)
+    await controller.add_history(
+        MessageAction('Buy the cheapest kettle'), NullObservation('')
+    )
+    assert controller.state.num_of_tokens == 0
+    assert len(controller.state.uncounted) == 1
+    await controller._count_history()
+    assert controller.state.uncounted == []
+    assert controller.state.num_of_tokens == sum(controller.state.history_tokens) > 0
+    assert controller.state.num_of_chars > 0
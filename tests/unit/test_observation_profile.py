@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+from easyweb.runtime.browser.profile import ObservationProfile
+from easyweb.runtime.browser.worker import GymContext
+
+# <html><body>Hello</body></html> in DOMSnapshot format
+DOM_SNAPSHOT = {
+    'strings': ['#document', 'HTML', 'BODY', '#text', 'Hello'],
+    'documents': [
+        {
+            'nodes': {
+                'parentIndex': [-1, 0, 1, 2],
+                'nodeType': [9, 1, 1, 3],
+                'nodeName': [0, 1, 2, 3],
+                'nodeValue': [-1, -1, -1, 4],
+                'attributes': [[], [], [], []],
+                'contentDocumentIndex': {'index': [], 'value': []},
+            }
+        }
+    ],
+}
+
+
+class FakeEnv:
+    def step(self, action):
+        obs = {
+            'url': 'https://example.com/',
+            'open_pages_urls': ['https://example.com/'],
+            'active_page_index': np.int64(0),
+            'elapsed_time': np.float64(1.5),
+            'last_action': action,
+            'last_action_error': '',
+            'focused_element_bid': '',
+            'screenshot': np.zeros((4, 4, 3), dtype=np.uint8),
+            'dom_object': DOM_SNAPSHOT,
+            'axtree_object': {'nodes': []},
+            'extra_element_properties': {'1': {'visibility': 1.0}},
+        }
+        return obs, 0.0, False, False, {}
+
+
+@pytest.fixture
+def context():
+    context = GymContext()
+    context.env = FakeEnv()
+    return context
+
+
+def test_default_profile_sends_everything_but_scroll(context):
+    profile = ObservationProfile(scroll_position=False)
+    obs = context.step('noop()', 'req-1', profile)
+    assert obs['request_id'] == 'req-1'
+    assert obs['active_page_index'] == 0 and isinstance(obs['active_page_index'], int)
+    assert isinstance(obs['screenshot'], str)
+    assert obs['axtree_object'] == {'nodes': []}
+    assert 'extra_element_properties' in obs
+    assert obs['text_content'].strip() == 'Hello'
+    assert 'scroll_position' not in obs
+    assert context.visited_origins == {'https://example.com'}
+
+
+def test_skipped_fields_are_not_sent(context):
+    profile = ObservationProfile(
+        text_content=False, dom_object=False, screenshot=False, scroll_position=False
+    )
+    obs = context.step('noop()', 'req-1', profile)
+    for field in ('text_content', 'dom_object', 'screenshot', 'scroll_position'):
+        assert field not in obs
+    assert obs['axtree_object'] == {'nodes': []}
+    assert obs['url'] == 'https://example.com/'
+
+
+def test_fetch_latest_observation_only(context):
+    profile = ObservationProfile(screenshot=False, scroll_position=False)
+    context.step('noop()', 'req-1', profile)
+    png = ObservationProfile(screenshot_format='png', text_format='html')
+    assert '<body>' in context.fetch('req-1', 'text_content', png)
+    assert isinstance(context.fetch('req-1', 'screenshot', png), str)
+    context.step('noop()', 'req-2', profile)
+    assert context.fetch('req-1', 'screenshot', png) is None
+
+
+def test_invalid_formats():
+    with pytest.raises(ValueError):
+        ObservationProfile(screenshot_format='gif')
+    with pytest.raises(ValueError):
+        ObservationProfile(text_format='pdf')
+
+
+def test_unchanged_screenshot_is_not_sent_again(context):
+    profile = ObservationProfile(scroll_position=False)
+    first = context.step('noop()', 'req-1', profile)
+    assert isinstance(first['screenshot'], str)
+    second = context.step('noop()', 'req-2', profile)
+    assert 'screenshot' not in second
+    assert second['screenshot_unchanged'] is True
+
+
+def test_trees_are_sent_as_diffs():
+    context = GymContext(tree_keyframe_interval=10)
+    context.env = FakeEnv()
+    profile = ObservationProfile(screenshot=False, scroll_position=False)
+    first = context.step('noop()', 'req-1', profile)
+    second = context.step('noop()', 'req-2', profile)
+    assert first['axtree_object'].keyframe
+    assert first['dom_object'].data == DOM_SNAPSHOT
+    assert not second['dom_object'].keyframe
+    assert second['dom_object'].base == first['dom_object'].seq
+    # fetching still returns the full tree
+    assert context.fetch('req-2', 'dom_object', profile) == DOM_SNAPSHOT